@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+# Time GET /events/availability's query on many assets with years of bookings.
+# Run from the api directory against a scratch database with the current
+# schema, e.g.
+#   CC_CONFIG=dev DEV_DB_URL=postgresql://localhost/cc-bench ./bin/bench-availability.py [assets] [events] [bookings per asset]
+# The assets and events are deleted afterwards.
+
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import create_app, db
+from src.assets.models import Asset
+from src.events.api import available
+from src.events.models import Event, EventAsset
+
+app = create_app(os.getenv('CC_CONFIG') or 'default')
+
+asset_count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+event_count = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+per_asset = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+batch_size = 5000
+rounds = 20
+
+
+def insert(table, rows):
+    ids = []
+    for start in range(0, len(rows), batch_size):
+        ids += [row_id for row_id, in db.session.execute(
+            table.insert().values(rows[start:start + batch_size]).returning(table.c[list(table.primary_key)[0].name]))]
+    return ids
+
+
+with app.app_context():
+    db.create_all()
+    origin = datetime.datetime(2020, 1, 1)
+    # one event every 4 hours, 3 hours long: about 4.5 years for 10,000 events
+    event_ids = insert(Event.__table__, [{'title': 'bench', 'start': origin + datetime.timedelta(hours=4 * i),
+                                          'end': origin + datetime.timedelta(hours=4 * i + 3), 'active': True}
+                                         for i in range(event_count)])
+    asset_ids = insert(Asset.__table__, [{'description': 'bench', 'active': True} for _ in range(asset_count)])
+    try:
+        insert(EventAsset.__table__, [{'event_id': event_id, 'asset_id': asset_id}
+                                      for asset_id in asset_ids
+                                      for event_id in random.sample(event_ids, per_asset)])
+        db.session.commit()
+        db.session.execute('ANALYZE events_eventasset')
+        db.session.commit()
+
+        middle = origin + datetime.timedelta(hours=4 * (event_count // 2))
+        for label, start, end in [('one event', middle, middle + datetime.timedelta(hours=3)),
+                                  ('one week', middle, middle + datetime.timedelta(days=7))]:
+            times = []
+            for _ in range(rounds):
+                begin = time.perf_counter()
+                free = available('asset', start, end).all()
+                times.append(time.perf_counter() - begin)
+            print(f"{asset_count} assets, {asset_count * per_asset} bookings, window {label:9}: "
+                  f"{len(free)} free in {min(times) * 1000:.1f}ms")
+    finally:
+        db.session.rollback()
+        db.session.query(EventAsset).filter(EventAsset.asset_id.in_(asset_ids)).delete(synchronize_session=False)
+        db.session.query(Asset).filter(Asset.id.in_(asset_ids)).delete(synchronize_session=False)
+        db.session.query(Event).filter(Event.id.in_(event_ids)).delete(synchronize_session=False)
+        db.session.commit()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+# Compare marshmallow's dump with the compiled dump of the hot schemas.
+# Run from the api directory: ./bin/bench-compiled-dump.py [rows]
+
+import datetime
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from marshmallow import Schema
+
+from src import create_app
+from src.events.models import Event, EventPerson, EventSchema
+from src.groups.models import Group, GroupSchema, GroupType, Member
+from src.i18n.models import I18NValue, I18NValueSchema
+from src.people.models import Person, PersonSchema, Role
+
+# Registers every blueprint, so all the models and schemas are defined.
+create_app(os.getenv('CC_CONFIG') or 'default')
+
+rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+now = datetime.datetime(2020, 6, 1, 18, 30)
+
+
+def person(i):
+    return Person(id=i, first_name=f'First {i}', last_name=f'Last {i}', gender='F',
+                  birthday=datetime.date(1990, 1, 1) + datetime.timedelta(days=i),
+                  phone='555-0100', email=f'person{i}@example.com', username=f'user{i}',
+                  confirmed=True, active=True,
+                  roles=[Role(id=1, name_i18n='role.registrar', active=True)])
+
+
+people = [person(i) for i in range(rows)]
+group_type = GroupType(id=1, name='Bible study')
+groups = [Group(id=i, name=f'Group {i}', description='Meets weekly', group_type=group_type, active=True,
+                members=[Member(person=people[(i + j) % rows], active=True) for j in range(5)])
+          for i in range(rows)]
+events = [Event(id=i, title=f'Event {i}', description='Potluck', start=now, end=now, active=True,
+                persons=[EventPerson(person=people[i % rows], description='Host')])
+          for i in range(rows)]
+values = [I18NValue(key_id=f'app.key.{i}', locale_code='en-US', gloss=f'Value {i}', verified=True)
+          for i in range(rows)]
+
+cases = [
+    ('PersonSchema', PersonSchema(), people),
+    ('GroupSchema', GroupSchema(), groups),
+    ('EventSchema', EventSchema(exclude=['assets', 'participants', 'teams', 'images', 'groups']), events),
+    ('I18NValueSchema', I18NValueSchema(), values),
+]
+
+print(f"{rows} rows per dump")
+print(f"{'schema':<18}{'marshmallow (ms)':>18}{'compiled (ms)':>16}{'speedup':>10}")
+for name, schema, objects in cases:
+    assert schema.dump(objects, many=True) == Schema.dump(schema, objects, many=True)
+    number = 20
+    slow = timeit.timeit(lambda: Schema.dump(schema, objects, many=True), number=number) / number
+    fast = timeit.timeit(lambda: schema.dump(objects, many=True), number=number) / number
+    print(f"{name:<18}{slow * 1000:>18.2f}{fast * 1000:>16.2f}{slow / fast:>9.1f}x")
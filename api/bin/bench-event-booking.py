@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+# Time the overlap check made when booking an asset for an event, against
+# the number of events the asset was booked for before.
+# Run from the api directory against a scratch database with the current
+# schema, e.g.
+#   CC_CONFIG=dev DEV_DB_URL=postgresql://localhost/cc-bench ./bin/bench-event-booking.py [history ...]
+# The asset and events are deleted afterwards.
+
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import create_app, db
+from src.assets.models import Asset
+from src.events.api import booked
+from src.events.models import Event, EventAsset
+
+app = create_app(os.getenv('CC_CONFIG') or 'default')
+
+histories = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000]
+rounds = 50
+
+
+def loop_check(asset_id, event):
+    """ the check as it was: load every event of the asset and compare """
+    for asset_event in db.session.query(Event).join(EventAsset).filter_by(asset_id=asset_id).all():
+        if event.start <= asset_event.start < event.end \
+                or asset_event.start <= event.start < asset_event.end \
+                or event.start < asset_event.end <= event.end \
+                or asset_event.start < event.end <= asset_event.end:
+            return True
+    return False
+
+
+def best(check):
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        check()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+with app.app_context():
+    db.create_all()
+    asset = Asset(description='bench', active=True)
+    db.session.add(asset)
+    db.session.commit()
+    origin = datetime.datetime(2000, 1, 1)
+    booked_so_far, event_ids = 0, []
+    try:
+        for history in histories:
+            events = [{'title': 'bench', 'start': origin + datetime.timedelta(hours=2 * i),
+                       'end': origin + datetime.timedelta(hours=2 * i + 1), 'active': True}
+                      for i in range(booked_so_far, history)]
+            if events:
+                ids = [event_id for event_id, in db.session.execute(
+                    Event.__table__.insert().values(events).returning(Event.__table__.c.id))]
+                event_ids += ids
+                db.session.execute(EventAsset.__table__.insert().values(
+                    [{'event_id': event_id, 'asset_id': asset.id} for event_id in ids]))
+                db.session.commit()
+                booked_so_far = history
+            event = Event(title='bench', start=origin + datetime.timedelta(hours=2 * history),
+                          end=origin + datetime.timedelta(hours=2 * history + 1), active=True)
+            db.session.add(event)
+            db.session.commit()
+            event_ids.append(event.id)
+            print(f"{history:7} bookings: loop {best(lambda: loop_check(asset.id, event)):8.2f}ms"
+                  f"   range query {best(lambda: booked(EventAsset.asset_id, [asset.id], event)):6.2f}ms")
+    finally:
+        db.session.rollback()
+        db.session.query(EventAsset).filter_by(asset_id=asset.id).delete(synchronize_session=False)
+        db.session.query(Event).filter(Event.id.in_(event_ids)).delete(synchronize_session=False)
+        db.session.query(Asset).filter_by(id=asset.id).delete(synchronize_session=False)
+        db.session.commit()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+# Time `flask i18n load` and `flask i18n import` on a large generated locale.
+# Run from the api directory against a scratch database, e.g.
+#   CC_CONFIG=dev DEV_DB_URL=postgresql://localhost/cc-bench ./bin/bench-i18n-load.py [entries]
+# The entries are written under the `bench` key and deleted afterwards.
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import yaml
+
+from src import create_app, db
+from src.cli.i18n import create_i18n_cli
+from src.i18n.models import I18NValue, I18NKey
+from src.shared.helpers import under_key_path
+
+app = create_app(os.getenv('CC_CONFIG') or 'default')
+create_i18n_cli(app)
+runner = app.test_cli_runner()
+
+entries = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+groups = 100
+tree = {f'group{g}': {f'entry{i}': {'gloss': f'Entry {g}.{i}', 'verified': False}
+                      for i in range(entries // groups)}
+        for g in range(groups)}
+locale_tail = {f'group{g}': {f'entry{i}': {'_desc': f'Entry {i}', 'en-US': f'Entry {g}.{i}', 'es-EC': f'Entrada {g}.{i}'}
+                             for i in range(entries // groups)}
+               for g in range(groups)}
+
+
+def run(label, args):
+    start = time.perf_counter()
+    result = runner.invoke(args=args)
+    elapsed = time.perf_counter() - start
+    if result.exit_code:
+        sys.exit(f"{result.output}\n{result.exception!r}")
+    print(f"{label:28} {elapsed:7.2f}s")
+
+
+with tempfile.TemporaryDirectory() as directory:
+    load_file = os.path.join(directory, 'en-US.json')
+    with open(load_file, 'w') as f:
+        json.dump({'bench': tree}, f)
+    import_file = os.path.join(directory, 'bench.yaml')
+    with open(import_file, 'w') as f:
+        yaml.safe_dump(locale_tail, f)
+
+    print(f"{entries} entries")
+    run('load (new)', ['i18n', 'load', '--silent', '--target', load_file, 'en-US'])
+    run('load (override)', ['i18n', 'load', '--silent', '--target', load_file, 'en-US'])
+    run('load (no override)', ['i18n', 'load', '--silent', '--no-override', '--target', load_file, 'en-US'])
+    run('import (override, 2 locales)', ['i18n', 'import', '--silent', '--target', import_file, 'bench'])
+
+with app.app_context():
+    db.session.query(I18NValue).filter(under_key_path(I18NValue.key_id, 'bench')).delete(synchronize_session=False)
+    db.session.query(I18NKey).filter(under_key_path(I18NKey.id, 'bench')).delete(synchronize_session=False)
+    db.session.commit()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+# Time `flask app load-all` on an empty database and count its statements.
+# Run from the api directory against a scratch database, e.g.
+#   CC_CONFIG=dev DEV_DB_URL=postgresql://localhost/cc-bench ./bin/bench-load-all.py [runs]
+# Every run drops and recreates ALL the tables.
+
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import event
+
+from src import create_app, db
+from src.cli.app import create_app_cli
+
+app = create_app(os.getenv('CC_CONFIG') or 'default')
+create_app_cli(app)
+runner = app.test_cli_runner()
+
+runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+statements = 0
+
+
+@event.listens_for(db.engine, 'before_cursor_execute')
+def count_statement(*args):
+    global statements
+    statements += 1
+
+
+times = []
+with app.app_context():
+    for _ in range(runs):
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        statements = 0
+        start = time.perf_counter()
+        result = runner.invoke(args=['app', 'load-all'])
+        times.append(time.perf_counter() - start)
+        if result.exception:
+            raise result.exception
+
+print(f"load-all over {runs} runs: median {statistics.median(times) * 1000:.0f}ms, "
+      f"min {min(times) * 1000:.0f}ms, {statements} statements")
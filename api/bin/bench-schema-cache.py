@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+# Compare building a schema on every request with reusing a cached one.
+# Run from the api directory: ./bin/bench-schema-cache.py [iterations]
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.events.models import EventSchema
+from src.groups.models import GroupSchema
+from src.shared.helpers import get_schema
+from src.teams.models import TeamSchema
+
+iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+cases = [
+    ('EventSchema(exclude=...)', EventSchema,
+     {'exclude': ['assets', 'participants', 'persons', 'teams', 'images', 'groups']}),
+    ('EventSchema()', EventSchema, {}),
+    ('TeamSchema(exclude=...)', TeamSchema, {'exclude': ['members', 'events']}),
+    ('GroupSchema()', GroupSchema, {}),
+]
+
+print(f"{'schema':<28}{'new (us)':>12}{'cached (us)':>14}{'saved (us)':>13}")
+for name, schema_class, kwargs in cases:
+    new = timeit.timeit(lambda: schema_class(**kwargs), number=iterations)
+    cached = timeit.timeit(lambda: get_schema(schema_class, **kwargs), number=iterations)
+    new_us = new / iterations * 1e6
+    cached_us = cached / iterations * 1e6
+    print(f"{name:<28}{new_us:>12.1f}{cached_us:>14.2f}{new_us - cached_us:>13.1f}")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+# Measure how long the API takes to start, the way gunicorn and `flask` load it,
+# and list the slowest imports from `python -X importtime`.
+# Run from the api directory: ./bin/bench-startup.py [runs] [top]
+# Exits with an error if a test-only or optional heavy module gets imported.
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+API_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# gunicorn imports cc-api.py, which creates the app and registers the CLI.
+LOAD_APP = "import runpy; runpy.run_path('cc-api.py')"
+
+# Only commands or tests that need these should import them.
+LAZY_MODULES = ['faker', 'googletrans', 'src.people.test_people']
+
+runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+top = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+
+
+def run(*args):
+    return subprocess.run([sys.executable, '-W', 'ignore', *args], cwd=API_DIR,
+                          capture_output=True, text=True, check=True)
+
+
+def import_times():
+    """Return {module: cumulative microseconds} from -X importtime."""
+    times = {}
+    for line in run('-X', 'importtime', '-c', LOAD_APP).stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+wall = []
+for _ in range(runs):
+    start = time.perf_counter()
+    run('-c', LOAD_APP)
+    wall.append(time.perf_counter() - start)
+print(f"start-up over {runs} runs: median {statistics.median(wall) * 1000:.0f}ms, "
+      f"min {min(wall) * 1000:.0f}ms")
+
+times = import_times()
+print("\nslowest imports (cumulative):")
+for module, micros in sorted(times.items(), key=lambda item: item[1], reverse=True)[:top]:
+    print(f"{micros / 1000:10.1f}ms  {module}")
+
+loaded = [module for module in LAZY_MODULES if module in times]
+if loaded:
+    sys.exit(f"\nimported at start-up but should be lazy: {', '.join(loaded)}")
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+# Time list_to_tree and tree_to_list on a generated catalog of dotted keys.
+# Run from the api directory: ./bin/bench-tree-convert.py [entries] [repeat]
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.shared.helpers import list_to_tree, tree_to_list
+
+entries = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+# Modules with sections and groups two to four levels deep, each holding
+# five to forty keys, like the locale files in i18n/ but larger.
+random.seed(1)
+paths = []
+while len(paths) < entries:
+    parent = '.'.join(f'{level}{random.randint(0, 30)}' for level in ('module', 'section', 'group', 'part')
+                      [:random.randint(2, 4)])
+    paths += [f'{parent}.key{i}' for i in range(random.randint(5, 40))]
+# Drop repeated keys and keys that are also the parent of another key.
+paths = set(paths[:entries])
+parents = {path.rsplit('.', i)[0] for path in paths for i in range(1, path.count('.') + 1)}
+paths = sorted(paths - parents)
+
+sorted_list = [{'path': path, 'value': path} for path in paths]
+shuffled_list = sorted_list[:]
+random.shuffle(shuffled_list)
+tree = list_to_tree(sorted_list)
+
+
+def best(fn):
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+
+
+print(f"{len(paths)} entries, best of {repeat}")
+print(f"list_to_tree, sorted   {best(lambda: list_to_tree(sorted_list)):8.1f}ms")
+print(f"list_to_tree, shuffled {best(lambda: list_to_tree(shuffled_list)):8.1f}ms")
+print(f"tree_to_list           {best(lambda: list(tree_to_list(tree))):8.1f}ms")
@@ -6,6 +6,7 @@ load_dotenv()
 
 from src.cli.app import create_app_cli
 from src.cli.courses import create_course_cli
+from src.cli.emails import create_email_cli
 from src.cli.events import create_event_cli
 from src.cli.faker import create_faker_cli
 from src.cli.groups import create_group_cli
@@ -18,6 +19,7 @@ app = create_app(os.getenv('CC_CONFIG') or 'default')
 create_account_cli(app)
 create_app_cli(app)
 create_course_cli(app)
+create_email_cli(app)
 create_event_cli(app)
 create_group_cli(app)
 create_faker_cli(app)
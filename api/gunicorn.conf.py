@@ -0,0 +1,23 @@
+# gunicorn settings; `gunicorn cc-api:app` reads this file from the api directory.
+#
+# The app is loaded and warmed up once in the master and the workers are
+# forked from it, sharing that memory copy-on-write.
+
+import gc
+import os
+
+preload_app = True
+workers = int(os.getenv('GUNICORN_WORKERS', 4))
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded, before any worker is forked.
+    from src.warmup import warm_up
+    warm_up(server.app.wsgi())
+    # Keep the collector from touching (and so copying) the shared objects in the workers.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from src import db
+    db.dispose_after_fork()
@@ -0,0 +1,24 @@
+"""Locale of the emails sent to a person
+
+Revision ID: 2b6d8f3e1a90
+Revises: c7a9e2f04b13
+Create Date: 2026-10-19 15:08:52.140377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b6d8f3e1a90'
+down_revision = 'c7a9e2f04b13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('people_person', sa.Column('locale_code', sa.String(length=5), nullable=True))
+
+
+def downgrade():
+    op.drop_column('people_person', 'locale_code')
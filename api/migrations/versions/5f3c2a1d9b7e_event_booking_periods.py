@@ -0,0 +1,69 @@
+"""Event booking periods and double-booking exclusion constraints
+
+Revision ID: 5f3c2a1d9b7e
+Revises:
+Create Date: 2026-10-19 10:12:40.318201
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '5f3c2a1d9b7e'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+BOOKINGS = [('events_eventasset', 'asset_id'), ('events_eventteam', 'team_id'), ('events_eventperson', 'person_id')]
+
+
+def upgrade():
+    op.execute("""
+CREATE OR REPLACE FUNCTION events_booking_period() RETURNS trigger AS $$
+BEGIN
+    SELECT tsrange(start, greatest(start, "end")) INTO NEW.during
+    FROM events_event WHERE id = NEW.event_id;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql""")
+    op.execute("""
+CREATE OR REPLACE FUNCTION events_event_reschedule() RETURNS trigger AS $$
+BEGIN
+    UPDATE events_eventasset SET during = tsrange(NEW.start, greatest(NEW.start, NEW."end"))
+    WHERE event_id = NEW.id;
+    UPDATE events_eventteam SET during = tsrange(NEW.start, greatest(NEW.start, NEW."end"))
+    WHERE event_id = NEW.id;
+    UPDATE events_eventperson SET during = tsrange(NEW.start, greatest(NEW.start, NEW."end"))
+    WHERE event_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql""")
+
+    for table, resource_column in BOOKINGS:
+        op.add_column(table, sa.Column('during', postgresql.TSRANGE()))
+        op.execute(f"""
+UPDATE {table} SET during = tsrange(e.start, greatest(e.start, e."end"))
+FROM events_event e WHERE e.id = {table}.event_id""")
+        # Fails if the table already holds double bookings; those have to be
+        # sorted out by hand first.
+        op.execute(f"""
+ALTER TABLE {table} ADD CONSTRAINT {table}_no_overlap
+    EXCLUDE USING gist (int4range({resource_column}, {resource_column}, '[]') WITH &&, during WITH &&)""")
+        op.execute(f"""
+CREATE TRIGGER {table}_period BEFORE INSERT OR UPDATE OF event_id ON {table}
+    FOR EACH ROW EXECUTE PROCEDURE events_booking_period()""")
+
+    op.execute("""
+CREATE TRIGGER events_event_reschedule AFTER UPDATE OF start, "end" ON events_event
+    FOR EACH ROW EXECUTE PROCEDURE events_event_reschedule()""")
+
+
+def downgrade():
+    op.execute("DROP TRIGGER events_event_reschedule ON events_event")
+    for table, _ in BOOKINGS:
+        op.execute(f"DROP TRIGGER {table}_period ON {table}")
+        op.drop_constraint(f'{table}_no_overlap', table)
+        op.drop_column(table, 'during')
+    op.execute("DROP FUNCTION events_event_reschedule()")
+    op.execute("DROP FUNCTION events_booking_period()")
@@ -0,0 +1,28 @@
+"""GiST indexes on booking periods, for availability searches
+
+Revision ID: 8e41d07c2a55
+Revises: 5f3c2a1d9b7e
+Create Date: 2026-10-19 11:02:17.904512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e41d07c2a55'
+down_revision = '5f3c2a1d9b7e'
+branch_labels = None
+depends_on = None
+
+BOOKING_TABLES = ['events_eventasset', 'events_eventteam', 'events_eventperson']
+
+
+def upgrade():
+    for table in BOOKING_TABLES:
+        op.create_index(f'ix_{table}_during', table, ['during'], postgresql_using='gist')
+
+
+def downgrade():
+    for table in BOOKING_TABLES:
+        op.drop_index(f'ix_{table}_during', table)
@@ -0,0 +1,44 @@
+"""Outbox of emails for `flask mail-worker`
+
+Revision ID: c7a9e2f04b13
+Revises: 8e41d07c2a55
+Create Date: 2026-10-19 14:21:36.512088
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'c7a9e2f04b13'
+down_revision = '8e41d07c2a55'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'emails_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('subject', sa.String(length=255), nullable=False),
+        sa.Column('sender', sa.String(length=255), nullable=True),
+        sa.Column('recipients', postgresql.ARRAY(sa.String(length=255)), nullable=False),
+        sa.Column('cc', postgresql.ARRAY(sa.String(length=255)), nullable=False),
+        sa.Column('bcc', postgresql.ARRAY(sa.String(length=255)), nullable=False),
+        sa.Column('reply_to', sa.String(length=255), nullable=True),
+        sa.Column('body', sa.Text(), nullable=True),
+        sa.Column('html', sa.Text(), nullable=True),
+        sa.Column('queued', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('send_after', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('sent', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_emails_outbox_unsent', 'emails_outbox', ['send_after'],
+                    postgresql_where=sa.text('sent IS NULL'))
+
+
+def downgrade():
+    op.drop_index('ix_emails_outbox_unsent', 'emails_outbox')
+    op.drop_table('emails_outbox')
@@ -8,7 +8,7 @@ from flask_mail import Mail
 API_DIR = abspath(join(dirname(__file__), '..'))
 
 from .confcc import config
-from . import conflogger
+from . import compression, conflogger, jsonprovider
 from .db import DbConfig
 
 db = DbConfig()
@@ -26,6 +26,12 @@ def create_app(config_name):
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
 
+    # Pick the JSON encoder for responses.
+    jsonprovider.init_app(app)
+
+    # Compress large responses.
+    compression.init_app(app)
+
     # Set up the mailing service.
     mail.init_app(app)
 
@@ -36,6 +42,10 @@ def create_app(config_name):
     jwt.init_app(app)
 
     # Attached CC modules
+    # These stay eager: the models refer to each other by name, so every
+    # mapper has to be imported before the first query, and each package
+    # loads its api along with its models. Only the views themselves
+    # (about 100ms of the start-up) could be deferred.
     from .attributes import attributes as attributes_blueprint
     app.register_blueprint(attributes_blueprint,
                            url_prefix='/api/v1/attributes')
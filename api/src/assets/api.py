@@ -8,7 +8,7 @@ from . import assets
 from .models import Asset, AssetSchema
 from .. import db
 from ..events.models import EventAsset
-from ..shared.helpers import modify_entity, get_exclusion_list
+from ..shared.helpers import modify_entity, get_exclusion_list, get_schema
 
 
 # ---- Asset
@@ -16,7 +16,8 @@ from ..shared.helpers import modify_entity, get_exclusion_list
 @assets.route('/', methods=['POST'])
 @jwt_required
 def create_asset():
-    asset_schema = AssetSchema(
+    asset_schema = get_schema(
+        AssetSchema,
         exclude=get_exclusion_list(
             request.args, ['location']))
     try:
@@ -33,7 +34,8 @@ def create_asset():
 @assets.route('/')
 @jwt_required
 def read_all_assets():
-    asset_schema = AssetSchema(
+    asset_schema = get_schema(
+        AssetSchema,
         exclude=get_exclusion_list(
             request.args, ['location']))
     query = db.session.query(Asset).add_columns(
@@ -86,7 +88,8 @@ def read_all_assets():
 @assets.route('/<asset_id>')
 @jwt_required
 def read_one_asset(asset_id):
-    asset_schema = AssetSchema(
+    asset_schema = get_schema(
+        AssetSchema,
         exclude=get_exclusion_list(
             request.args, ['location']))
     asset = db.session.query(Asset).filter_by(
@@ -109,7 +112,8 @@ def read_one_asset(asset_id):
 @assets.route('/<asset_id>', methods=['PUT'])
 @jwt_required
 def replace_asset(asset_id):
-    asset_schema = AssetSchema(
+    asset_schema = get_schema(
+        AssetSchema,
         exclude=get_exclusion_list(
             request.args, ['location']))
     try:
@@ -123,7 +127,8 @@ def replace_asset(asset_id):
 @assets.route('/<asset_id>', methods=['PATCH'])
 @jwt_required
 def update_asset(asset_id):
-    asset_schema = AssetSchema(
+    asset_schema = get_schema(
+        AssetSchema,
         exclude=get_exclusion_list(
             request.args, ['location']))
     try:
@@ -5,7 +5,7 @@ from marshmallow import fields, Schema
 from marshmallow.validate import Range
 from sqlalchemy import Column, Integer, ForeignKey, Boolean
 from sqlalchemy.orm import relationship
-from ..i18n.models import i18n_create, I18NLocale, i18n_check
+from ..i18n.models import i18n_insert_missing
 
 from .. import db
 from ..db import Base
@@ -47,31 +47,20 @@ class Attribute(Base):
 
     @classmethod
     def load_types_from_file(cls, file_name='attribute_types.json'):
-        count = 0
         file_path = os.path.abspath(os.path.join(
             __file__, os.path.pardir, 'data', file_name))
 
         with open(file_path, 'r') as fp:
-
             attribute_types = json.load(fp)
 
-            for attribute_type in attribute_types:
-                attribute_name = attribute_type['name']
-                name_i18n = f'attribute.{attribute_name}'
-
-                for locale in attribute_type['locales']:
-                    locale_code = locale['locale_code']
-                    if not db.session.query(I18NLocale).get(locale_code):
-                        db.session.add(I18NLocale(code=locale_code, desc=''))
-                    if not i18n_check(name_i18n, locale_code):
-                        i18n_create(
-                            name_i18n,
-                            locale_code,
-                            locale['name'],
-                            description=f"Attribute type {attribute_name}")
-                count += 1
-            db.session.commit()
-            return count
+        i18n_insert_missing(
+            {f"attribute.{attribute_type['name']}": f"Attribute type {attribute_type['name']}"
+             for attribute_type in attribute_types},
+            [{'key_id': f"attribute.{attribute_type['name']}", 'locale_code': locale['locale_code'],
+              'gloss': locale['name'], 'verified': False}
+             for attribute_type in attribute_types for locale in attribute_type['locales']])
+        db.session.commit()
+        return len(attribute_types)
 
 
 class AttributeSchema(Schema):
@@ -3,7 +3,7 @@ from datetime import datetime
 
 from flask import jsonify, request, current_app
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_raw_jwt
-from ..shared.helpers import jwt_not_required
+from ..shared.helpers import jwt_not_required, read_write, get_schema
 
 from . import auth
 from .blacklist_helpers import (
@@ -15,7 +15,6 @@ from .blacklist_helpers import (
 from .. import jwt, db
 from ..auth.exceptions import TokenNotFound
 from ..people.models import Person, PersonSchema, Role, RoleSchema
-from ..people.test_people import role_object_factory, person_object_factory
 
 blacklist = set()
 person_schema = PersonSchema()
@@ -74,7 +73,7 @@ def check_if_token_revoked(decoded_token):
 @jwt.user_claims_loader
 def add_claims_to_access_token(person):
     roles = person.roles
-    role_schema = RoleSchema()
+    role_schema = get_schema(RoleSchema)
     user_roles = []
     for role in roles:
         user_roles.append(role_schema.dump(role)['nameI18n'])
@@ -89,10 +88,14 @@ def load_user_identity(person):
 
 @auth.route('/test/jwt')
 @jwt_not_required
+@read_write
 def get_test_jwt():
     if current_app.config['TESTING']:
+        # Test factories pull in Faker; keep them out of production workers.
+        from ..people.test_people import role_object_factory, person_object_factory
+
         # TODO: parameterize the endpoint to return token with specified roles
-        test_roles = [Role(**RoleSchema().load(role_object_factory()))]
+        test_roles = [Role(**get_schema(RoleSchema).load(role_object_factory()))]
         test_person = Person(**person_schema.load(person_object_factory()))
         test_person.username = 'test-user'
         test_person.roles += test_roles
@@ -126,7 +129,7 @@ def login_test():
         success = False
         response['person'] = f"Can't fetch <Person(username='{username}')>"
     else:
-        person_schema = PersonSchema()
+        person_schema = get_schema(PersonSchema)
         response['person'] = person_schema.dump(person)
 
     response['status'] = 'success' if success else 'failure'
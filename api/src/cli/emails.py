@@ -0,0 +1,55 @@
+import smtplib
+import time
+
+import click
+from flask import current_app
+
+from ..emails.outbox import send_due
+
+
+def create_email_cli(app):
+    @app.cli.command('mail-worker', help="Send the emails in the outbox")
+    @click.option('--batch-size', type=int, help="Emails sent per connection (default MAIL_OUTBOX_BATCH_SIZE)")
+    @click.option('--once', is_flag=True, help="Exit once no email is due instead of waiting for more")
+    def mail_worker(batch_size, once):
+        config = current_app.config
+        batch_size = batch_size or config['MAIL_OUTBOX_BATCH_SIZE']
+        total_sent, total_postponed, failures = 0, 0, 0
+        started = time.perf_counter()
+
+        def report():
+            elapsed = time.perf_counter() - started
+            click.echo(f"Sent {total_sent} emails in {elapsed:.1f}s ({total_sent / elapsed:.1f}/s), "
+                       f"postponed {total_postponed}")
+
+        try:
+            while True:
+                batch_started = time.perf_counter()
+                try:
+                    sent, postponed = send_due(batch_size)
+                except (smtplib.SMTPException, OSError) as err:
+                    # Can't reach the mail server: wait, doubling the wait
+                    # up to 64 retry delays, and leave the emails due.
+                    failures += 1
+                    if once:
+                        click.echo(f"Mail server unavailable: {err}", err=True)
+                        report()
+                        exit(1)
+                    wait = config['MAIL_OUTBOX_RETRY_DELAY'] * 2 ** min(failures - 1, 6)
+                    click.echo(f"Mail server unavailable: {err}; retrying in {wait:.0f}s", err=True)
+                    time.sleep(wait)
+                    continue
+                failures = 0
+                if sent or postponed:
+                    elapsed = time.perf_counter() - batch_started
+                    click.echo(f"Sent {sent}, postponed {postponed} in {elapsed * 1000:.0f}ms "
+                               f"({sent / elapsed:.1f}/s)")
+                    total_sent += sent
+                    total_postponed += postponed
+                if sent + postponed < batch_size:
+                    if once:
+                        break
+                    time.sleep(config['MAIL_OUTBOX_POLL_INTERVAL'])
+        except KeyboardInterrupt:
+            pass
+        report()
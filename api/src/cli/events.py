@@ -54,8 +54,8 @@ def create_event_cli(app):
                 2019, 2, 22, 16, 0))
         e2 = create_event(
             db.session, title='event2', description='description', start=datetime(
-                2019, 2, 21, 8, 0), end=datetime(
-                2019, 2, 22, 16, 0))
+                2019, 2, 23, 8, 0), end=datetime(
+                2019, 2, 24, 16, 0))
         e3 = create_event(
             db.session, title='event3', description='description', start=datetime(
                 2019, 2, 21, 8, 0), end=datetime(
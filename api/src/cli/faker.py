@@ -1,32 +1,32 @@
 from flask.cli import AppGroup
 from .. import db
-from ..courses.test_courses import create_multiple_courses, create_multiple_course_offerings, \
-    create_multiple_diplomas, create_multiple_students, create_class_meetings, \
-    create_diploma_awards, create_class_attendance, create_multiple_prerequisites, \
-    create_course_completion
-from ..events.create_event_data import create_events_test_data
-from ..groups.create_group_data import create_group_test_data
-from ..images.create_image_data import create_images_test_data
-from ..people.test_people import create_multiple_people, create_person_roles
-from ..places.test_places import create_multiple_areas, create_multiple_addresses, create_multiple_locations
 
 
 def create_faker_cli(app):
+    # The data factories import Faker and the test modules, which take a while
+    # to load; import them in the commands so other commands and the app don't pay for it.
     faker_cli = AppGroup('faker', help="Load fake data for testing")
 
     @faker_cli.command('people', help='Fake people')
     def fake_people():
+        from ..people.test_people import create_multiple_people, create_person_roles
         create_multiple_people(db.session, 17)
         create_person_roles(db.session, 0.75)
 
     @faker_cli.command("places", help="Fake places")
     def fake_places():
+        from ..places.test_places import create_multiple_areas, create_multiple_addresses, create_multiple_locations
         create_multiple_areas(db.session, 5)
         create_multiple_addresses(db.session, 10)
         create_multiple_locations(db.session, 20)
 
     @faker_cli.command("courses", help="Fake courses")
     def fake_courses():
+        from ..courses.test_courses import create_multiple_courses, create_multiple_course_offerings, \
+            create_multiple_diplomas, create_multiple_students, create_class_meetings, \
+            create_diploma_awards, create_class_attendance, create_multiple_prerequisites, \
+            create_course_completion
+        from ..people.test_people import create_multiple_people
         create_multiple_people(db.session, 17)
         create_multiple_courses(db.session, 12)
         create_multiple_course_offerings(db.session, 25)
@@ -40,14 +40,17 @@ def create_faker_cli(app):
 
     @faker_cli.command("events", help="Fake events")
     def fake_events():
+        from ..events.create_event_data import create_events_test_data
         create_events_test_data(db.session)
 
     @faker_cli.command("groups", help="Fake groups")
     def fake_groups():
+        from ..groups.create_group_data import create_group_test_data
         create_group_test_data(db.session)
 
     @faker_cli.command("images", help="Fake images")
     def fake_images():
+        from ..images.create_image_data import create_images_test_data
         # Always put this close to last (since it has dependencies in all of
         # the major modules)
         create_images_test_data(db.session)
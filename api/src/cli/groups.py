@@ -1,11 +1,6 @@
 from flask.cli import AppGroup
 
 from .. import db
-from ..groups.create_group_data import (
-    create_hierarchy_test_case_1,
-    create_hierarchy_test_case_2,
-    create_multiple_group_types,
-    create_multiple_manager_types)
 
 
 def create_group_cli(app):
@@ -20,6 +15,10 @@ def create_group_cli(app):
         Once the test data is generated, one should be able to view the
         leadership hierarchy under the UI's treeview page.
         """
+        from ..groups.create_group_data import (
+            create_hierarchy_test_case_1,
+            create_multiple_group_types,
+            create_multiple_manager_types)
         create_multiple_group_types(db.session, 5)
         create_multiple_manager_types(db.session, 5)
         create_hierarchy_test_case_1(db.session)
@@ -33,6 +32,10 @@ def create_group_cli(app):
         Once the test data is generated, one should see a warning under the
         UI's treeview page.
         """
+        from ..groups.create_group_data import (
+            create_hierarchy_test_case_2,
+            create_multiple_group_types,
+            create_multiple_manager_types)
         create_multiple_group_types(db.session, 5)
         create_multiple_manager_types(db.session, 5)
         create_hierarchy_test_case_2(db.session)
@@ -3,16 +3,20 @@ import os
 import re
 import sys
 import tempfile
-import time
+from concurrent.futures import ThreadPoolExecutor
 
 import click
-import googletrans
 import yaml
+from flask import current_app
 from flask.cli import AppGroup
+from sqlalchemy import and_
+from sqlalchemy.orm import aliased
 
 from .. import API_DIR, db
-from ..i18n.models import I18NLocale, I18NKey, I18NValue
-from ..shared.helpers import (tree_to_list, list_to_tree, BadTreeStructure, BadListKeyPath, get_or_create)
+from ..i18n.models import I18NLocale, I18NKey, I18NValue, i18n_bulk_upsert, i18n_existing
+from .translators import TRANSLATORS, TokenBucket, TranslationMemory
+from ..shared.helpers import (tree_to_list, list_to_tree, BadTreeStructure, BadListKeyPath, get_or_create,
+                              under_key_path)
 
 
 # --- exceptions
@@ -67,7 +71,28 @@ def validate_locale_allow_none(ctx, param, value):
         return value
 
 
-def get_formatted_language_map():
+def load_translation_memory(source_locale, destination_locale):
+    """ index the verified translations from source_locale into destination_locale """
+    source_value, destination_value = aliased(I18NValue), aliased(I18NValue)
+    memory = TranslationMemory()
+    pairs = db.session.query(source_value.gloss, destination_value.gloss) \
+        .join(destination_value, destination_value.key_id == source_value.key_id) \
+        .filter(source_value.locale_code == source_locale,
+                destination_value.locale_code == destination_locale,
+                destination_value.verified) \
+        .order_by(source_value.key_id)
+    for source_gloss, destination_gloss in pairs:
+        memory.add(source_gloss, destination_gloss)
+    return memory
+
+
+def get_language_map():
+    """ googletrans is slow to import, so only the commands that translate load it """
+    import googletrans
+    return googletrans.LANGUAGES
+
+
+def get_formatted_language_map(lang_map=None):
     formatter = "{:10}| {:10}"
     divider = "-" * 25
     title = "All available language codes:\n"
@@ -80,12 +105,12 @@ def get_formatted_language_map():
         ] +
         [
             formatter.format(code, desc)
-            for code, desc in googletrans.LANGUAGES.items()
+            for code, desc in (lang_map or get_language_map()).items()
         ])
 
 
 def is_valid_language_code(language_code):
-    return language_code in googletrans.LANGUAGES
+    return language_code in get_language_map()
 
 
 def validate_language(ctx, param, value):
@@ -185,7 +210,7 @@ def read_locale_tail_tree(parent_path=""):
     # otherwise, find all sub-entries and build a tree
     query = db.session.query(I18NKey)
     if parent_path:
-        query = query.filter(I18NKey.id.like(f'{parent_path}.%'))
+        query = query.filter(under_key_path(I18NKey.id, parent_path))
     all_keys = query.all()
     if all_keys:
         lst = [key_to_list_item(key, strip_key=parent_path)
@@ -235,13 +260,13 @@ def write_locale_tail_tree(tree, parent_path="", override=True, verbose=False):
                 f"Must specify a path when overriding with a leaf node {tree}")
         # make sure parent_path is not an intermediate path
         child = db.session.query(I18NKey).filter(
-            I18NKey.id.like(f'{parent_path}.%')).first()
+            under_key_path(I18NKey.id, parent_path)).first()
         if child:
             raise BadTreeStructure(
                 f"[{parent_path}] is an intermediate path with child [{child.id}], "
                 "cannot update with a leaf node")
         # construct a single item to be written
-        lst = [{'path': [], 'value': tree}]
+        lst = [{'path': '', 'value': tree}]
     # otherwise, flatten the given tree
     else:
         # make sure parent_path is not an entry
@@ -251,51 +276,44 @@ def write_locale_tail_tree(tree, parent_path="", override=True, verbose=False):
                 f"[{parent_path}] is already an entry, cannot write sub-entries onto that")
 
         lst = tree_to_list(tree, is_leaf)
+    items = []
     for item in lst:
-        key_list = item['path']
+        key_id = item['path']
         if parent_path:
-            key_list.insert(0, parent_path)
-        key_id = '.'.join(key_list)
-        key = get_or_create(db.session, I18NKey, {'id': key_id})
-        existing_values = {value.locale_code: value for value in key.values}
-        for locale_code, gloss in item['value'].items():
+            key_id = f"{parent_path}.{key_id}" if key_id else parent_path
+        items.append((key_id, item['value']))
+    locale_codes = {locale_code for _, node in items for locale_code in node if locale_code != '_desc'}
+    existing_keys, existing_values = i18n_existing([key_id for key_id, _ in items], locale_codes)
+
+    keys, values = {}, []
+    for key_id, node in items:
+        keys[key_id] = None
+        for locale_code, gloss in node.items():
             if locale_code == '_desc':
                 # process description
-                if key.desc and not override:
+                if existing_keys.get(key_id) and not override:
                     skip_count += 1
                     continue
                 else:
-                    key.desc = gloss
+                    keys[key_id] = gloss
                     if verbose:
                         click.echo(
                             f"overriding [{key_id}]'s description with [{gloss}]")
             else:
                 # process key value linked to the locale
-                if locale_code in existing_values:
+                if (key_id, locale_code) in existing_values:
                     if not override:
                         skip_count += 1
                         continue
-                    else:
-                        existing_values[locale_code].gloss = gloss
-                        existing_values[locale_code].verified = False
-                        if verbose:
-                            click.echo(
-                                f"overriding [{key_id}] in [{locale_code}] with [{gloss}]")
-                else:
-                    locale = get_or_create(
-                        db.session, I18NLocale, {'code': locale_code})
-                    value = I18NValue(
-                        gloss=gloss,
-                        verified=False,
-                        key_id=key_id,
-                        locale_code=locale_code
-                    )
-                    key.values.append(value)
-                    if verbose:
+                    elif verbose:
                         click.echo(
-                            f"adding [{key_id}] in [{locale_code}] with [{gloss}]")
+                            f"overriding [{key_id}] in [{locale_code}] with [{gloss}]")
+                elif verbose:
+                    click.echo(
+                        f"adding [{key_id}] in [{locale_code}] with [{gloss}]")
+                values.append({'key_id': key_id, 'locale_code': locale_code, 'gloss': gloss, 'verified': False})
             entry_count += 1
-        db.session.add(key)
+    i18n_bulk_upsert(keys, values)
     db.session.commit()
     return {'entry_count': entry_count, 'skip_count': skip_count}
 
@@ -350,31 +368,24 @@ def create_i18n_cli(app):
                    and 'gloss' in node \
                    and isinstance(node['gloss'], str)
 
-        entries = tree_to_list(tree, is_leaf=is_leaf)
-        locale = get_or_create(db.session, I18NLocale, {'code': locale_name})
-        for entry in entries:
-            key_id = '.'.join(entry['path'])
-            key = get_or_create(db.session, I18NKey, {'id': key_id})
-            value = db.session.query(I18NValue).filter_by(
-                key_id=key.id, locale_code=locale.code).first()
-            if value:
-                if override:
-                    value.gloss = entry['value']['gloss']
-                    value.verified = entry['value']['verified']
-                else:
-                    skip_count += 1
-                    continue
-            else:
-                value = I18NValue(
-                    gloss=entry['value']['gloss'],
-                    verified=entry['value']['verified'],
-                    key_id=key.id,
-                    locale_code=locale.code
-                )
-            db.session.add(value)
+        entries = list(tree_to_list(tree, is_leaf=is_leaf))
+        key_ids = [entry['path'] for entry in entries]
+        existing_keys, existing_values = i18n_existing(key_ids, [locale_name])
+        values = []
+        for key_id, entry in zip(key_ids, entries):
+            if (key_id, locale_name) in existing_values and not override:
+                skip_count += 1
+                continue
+            values.append({
+                'key_id': key_id,
+                'locale_code': locale_name,
+                'gloss': entry['value']['gloss'],
+                'verified': entry['value']['verified']
+            })
             entry_count += 1
             if verbose:
                 click.echo(f"adding I18NValue [{key_id}: {entry['value']}]")
+        i18n_bulk_upsert({key_id: None for key_id in key_ids if key_id not in existing_keys}, values)
         db.session.commit()
         click.echo("Successfully loaded data into the database")
         click.echo(
@@ -460,11 +471,11 @@ def create_i18n_cli(app):
         entry_count = 0
         skip_count = 0
         tree = json.load(target)
-        entries = tree_to_list(tree)
+        entries = list(tree_to_list(tree))
         click.echo(
             f"loading descriptions from [{getattr(target, 'name', '(unknown stream)')}]")
         for entry in entries:
-            key_id = '.'.join(entry['path'])
+            key_id = entry['path']
             key = db.session.query(I18NKey).filter_by(id=key_id).first()
             description = entry['value']
             if not key:
@@ -750,9 +761,9 @@ def create_i18n_cli(app):
         value_query = db.session.query(I18NValue)
 
         if recursive:
-            pattern = f"{path}.%" if path else "%"
-            value_query = value_query.filter(
-                I18NValue.key_id.like(pattern))
+            if path:
+                value_query = value_query.filter(
+                    under_key_path(I18NValue.key_id, path))
         else:
             if not path:
                 raise click.BadParameter(
@@ -867,31 +878,76 @@ def create_i18n_cli(app):
         '--delay-timer',
         type=click.FLOAT,
         default=0.3,
-        help="A delay timer to prevent too frequent requests")
+        help="Average seconds between requests to the translator, to prevent too frequent requests")
+    @click.option(
+        '--translator',
+        type=click.Choice(TRANSLATORS.keys()),
+        help="The translation backend [default: I18N_TRANSLATOR setting]")
+    @click.option(
+        '--batch-size',
+        type=click.IntRange(min=1),
+        default=50,
+        show_default=True,
+        help="Entries per request to the translator")
+    @click.option(
+        '--workers',
+        type=click.IntRange(min=1),
+        default=4,
+        show_default=True,
+        help="Requests to the translator that may run at once")
+    @click.option(
+        '--memory/--no-memory',
+        'use_memory',
+        default=True,
+        show_default=True,
+        help="Reuse verified translations of the same text")
+    @click.option(
+        '--checkpoint',
+        type=click.IntRange(min=1),
+        default=200,
+        show_default=True,
+        help="Save the translated entries every so many entries")
     def translate_entries(
             source_locale,
             destination_locale,
             src_lang,
             dest_lang,
             interactive,
-            delay_timer
+            delay_timer,
+            translator,
+            batch_size,
+            workers,
+            use_memory,
+            checkpoint
     ):
         """ Complete entries in the database with <dest-locale> by
         translating from <src-locale>.
 
+        Texts that already have a verified translation in <dest-locale>,
+        exactly or up to case and spacing, reuse it without asking the
+        translator, and each other text is translated once.
+
+        Entries are saved as they are translated, every --checkpoint
+        entries; if the command is interrupted, running it again picks up
+        the entries that are still missing.
+
         Example usage:
 
         \b
             flask i18n translate en-US es-EC
+
+        \b
+            flask i18n translate --translator offline en-US es-EC
         """
-        lang_map = googletrans.LANGUAGES
+        translator = TRANSLATORS[translator or current_app.config['I18N_TRANSLATOR']]()
+        lang_map = translator.languages()
 
         # try to deduce source and destination language if not given
         src_lang = src_lang or next(
             (lang for lang in lang_map.keys()
              if lang[:2].lower() == source_locale[:2].lower()), None)
         if not src_lang:
-            click.echo(get_formatted_language_map())
+            click.echo(get_formatted_language_map(lang_map))
             click.echo(
                 f"Cannot deduce source language from the given locale {source_locale}")
             click.echo(
@@ -903,88 +959,128 @@ def create_i18n_cli(app):
             (lang for lang in lang_map.keys()
              if lang[:2].lower() == destination_locale[:2].lower()), None)
         if not dest_lang:
-            click.echo(get_formatted_language_map())
+            click.echo(get_formatted_language_map(lang_map))
             click.echo(
                 f"Cannot deduce destination language from the given locale {destination_locale}")
             click.echo(
                 "Try to specify the destination language with --dest-lang explicitly")
             exit(1)
 
-        t = googletrans.Translator()
+        # the source values that have no destination value yet
+        destination_value = aliased(I18NValue)
+        missing = db.session.query(I18NValue.key_id, I18NValue.gloss) \
+            .outerjoin(destination_value, and_(destination_value.key_id == I18NValue.key_id,
+                                               destination_value.locale_code == destination_locale)) \
+            .filter(I18NValue.locale_code == source_locale, destination_value.key_id.is_(None)) \
+            .order_by(I18NValue.key_id) \
+            .all()
+
+        # reuse earlier translations of the same text, and translate
+        # each of the other texts once
+        memory = load_translation_memory(source_locale, destination_locale) if use_memory \
+            else TranslationMemory()
+        remembered, unknown = [], {}
+        for key_id, source_gloss in missing:
+            if memory.get(source_gloss) is not None:
+                remembered.append((key_id, source_gloss))
+            else:
+                unknown.setdefault(source_gloss, []).append(key_id)
+        texts = list(unknown)
+        batches = [texts[start:start + batch_size] for start in range(0, len(texts), batch_size)]
+
+        bucket = TokenBucket(1 / delay_timer if delay_timer > 0 else float('inf'), capacity=workers)
+
+        def translate_batch(batch):
+            bucket.acquire()
+            return translator.translate(batch, src=src_lang, dest=dest_lang)
+
+        def translated_entries(executor):
+            """ (key id, source gloss, translation) of the missing entries:
+            the remembered ones, then the others as their batches are translated """
+            for key_id, source_gloss in remembered:
+                yield key_id, source_gloss, memory.get(source_gloss)
+            for batch, glosses in zip(batches, executor.map(translate_batch, batches)):
+                for source_gloss, gloss in zip(batch, glosses):
+                    for key_id in unknown[source_gloss]:
+                        yield key_id, source_gloss, gloss
 
-        # start translation
         entry_count = 0
-        all_keys = db.session.query(I18NKey).all()
-        for key in all_keys:
-            source_value, destination_value = None, None
-            for value in key.values:
-                if value.locale_code == source_locale:
-                    source_value = value
-                if value.locale_code == destination_locale:
-                    destination_value = value
-            if not source_value or destination_value:
-                # skip if source doesn't exist or
-                # there is already a destination value
-                continue
-            gloss = t.translate(
-                source_value.gloss,
-                src=src_lang,
-                dest=dest_lang).text
-            if interactive:
-                click.echo(
-                    f"[{key.id}] has no value in [{destination_locale}]")
-                click.echo(
-                    f"add translation [{source_value.gloss}] => [{gloss}]?")
-                click.echo()
-                options = {
-                    'y': 'Yes, use the current translation',
-                    'n': 'No, skip this entry',
-                    'e': 'Edit the current entry',
-                    'a': 'Use given translation for All following entries',
-                    'q': 'Quit the program'
-                }
-                for k, v in options.items():
-                    click.echo("{:3}: {}".format(k, v))
-                choice = click.prompt(
-                    "=> ",
-                    type=click.Choice(
-                        options.keys(),
-                        case_sensitive=False),
-                    default='y')
-            else:
-                choice = 'y'
-
-            if choice == 'e':
-                gloss = click.prompt(
-                    "Enter a new translation to override the default one",
-                    default=gloss)
-                choice = 'y'
-            elif choice == 'a':
-                interactive = False
-                choice = 'y'
-
-            if choice == 'y':
-                # make sure locale exists
-                get_or_create(
-                    db.session, I18NLocale, {
-                        'code': destination_locale})
-                destination_value = I18NValue(
-                    key_id=key.id,
-                    locale_code=destination_locale,
-                    gloss=gloss,
-                    verified=False
-                )
-                db.session.add(destination_value)
-                entry_count += 1
-                click.echo(f"Entry [{gloss}] added")
-                if not interactive:
-                    time.sleep(delay_timer)
-            elif choice == 'n':
-                click.echo(f"Entry [{gloss}] not added.")
-                continue
-            elif choice == 'q':
-                click.echo("Nothing changed.")
-                exit(0)
-        db.session.commit()
+        unsaved = []
+
+        def save():
+            nonlocal unsaved
+            if unsaved:
+                i18n_bulk_upsert({}, unsaved)
+                db.session.commit()
+                click.echo(f"Saved {entry_count} entries")
+                unsaved = []
+
+        # start translation; batches are translated concurrently and
+        # handled here in order
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            for key_id, source_gloss, gloss in translated_entries(executor):
+                if interactive:
+                    click.echo(
+                        f"[{key_id}] has no value in [{destination_locale}]")
+                    click.echo(
+                        f"add translation [{source_gloss}] => [{gloss}]?")
+                    click.echo()
+                    options = {
+                        'y': 'Yes, use the current translation',
+                        'n': 'No, skip this entry',
+                        'e': 'Edit the current entry',
+                        'a': 'Use given translation for All following entries',
+                        'q': 'Quit the program'
+                    }
+                    for k, v in options.items():
+                        click.echo("{:3}: {}".format(k, v))
+                    choice = click.prompt(
+                        "=> ",
+                        type=click.Choice(
+                            options.keys(),
+                            case_sensitive=False),
+                        default='y')
+                else:
+                    choice = 'y'
+
+                if choice == 'e':
+                    gloss = click.prompt(
+                        "Enter a new translation to override the default one",
+                        default=gloss)
+                    choice = 'y'
+                elif choice == 'a':
+                    interactive = False
+                    choice = 'y'
+
+                if choice == 'y':
+                    unsaved.append({
+                        'key_id': key_id,
+                        'locale_code': destination_locale,
+                        'gloss': gloss,
+                        'verified': False
+                    })
+                    entry_count += 1
+                    click.echo(f"Entry [{gloss}] added")
+                    if len(unsaved) >= checkpoint:
+                        save()
+                elif choice == 'n':
+                    click.echo(f"Entry [{gloss}] not added.")
+                    continue
+                elif choice == 'q':
+                    save()
+                    click.echo(f"Entry count: {entry_count}")
+                    exit(0)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            # keep what was translated before a failure or interruption
+            save()
 
         click.echo(f"Entry count: {entry_count}")
+        if missing:
+            # entries whose text repeats one translated in this run
+            duplicates = len(missing) - len(remembered) - len(texts)
+            click.echo(f"Translation memory: {len(remembered)} of {len(missing)} entries reused "
+                       f"({len(remembered) / len(missing):.0%})")
+            click.echo(f"Translated {len(texts)} texts for {len(missing) - len(remembered)} entries "
+                       f"({duplicates} repeated in this run)")
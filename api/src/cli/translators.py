@@ -0,0 +1,131 @@
+import abc
+import threading
+import time
+
+
+class Translator(abc.ABC):
+    """Machine translation backend for `flask i18n translate`.
+
+    `translate` turns a batch of texts from language `src` into `dest`
+    and may be called from several threads at once.
+    """
+
+    @abc.abstractmethod
+    def languages(self):
+        """The language codes this backend knows, {code: name}."""
+
+    @abc.abstractmethod
+    def translate(self, texts, src, dest):
+        """Return the translations of `texts`, in the same order."""
+
+
+class GoogleTranslator(Translator):
+    """Google Translate through googletrans, which needs network access."""
+
+    def __init__(self):
+        # googletrans is slow to import, so only translating loads it.
+        import googletrans
+        self._googletrans = googletrans
+        # Each thread gets its own client.
+        self._local = threading.local()
+
+    def languages(self):
+        return self._googletrans.LANGUAGES
+
+    def translate(self, texts, src, dest):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self._googletrans.Translator(raise_exception=True)
+        return [translated.text for translated in client.translate(list(texts), src=src, dest=dest)]
+
+
+class OfflineTranslator(Translator):
+    """Stand-in that needs no network, for tests and trial runs:
+    each translation is the text tagged with the destination language."""
+
+    LANGUAGES = {
+        'ar': 'arabic',
+        'de': 'german',
+        'en': 'english',
+        'es': 'spanish',
+        'fr': 'french',
+        'hi': 'hindi',
+        'it': 'italian',
+        'ja': 'japanese',
+        'ko': 'korean',
+        'nl': 'dutch',
+        'pl': 'polish',
+        'pt': 'portuguese',
+        'ru': 'russian',
+        'sw': 'swahili',
+        'tr': 'turkish',
+        'uk': 'ukrainian',
+        'vi': 'vietnamese',
+        'zh-cn': 'chinese (simplified)',
+        'zh-tw': 'chinese (traditional)',
+    }
+
+    def languages(self):
+        return self.LANGUAGES
+
+    def translate(self, texts, src, dest):
+        return [f"[{dest}] {text}" for text in texts]
+
+
+class TranslationMemory:
+    """Translations already known, by their exact source text and by the
+    source text up to case and spacing."""
+
+    def __init__(self):
+        self._exact = {}
+        self._normalized = {}
+
+    @staticmethod
+    def normalize(text):
+        return ' '.join(text.split()).casefold()
+
+    def add(self, source, translation):
+        # The first translation of a text is kept.
+        self._exact.setdefault(source, translation)
+        self._normalized.setdefault(self.normalize(source), translation)
+
+    def get(self, source):
+        """The translation of `source`, or None."""
+        translation = self._exact.get(source)
+        if translation is None:
+            translation = self._normalized.get(self.normalize(source))
+        return translation
+
+    def __len__(self):
+        return len(self._exact)
+
+
+TRANSLATORS = {
+    'google': GoogleTranslator,
+    'offline': OfflineTranslator
+}
+
+
+class TokenBucket:
+    """Rate limiter that allows `rate` acquisitions per second on average,
+    in bursts of up to `capacity`; shared by the threads that call it."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, waiting until one is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
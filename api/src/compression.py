@@ -0,0 +1,108 @@
+import collections
+import gzip
+import hashlib
+import threading
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # Optional; only gzip is offered without it.
+    brotli = None
+
+
+class CompressedCache:
+    """Least recently used store of compressed bodies, bounded by total size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+def compress(body, encoding, config):
+    if encoding == 'br':
+        return brotli.compress(body, quality=config['COMPRESS_BR_QUALITY'])
+    return gzip.compress(body, compresslevel=config['COMPRESS_GZIP_LEVEL'], mtime=0)
+
+
+def choose_encoding(accept_encodings):
+    """Pick the encoding the client prefers among the ones we can produce."""
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return accept_encodings.best_match(offered)
+
+
+def init_app(app):
+    """Compress large responses for clients that accept gzip or brotli.
+
+    Bodies from views marked @cacheable are kept compressed, keyed by their
+    ETag or a digest of the body, so each version is compressed only once.
+    """
+    config = app.config
+    mimetypes = set(config['COMPRESS_MIMETYPES'])
+    cache = app.extensions['compression_cache'] = CompressedCache(config['COMPRESS_CACHE_SIZE'])
+
+    @app.after_request
+    def compress_response(response):
+        if response.mimetype not in mimetypes \
+                or response.direct_passthrough \
+                or response.is_streamed \
+                or 'Content-Encoding' in response.headers:
+            return response
+        response.vary.add('Accept-Encoding')
+
+        if not 200 <= response.status_code < 300 or response.status_code in (204, 206) \
+                or response.content_length is not None and response.content_length < config['COMPRESS_MIN_SIZE']:
+            return response
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        etag, weak = response.get_etag()
+        if etag and f'{etag}-{encoding}' in request.if_none_match:
+            # The client already has this body in this encoding.
+            response.set_etag(f'{etag}-{encoding}', weak)
+            return response.make_conditional(request)
+
+        body = response.get_data()
+        view = app.view_functions.get(request.endpoint)
+        if getattr(view, 'cacheable', False):
+            key = (encoding, etag or hashlib.blake2b(body, digest_size=16).digest())
+            compressed = cache.get(key)
+            if compressed is None:
+                compressed = compress(body, encoding, config)
+                cache.put(key, compressed)
+        else:
+            compressed = compress(body, encoding, config)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            # Each encoding is a different representation.
+            response.set_etag(f'{etag}-{encoding}', weak)
+        return response
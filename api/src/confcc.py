@@ -6,6 +6,19 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+def env_flag(name, default):
+    """Read a boolean setting from the environment."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def env_list(name):
+    """Read a comma-separated list setting from the environment."""
+    return [item.strip() for item in os.getenv(name, '').split(',') if item.strip()]
+
+
 class Config:
     SECRET_KEY = os.getenv("FLASK_SECRET_KEY")
 
@@ -15,7 +28,53 @@ class Config:
     JWT_BLACKLIST_TOKEN_CHECKS = ['access']
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Count the queries issued by each endpoint (see `DbConfig.query_counts`).
     SQLALCHEMY_RECORD_QUERIES = True
+    # Keep loaded attributes after a commit instead of reloading them on next access.
+    SQLALCHEMY_EXPIRE_ON_COMMIT = env_flag('SQLALCHEMY_EXPIRE_ON_COMMIT', False)
+    # Run GET requests in READ ONLY transactions without autoflush;
+    # views that write on GET must be marked @read_write.
+    SQLALCHEMY_READ_ONLY_GETS = env_flag('SQLALCHEMY_READ_ONLY_GETS', True)
+
+    # Connection pool, per worker process. Size the pool so that
+    # workers * (POOL_SIZE + MAX_OVERFLOW) stays below Postgres' max_connections.
+    SQLALCHEMY_POOL_SIZE = int(os.getenv('SQLALCHEMY_POOL_SIZE', 5))
+    SQLALCHEMY_MAX_OVERFLOW = int(os.getenv('SQLALCHEMY_MAX_OVERFLOW', 10))
+    SQLALCHEMY_POOL_TIMEOUT = int(os.getenv('SQLALCHEMY_POOL_TIMEOUT', 30))  # seconds
+    SQLALCHEMY_POOL_RECYCLE = int(os.getenv('SQLALCHEMY_POOL_RECYCLE', 1800))  # seconds; -1 to disable
+    SQLALCHEMY_POOL_PRE_PING = env_flag('SQLALCHEMY_POOL_PRE_PING', True)
+    # Log a warning when a request waits longer than this (seconds) for a connection.
+    SQLALCHEMY_POOL_SLOW_CHECKOUT = float(os.getenv('SQLALCHEMY_POOL_SLOW_CHECKOUT', 0.1))
+    # Postgres statement_timeout in milliseconds; 0 disables it.
+    SQLALCHEMY_STATEMENT_TIMEOUT = int(os.getenv('SQLALCHEMY_STATEMENT_TIMEOUT', 0))
+
+    # Comma-separated read replicas; GET requests (and views marked
+    # @read_only) read from these, round robin, when any are configured.
+    SQLALCHEMY_REPLICA_URIS = env_list('SQLALCHEMY_REPLICA_URIS')
+    # Seconds after a client's own write during which it keeps reading from the primary.
+    SQLALCHEMY_READ_YOUR_WRITES_WINDOW = float(os.getenv('SQLALCHEMY_READ_YOUR_WRITES_WINDOW', 5))
+
+    # Encoder for JSON responses: 'auto' (orjson when installed), 'orjson' or 'stdlib'.
+    JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')
+
+    # Compress responses of these types, and at least this many bytes,
+    # with brotli (when installed) or gzip, as the client accepts.
+    COMPRESS_MIMETYPES = ['application/json', 'text/html', 'text/plain', 'text/csv']
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BR_QUALITY = int(os.getenv('COMPRESS_BR_QUALITY', 5))
+    # Bytes of compressed bodies kept for views marked @cacheable.
+    COMPRESS_CACHE_SIZE = int(os.getenv('COMPRESS_CACHE_SIZE', 32 * 1024 * 1024))
+
+    # Seconds a process serves its cached translations of a locale before
+    # checking whether another process has changed them.
+    I18N_CATALOG_CHECK_INTERVAL = float(os.getenv('I18N_CATALOG_CHECK_INTERVAL', 2))
+    # Locale of last resort for translations looked up on the server,
+    # and how many of those translations a process keeps.
+    I18N_DEFAULT_LOCALE = os.getenv('I18N_DEFAULT_LOCALE', 'en-US')
+    I18N_TRANSLATION_CACHE_SIZE = int(os.getenv('I18N_TRANSLATION_CACHE_SIZE', 10000))
+    # Machine translation backend of `flask i18n translate`: 'google' or 'offline'.
+    I18N_TRANSLATOR = os.getenv('I18N_TRANSLATOR', 'google')
 
     MAIL_SERVER = os.getenv("MAIL_SERVER")
     MAIL_PORT = os.getenv("MAIL_PORT")
@@ -26,6 +85,17 @@ class Config:
     MAIL_USE_SSL = True
     MAIL_SUPPRESS_SEND = False
 
+    # `flask mail-worker` sends this many emails per SMTP connection, and
+    # looks for new ones this often (seconds) once the outbox is empty.
+    MAIL_OUTBOX_BATCH_SIZE = int(os.getenv('MAIL_OUTBOX_BATCH_SIZE', 50))
+    MAIL_OUTBOX_POLL_INTERVAL = float(os.getenv('MAIL_OUTBOX_POLL_INTERVAL', 5))
+    # An email the server rejects is tried again after this many seconds,
+    # doubled for each attempt, up to MAIL_OUTBOX_MAX_ATTEMPTS in all.
+    MAIL_OUTBOX_RETRY_DELAY = float(os.getenv('MAIL_OUTBOX_RETRY_DELAY', 30))
+    MAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('MAIL_OUTBOX_MAX_ATTEMPTS', 5))
+    # Recipients per message of group and event emails sent with Bcc.
+    MAIL_BROADCAST_CHUNK_SIZE = int(os.getenv('MAIL_BROADCAST_CHUNK_SIZE', 50))
+
     @staticmethod
     def init_app(app):
         pass
@@ -58,6 +128,7 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DB_URL') or Config.psql_url('test')
     JWT_BLACKLIST_ENABLED = False
+    SQLALCHEMY_REPLICA_URIS = env_list('TEST_REPLICA_DB_URLS')
 
 
 class DevelopmentConfig(Config):
@@ -69,12 +140,16 @@ class DevelopmentConfig(Config):
 class StagingConfig(Config):
     TESTING = False
     DEBUG = False
+    JSON_SORT_KEYS = False
+    JSONIFY_PRETTYPRINT_REGULAR = False
     SQLALCHEMY_DATABASE_URI = os.getenv('DEV_DB_URL') or Config.psql_url('staging')
 
 
 class ProductionConfig(Config):
     TESTING = False
     DEBUG = False
+    JSON_SORT_KEYS = False
+    JSONIFY_PRETTYPRINT_REGULAR = False
     SQLALCHEMY_DATABASE_URI = os.getenv('PROD_DB_URL') or Config.psql_url('prod')
 
 
@@ -8,6 +8,7 @@ from flask_jwt_extended import create_access_token
 from . import db, create_app
 from .cli.app import create_app_cli
 from .cli.courses import create_course_cli
+from .cli.emails import create_email_cli
 from .cli.events import create_event_cli
 from .cli.faker import create_faker_cli
 from .cli.i18n import create_i18n_cli
@@ -46,6 +47,20 @@ def client_factory(client_class):
             yield client
 
 
+def pytest_terminal_summary(terminalreporter):
+    """With CC_QUERY_REPORT set, list the average queries per request of each endpoint."""
+    if not os.getenv('CC_QUERY_REPORT'):
+        return
+    terminalreporter.section('queries per endpoint')
+    total_requests, total_queries = 0, 0
+    for endpoint, (requests, queries) in sorted(db.query_counts.items(), key=lambda item: str(item[0])):
+        terminalreporter.write_line(f"{str(endpoint):55} {requests:6} requests {queries / requests:8.2f} queries/request")
+        total_requests += requests
+        total_queries += queries
+    if total_requests:
+        terminalreporter.write_line(f"{'total':55} {total_requests:6} requests {total_queries:8} queries")
+
+
 @pytest.fixture
 def auth_client():
     yield from client_factory(AuthClient)
@@ -58,6 +73,11 @@ def plain_client():
 
 @pytest.fixture
 def runner():
+    # Tests query through db.session outside of an app context, so the
+    # previous test's session is still open and would block drop_all().
+    if db.session is not None:
+        db.session.remove()
+
     app = create_app(os.getenv('CC_CONFIG') or 'test')
     app.testing = True  # Make sure exceptions percolate out
 
@@ -67,6 +87,7 @@ def runner():
     create_account_cli(app)
     create_app_cli(app)
     create_course_cli(app)
+    create_email_cli(app)
     create_event_cli(app)
     create_faker_cli(app)
     create_i18n_cli(app)
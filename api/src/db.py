@@ -1,28 +1,333 @@
+import collections
+import itertools
+import logging
+import os
+import threading
+import time
+
+from flask import g, has_request_context, request
 from flask_migrate import Migrate
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine.url import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.orm import Session, sessionmaker, scoped_session
+from sqlalchemy.pool import QueuePool
 
 Base = declarative_base()
 
+logger = logging.getLogger(__name__)
+
+
+class PoolWaitStats:
+    """Running totals of how long callers waited to check out a connection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+
+    def record(self, wait):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'total_wait_ms': round(self.total_wait * 1000, 3),
+                'avg_wait_ms': round(self.total_wait * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 3)
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records the time spent waiting for each checkout."""
+
+    wait_stats = None
+    slow_checkout = None
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.wait_stats = self.wait_stats
+        pool.slow_checkout = self.slow_checkout
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait = time.perf_counter() - start
+            if self.wait_stats is not None:
+                self.wait_stats.record(wait)
+            if self.slow_checkout and wait > self.slow_checkout:
+                logger.warning(
+                    f"Waited {wait * 1000:.1f}ms for a database connection "
+                    f"(pool status: {self.status()})")
+
+
+class RoutingSession(Session):
+    """Session that sends the reads of read-only requests to a replica.
+
+    A request is read-only when `g.db_read_only` was set for it (see
+    `DbConfig.init_app`). Once the session has flushed anything it sticks
+    to the primary, so a request always sees its own writes.
+    """
+
+    def __init__(self, db_config=None, **kwargs):
+        super().__init__(**kwargs)
+        self.db_config = db_config
+        self.replica = None
+        self.wrote = False
+        self.in_read_only_transaction = False
+
+    def get_bind(self, mapper=None, clause=None):
+        if self._flushing or getattr(clause, 'is_dml', False):
+            self.wrote = True
+        if self.wrote or not self.use_replica():
+            return super().get_bind(mapper=mapper, clause=clause)
+        if self.replica is None:
+            self.replica = self.db_config.next_replica()
+        return self.replica
+
+    def use_replica(self):
+        return self.db_config is not None \
+               and self.db_config.replica_engines \
+               and self.in_read_only_request()
+
+    @staticmethod
+    def in_read_only_request():
+        return has_request_context() and g.get('db_read_only', False)
+
+
+@event.listens_for(RoutingSession, 'after_begin')
+def begin_read_only(session, transaction, connection):
+    """Run the transactions of read-only requests as READ ONLY in Postgres."""
+    if session.in_read_only_request() \
+            and session.db_config.read_only_transactions \
+            and connection.dialect.name == 'postgresql':
+        connection.execute('SET TRANSACTION READ ONLY')
+        session.in_read_only_transaction = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def expire_relationships(session):
+    """Reload relationships after a commit even when expire_on_commit is off.
+
+    Rows are often linked by setting foreign keys, which leaves collections
+    that were loaded earlier out of date; column values stay as they are.
+    """
+    if session.expire_on_commit:
+        return
+    for state in list(session.identity_map.all_states()):
+        loaded = [key for key in state.mapper.relationships.keys() if key in state.dict]
+        if loaded:
+            session.expire(state.obj(), loaded)
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def end_read_only(session, transaction):
+    if transaction.parent is None:
+        session.in_read_only_transaction = False
+
 
 class DbConfig:
+    # Name of the cookie that marks a client's most recent write.
+    LAST_WRITE_COOKIE = 'cc-last-write'
+
     def __init__(self):
         self.engine = None
         self.session = None
+        self.replica_engines = []
+        self._replica_cycle = None
+        self._replica_lock = threading.Lock()
+        self.read_only_transactions = False
+        self.pool_stats = PoolWaitStats()
+        # endpoint -> [requests, queries], filled when SQLALCHEMY_RECORD_QUERIES is set
+        self.query_counts = collections.defaultdict(lambda: [0, 0])
+        self._pid = os.getpid()
+        # Covers gunicorn workers, multiprocessing and anything else that forks.
+        os.register_at_fork(after_in_child=self.dispose_after_fork)
+
+    @staticmethod
+    def engine_options(config):
+        """Build the keyword arguments for `create_engine` from the app config."""
+        url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+        if url.get_backend_name() == 'sqlite':
+            # SQLite uses its own single-connection pools.
+            return {}
+
+        options = {
+            'poolclass': TimedQueuePool,
+            'pool_size': config['SQLALCHEMY_POOL_SIZE'],
+            'max_overflow': config['SQLALCHEMY_MAX_OVERFLOW'],
+            'pool_timeout': config['SQLALCHEMY_POOL_TIMEOUT'],
+            'pool_recycle': config['SQLALCHEMY_POOL_RECYCLE'],
+            'pool_pre_ping': config['SQLALCHEMY_POOL_PRE_PING'],
+        }
+
+        statement_timeout = config['SQLALCHEMY_STATEMENT_TIMEOUT']
+        if statement_timeout and url.get_backend_name() == 'postgresql':
+            options['connect_args'] = {
+                'options': f"-c statement_timeout={statement_timeout}"
+            }
+        return options
 
     def init_app(self, app):
-        self.engine = create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
-        session_factory = sessionmaker(bind=self.engine)
+        self.engine = self._create_engine(app, app.config['SQLALCHEMY_DATABASE_URI'])
+        self.replica_engines = [self._create_engine(app, uri)
+                                for uri in app.config['SQLALCHEMY_REPLICA_URIS']]
+        self._replica_cycle = itertools.cycle(self.replica_engines)
+        self.read_only_transactions = app.config['SQLALCHEMY_READ_ONLY_GETS']
+
+        # With expire_on_commit off, objects dumped after a commit don't reload
+        # every attribute. Sessions only live for one request, so the
+        # objects can't go stale across requests.
+        session_factory = sessionmaker(class_=RoutingSession, bind=self.engine, db_config=self,
+                                       expire_on_commit=app.config['SQLALCHEMY_EXPIRE_ON_COMMIT'])
         self.session = scoped_session(session_factory)
 
         # We're only using this package to get the CLI command.
         Migrate(app, Base)
 
+        read_your_writes_window = app.config['SQLALCHEMY_READ_YOUR_WRITES_WINDOW']
+
+        @app.before_request
+        def route_read_only_requests():
+            # Views marked @read_only or @read_write override the method's default.
+            view = app.view_functions.get(request.endpoint)
+            read_only = getattr(view, 'read_only', request.method in ('GET', 'HEAD'))
+            g.db_read_only = read_only and not self._wrote_recently(read_your_writes_window)
+            if g.db_read_only:
+                self.session.autoflush = False
+
+        @app.after_request
+        def remember_writes(response):
+            session = self.session.registry() if self.session.registry.has() else None
+            if session is not None and session.wrote and read_your_writes_window:
+                response.set_cookie(self.LAST_WRITE_COOKIE, str(time.time()),
+                                    max_age=int(read_your_writes_window) + 1, httponly=True)
+            if app.config['SQLALCHEMY_RECORD_QUERIES']:
+                counts = self.query_counts[request.endpoint]
+                counts[0] += 1
+                counts[1] += g.pop('db_query_count', 0)
+            self._end_read_only_request()
+            return response
+
+        @app.teardown_request
+        def end_read_only_request(exc):
+            self._end_read_only_request()
+
         @app.teardown_appcontext
         def remove_session(exc):
             self.session.remove()
 
+    def _end_read_only_request(self):
+        """Undo the read-only settings of the current request.
+
+        The session normally goes away with the app context, but when the
+        context outlives the request (e.g., in tests) they must not leak
+        into later writes.
+        """
+        if g.pop('db_read_only', False) and self.session.registry.has():
+            session = self.session()
+            session.autoflush = True
+            if session.in_read_only_transaction:
+                session.rollback()
+
+    def _create_engine(self, app, uri):
+        engine = create_engine(uri, **self.engine_options({**app.config, 'SQLALCHEMY_DATABASE_URI': uri}))
+        if isinstance(engine.pool, TimedQueuePool):
+            engine.pool.wait_stats = self.pool_stats
+            engine.pool.slow_checkout = app.config['SQLALCHEMY_POOL_SLOW_CHECKOUT']
+        self._guard_against_fork(engine)
+
+        if app.config['SQLALCHEMY_RECORD_QUERIES']:
+            @event.listens_for(engine, 'before_cursor_execute')
+            def count_query(conn, cursor, statement, parameters, context, executemany):
+                if has_request_context():
+                    g.db_query_count = g.get('db_query_count', 0) + 1
+
+        return engine
+
+    def _wrote_recently(self, window):
+        """Whether this client wrote within the last `window` seconds."""
+        try:
+            last_write = float(request.cookies.get(self.LAST_WRITE_COOKIE, 0))
+        except ValueError:
+            return False
+        return time.time() - last_write < window
+
+    def next_replica(self):
+        """Pick the next replica engine, round robin."""
+        with self._replica_lock:
+            return next(self._replica_cycle)
+
+    @staticmethod
+    def _guard_against_fork(engine):
+        """Never hand a connection opened by another process to this one.
+
+        Connections carry the pid that opened them; on checkout in a
+        different process they are dropped without being closed and the
+        pool connects again.
+        """
+
+        @event.listens_for(engine, 'connect')
+        def connect(dbapi_connection, connection_record):
+            connection_record.info['pid'] = os.getpid()
+
+        @event.listens_for(engine, 'checkout')
+        def checkout(dbapi_connection, connection_record, connection_proxy):
+            pid = os.getpid()
+            if connection_record.info['pid'] != pid:
+                connection_record.connection = connection_proxy.connection = None
+                raise exc.DisconnectionError(
+                    f"Connection record belongs to pid {connection_record.info['pid']}, "
+                    f"attempting to check out in pid {pid}")
+
+    def dispose_after_fork(self):
+        """Give a freshly forked worker its own, empty connection pool.
+
+        Swaps in a new pool rather than calling `engine.dispose()`, which
+        would close connections the parent process is still using. The
+        inherited session is discarded for the same reason. Runs once per
+        process, however many fork hooks call it.
+        """
+        if self.engine is None or self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        for engine in [self.engine] + self.replica_engines:
+            engine.pool = engine.pool.recreate()
+        self.session.registry.clear()
+        self.pool_stats.reset()
+
+    def dispose(self):
+        """Close every pooled connection, e.g., in a parent before it forks."""
+        self.session.remove()
+        for engine in [self.engine] + self.replica_engines:
+            engine.dispose()
+
+    def pool_status(self):
+        """Describe the current state of the connection pool."""
+        pool = self.engine.pool
+        status = {'pid': os.getpid(), 'status': pool.status()}
+        if isinstance(pool, QueuePool):
+            status.update({
+                'size': pool.size(),
+                'checked_in': pool.checkedin(),
+                'checked_out': pool.checkedout(),
+                'overflow': pool.overflow(),
+            })
+        status['wait'] = self.pool_stats.to_dict()
+        return status
+
     def create_all(self):
         """Create all tables."""
         Base.metadata.create_all(self.engine)
@@ -6,7 +6,9 @@ from marshmallow import ValidationError
 
 from . import emails
 from .models import EmailSchema
-from .. import mail
+from .outbox import enqueue
+from .. import db
+from ..shared.helpers import get_schema
 
 
 # ---- Email
@@ -15,7 +17,7 @@ from .. import mail
 @jwt_required
 def send_email():
     # this route is intended to fail without proper credentials
-    email_schema = EmailSchema()
+    email_schema = get_schema(EmailSchema)
     try:
         valid_email_request = email_schema.load(request.json)
     except ValidationError as err:
@@ -30,6 +32,7 @@ def send_email():
         bcc=valid_email_request['bcc'])
 
     msg.body = valid_email_request['body']
-    mail.send(msg)
+    enqueue(msg)
+    db.session.commit()
 
-    return "Sent"
+    return "Queued", 202
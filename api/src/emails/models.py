@@ -1,4 +1,10 @@
 from marshmallow import fields, Schema
+from marshmallow.validate import Length
+from sqlalchemy import Column, DateTime, Index, Integer, Text, func
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from ..db import Base
+from ..shared.models import StringTypes
 
 
 # ---- Email Schema
@@ -14,3 +20,42 @@ class EmailSchema(Schema):
     # TODO: change the field to camelCase. Make sure UI gets updated as well
     # <2020-07-31, David Deng> #
     reply_to = fields.String()
+
+
+class BroadcastEmailSchema(Schema):
+    """Email to all the members of a group or participants of an event"""
+    subject = fields.String(required=True, validate=Length(min=1))
+    body = fields.String(required=True)
+    managerEmail = fields.String(required=True, validate=Length(min=1))
+    replyTo = fields.String(allow_none=True)
+    # One message per recipient, greeting them by name, or one message
+    # per MAIL_BROADCAST_CHUNK_SIZE recipients, all in Bcc.
+    bcc = fields.Boolean(missing=False)
+
+
+# ---- Outbox
+
+class OutboxEmail(Base):
+    """Email waiting for `flask mail-worker` to send it (see `outbox.py`)"""
+    __tablename__ = 'emails_outbox'
+    id = Column(Integer, primary_key=True)
+    subject = Column(StringTypes.LONG_STRING, nullable=False, default='')
+    sender = Column(StringTypes.LONG_STRING)
+    recipients = Column(ARRAY(StringTypes.LONG_STRING), nullable=False, default=list)
+    cc = Column(ARRAY(StringTypes.LONG_STRING), nullable=False, default=list)
+    bcc = Column(ARRAY(StringTypes.LONG_STRING), nullable=False, default=list)
+    reply_to = Column(StringTypes.LONG_STRING)
+    body = Column(Text)
+    html = Column(Text)
+    queued = Column(DateTime, nullable=False, server_default=func.now())
+    # Not tried before this time; pushed back after each failed attempt.
+    send_after = Column(DateTime, nullable=False, server_default=func.now())
+    attempts = Column(Integer, nullable=False, default=0, server_default='0')
+    # What the mail server said to the last failed attempt.
+    error = Column(Text)
+    sent = Column(DateTime)
+
+    __table_args__ = (Index('ix_emails_outbox_unsent', send_after, postgresql_where=sent.is_(None)),)
+
+    def __repr__(self):
+        return f"<OutboxEmail(id={self.id},subject='{self.subject}',sent={self.sent})>"
@@ -0,0 +1,136 @@
+"""Email outbox.
+
+Requests don't talk to the mail server: `enqueue` adds their messages to
+the outbox table in the request's own transaction, and `flask mail-worker`
+sends them in batches over one SMTP connection (see `send_due`).
+"""
+import collections
+import re
+import smtplib
+from datetime import timedelta
+from email.utils import formataddr
+
+from flask import current_app
+from flask_mail import BadHeaderError, Message
+from sqlalchemy import func
+
+from .models import OutboxEmail
+from .. import db, mail, translate
+
+ENQUEUE_BATCH_SIZE = 1000
+
+GREETING = 'email.broadcast.greeting'
+GREETING_ALL = 'email.broadcast.greeting-all'
+PLACEHOLDER = re.compile(r'{(\w+)}')
+
+
+def _address(address):
+    """Flask-Mail takes addresses as strings or (name, address) pairs."""
+    return address if isinstance(address, str) else formataddr(address)
+
+
+def enqueue(*messages):
+    """Add Flask-Mail messages to the outbox in the session's transaction;
+    they are sent once it commits."""
+    rows = [{'subject': message.subject or '',
+             'sender': _address(message.sender) if message.sender else None,
+             'recipients': [_address(address) for address in message.recipients],
+             'cc': [_address(address) for address in message.cc],
+             'bcc': [_address(address) for address in message.bcc],
+             'reply_to': _address(message.reply_to) if message.reply_to else None,
+             'body': message.body,
+             'html': message.html} for message in messages]
+    for start in range(0, len(rows), ENQUEUE_BATCH_SIZE):
+        db.session.execute(OutboxEmail.__table__.insert().values(rows[start:start + ENQUEUE_BATCH_SIZE]))
+
+
+def render(gloss, **params):
+    """Fill in the {name} placeholders of a gloss; unknown ones are left as they are."""
+    return PLACEHOLDER.sub(lambda match: str(params.get(match[1], match[0])), gloss)
+
+
+def enqueue_broadcast(recipients, email, footer_key, **params):
+    """Queue `email` (loaded by BroadcastEmailSchema) to `recipients`,
+    (address, name, locale code) rows. Return the number of messages.
+
+    The greeting and the `footer_key` gloss, filled in with `params`, are
+    in each recipient's locale, from the cached translations.
+    """
+    config = current_app.config
+    by_locale = collections.defaultdict(list)
+    for address, name, locale_code in recipients:
+        by_locale[locale_code or config['I18N_DEFAULT_LOCALE']].append((address, name))
+
+    messages = []
+    for locale_code, people in by_locale.items():
+        texts = translate.get_translations(locale_code, [GREETING, GREETING_ALL, footer_key])
+        footer = render(texts.get(footer_key, ''), **params)
+
+        def message(greeting, **addressees):
+            body = '\n\n'.join(part for part in [greeting, email['body'], footer and f"-- \n{footer}"] if part)
+            return Message(email['subject'], sender=email['managerEmail'], reply_to=email.get('replyTo'),
+                           body=body, **addressees)
+
+        if email['bcc']:
+            size = config['MAIL_BROADCAST_CHUNK_SIZE']
+            messages += [message(texts.get(GREETING_ALL, ''), bcc=[address for address, _ in people[start:start + size]])
+                         for start in range(0, len(people), size)]
+        else:
+            messages += [message(render(texts.get(GREETING, ''), name=name), recipients=[address])
+                         for address, name in people]
+    enqueue(*messages)
+    return len(messages)
+
+
+def to_message(email):
+    return Message(email.subject, sender=email.sender, recipients=list(email.recipients),
+                   cc=list(email.cc), bcc=list(email.bcc), reply_to=email.reply_to,
+                   body=email.body, html=email.html)
+
+
+def postpone(email, error):
+    """Record a failed attempt; the next waits MAIL_OUTBOX_RETRY_DELAY
+    seconds, doubled for each attempt before."""
+    email.attempts += 1
+    email.error = str(error)
+    delay = current_app.config['MAIL_OUTBOX_RETRY_DELAY'] * 2 ** (email.attempts - 1)
+    email.send_after = func.now() + timedelta(seconds=delay)
+
+
+def send_due(batch_size):
+    """Send up to `batch_size` emails that are due, over one SMTP connection.
+
+    Return the numbers of emails sent and postponed. An email the server
+    rejects is postponed, and left unsent after MAIL_OUTBOX_MAX_ATTEMPTS.
+    Errors reaching the server are raised; the emails not tried yet stay due.
+    """
+    # SKIP LOCKED lets several workers share the outbox.
+    batch = db.session.query(OutboxEmail) \
+        .filter(OutboxEmail.sent.is_(None),
+                OutboxEmail.attempts < current_app.config['MAIL_OUTBOX_MAX_ATTEMPTS'],
+                OutboxEmail.send_after <= func.now()) \
+        .order_by(OutboxEmail.id) \
+        .limit(batch_size) \
+        .with_for_update(skip_locked=True) \
+        .all()
+    sent, postponed = 0, 0
+    try:
+        if batch:
+            with mail.connect() as connection:
+                for email in batch:
+                    try:
+                        connection.send(to_message(email))
+                    except smtplib.SMTPServerDisconnected as err:
+                        postpone(email, err)
+                        postponed += 1
+                        raise
+                    # Flask-Mail asserts that there are a sender and recipients.
+                    except (smtplib.SMTPException, BadHeaderError, AssertionError) as err:
+                        postpone(email, err)
+                        postponed += 1
+                    else:
+                        email.sent = func.now()
+                        sent += 1
+    finally:
+        db.session.commit()
+    return sent, postponed
@@ -1,8 +1,17 @@
+import datetime
 import random
+import socketserver
+import threading
 
 import pytest
 from faker import Faker
 from flask import url_for
+from flask_mail import Message
+
+from .models import OutboxEmail
+from ..i18n.models import I18NKey, I18NLocale, I18NValue
+from .outbox import enqueue
+from .. import db
 
 
 class RandomLocaleFaker:
@@ -34,19 +43,22 @@ def email_object_factory():
     return email
 
 
-# @pytest.mark.smoke
+@pytest.mark.smoke
 def test_send_email(auth_client):
-    # this test is intended to fail without proper credentials
-
     # GIVEN nothing
 
     # WHEN we try to send an email
+    email = email_object_factory()
     resp = auth_client.post(url_for('emails.send_email'),
-                            json=email_object_factory(),
+                            json=email,
                             )
 
-    # THEN we expect the correct code
-    assert resp.status_code == 200
+    # THEN we expect it to be queued for the mail worker
+    assert resp.status_code == 202
+    queued = auth_client.sqla.query(OutboxEmail).one()
+    assert queued.recipients == email['recipients']
+    assert (queued.subject, queued.body, queued.sender) == (email['subject'], email['body'], email['managerEmail'])
+    assert queued.sent is None
 
 
 @pytest.mark.smoke
@@ -60,3 +72,141 @@ def test_send_email_invalid(auth_client):
 
     # THEN we expect an error code
     assert resp.status_code == 422
+
+
+def create_broadcast_translations(sqla):
+    """Greetings and footers of group and event emails in English and Spanish."""
+    glosses = {
+        'en-US': {'greeting': 'Hello {name},', 'greeting-all': 'Hello,',
+                  'group-footer': 'Sent to the members of {group}.', 'event-footer': 'Sent to {event}.'},
+        'es-EC': {'greeting': 'Hola {name}:', 'greeting-all': 'Hola:',
+                  'group-footer': 'Enviado a los miembros de {group}.', 'event-footer': 'Enviado a {event}.'},
+    }
+    sqla.add_all([I18NLocale(code=locale_code, desc=locale_code) for locale_code in glosses])
+    sqla.add_all([I18NKey(id=f'email.broadcast.{name}', desc='') for name in glosses['en-US']])
+    sqla.add_all([I18NValue(locale_code=locale_code, key_id=f'email.broadcast.{name}', gloss=gloss)
+                  for locale_code, texts in glosses.items() for name, gloss in texts.items()])
+    sqla.commit()
+
+
+def broadcast_object_factory(bcc=False):
+    return {
+        'subject': 'News',
+        'body': 'We meet on Sunday.',
+        'managerEmail': 'manager@example.com',
+        'replyTo': 'manager@example.com',
+        'bcc': bcc
+    }
+
+
+# ---- Outbox
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Just enough of an SMTP server to stand in for the mail server.
+
+    Keeps the messages it's sent, counts connections, and refuses the
+    recipients in `reject`.
+    """
+    daemon_threads = True
+
+    def __init__(self, reject=()):
+        super().__init__(('localhost', 0), SMTPSinkHandler)
+        self.reject = set(reject)
+        self.messages = []
+        self.connections = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 localhost SMTP sink")
+        recipients = []
+        for line in self.rfile:
+            command = line[:4].decode().upper()
+            if command == 'RCPT':
+                recipient = line.decode().split(':', 1)[1].strip().strip('<>')
+                if recipient in self.server.reject:
+                    self.reply("550 No such user")
+                    continue
+                recipients.append(recipient)
+            elif command == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = b''.join(iter(self.rfile.readline, b'.\r\n'))
+                self.server.messages.append((recipients, data))
+                recipients = []
+            elif command in ('MAIL', 'RSET'):
+                recipients = []
+            elif command == 'QUIT':
+                self.reply("221 Bye")
+                return
+            self.reply("250 OK")
+
+
+@pytest.fixture
+def smtp_sink(runner, monkeypatch):
+    sink = SMTPSink(reject=['nobody@example.com'])
+    state = runner.app.extensions['mail']
+    for name, value in [('server', 'localhost'), ('port', sink.server_address[1]), ('use_ssl', False),
+                        ('use_tls', False), ('username', None), ('suppress', False)]:
+        monkeypatch.setattr(state, name, value)
+    yield sink
+    sink.shutdown()
+    sink.server_close()
+
+
+def test_mail_worker(runner, smtp_sink):
+    # GIVEN emails in the outbox, one of them to an address the server refuses
+    with runner.app.app_context():
+        enqueue(*[Message(f"Message {i}", sender='cc@example.com', recipients=[f"person{i}@example.com"],
+                          body=f"Body {i}") for i in range(5)],
+                Message("Nobody", sender='cc@example.com', recipients=['nobody@example.com'], body="Lost"))
+        db.session.commit()
+    # WHEN the mail worker sends them, two at a time
+    result = runner.invoke(args=['mail-worker', '--once', '--batch-size', '2'])
+    # THEN every deliverable email is sent, over one connection per batch
+    assert result.exit_code == 0
+    assert sorted(recipients for recipients, _ in smtp_sink.messages) == \
+        [[f"person{i}@example.com"] for i in range(5)]
+    assert b'Subject: Message 3' in smtp_sink.messages[3][1]
+    assert smtp_sink.connections == 3
+    assert db.session.query(OutboxEmail).filter(OutboxEmail.sent.isnot(None)).count() == 5
+    # AND the refused one waits to be tried again
+    refused = db.session.query(OutboxEmail).filter_by(sent=None).one()
+    assert refused.attempts == 1
+    assert 'No such user' in refused.error
+    assert refused.send_after > datetime.datetime.now() + datetime.timedelta(seconds=20)
+    # AND the throughput is reported
+    assert b'Sent 5 emails in' in result.stdout_bytes
+    assert b'postponed 1' in result.stdout_bytes
+
+    # WHEN the refused email is due again and keeps being refused
+    for attempt in range(2, runner.app.config['MAIL_OUTBOX_MAX_ATTEMPTS'] + 2):
+        db.session.query(OutboxEmail).filter_by(id=refused.id).update({'send_after': datetime.datetime.now()})
+        db.session.commit()
+        runner.invoke(args=['mail-worker', '--once'])
+    # THEN it is given up after the last attempt
+    refused = db.session.query(OutboxEmail).filter_by(id=refused.id).one()
+    assert refused.attempts == runner.app.config['MAIL_OUTBOX_MAX_ATTEMPTS']
+    assert refused.sent is None
+    assert len(smtp_sink.messages) == 5
+
+
+def test_mail_worker_server_down(runner, smtp_sink):
+    # GIVEN an email in the outbox and a mail server that can't be reached
+    with runner.app.app_context():
+        enqueue(Message("Hello", sender='cc@example.com', recipients=['person@example.com'], body="Hi"))
+        db.session.commit()
+    smtp_sink.shutdown()
+    smtp_sink.server_close()
+    # WHEN the mail worker runs
+    result = runner.invoke(args=['mail-worker', '--once'])
+    # THEN it fails, and the email stays due without using up an attempt
+    assert result.exit_code == 1
+    assert 'Mail server unavailable' in result.output
+    queued = db.session.query(OutboxEmail).one()
+    assert (queued.sent, queued.attempts) == (None, 0)
@@ -2,8 +2,10 @@ import os
 from datetime import datetime
 
 from flask import jsonify
+from flask_jwt_extended import jwt_required
 
 from . import etc
+from .. import db
 from ..shared.helpers import jwt_not_required
 
 
@@ -19,3 +21,10 @@ def ping():
         'now': datetime.now(),
         'utc': datetime.utcnow()
     })
+
+
+@etc.route('/db-pool')
+@jwt_required
+def db_pool():
+    """Connection pool usage and checkout wait times for this worker."""
+    return jsonify(db.pool_status())
@@ -5,22 +5,30 @@ from flask.json import jsonify
 from flask_jwt_extended import jwt_required
 from flask_mail import Message
 from marshmallow import ValidationError
+from sqlalchemy import and_, exists, func, literal, literal_column, select, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 
 from . import events
 from .models import Event, EventPerson, EventAsset, EventParticipant, EventTeam, EventGroup, EventSchema, \
-    EventPersonSchema, EventParticipantSchema
-from .. import db, mail, translate
+    EventPersonSchema, EventParticipantSchema, EventBookingsSchema, event_period, resource_range
+from .. import db, translate
+from ..assets.models import Asset, AssetSchema
+from ..emails.models import BroadcastEmailSchema
+from ..emails.outbox import enqueue, enqueue_broadcast
 from ..groups.models import Group, Member
 from ..images.models import Image, ImageEvent
-from ..people.models import Person
-from ..shared.helpers import get_exclusion_list, modify_entity
+from ..people.models import Person, PersonSchema
+from ..shared.helpers import get_exclusion_list, get_schema, modify_entity
+from ..teams.models import Team, TeamSchema
 
 
 # ---- Event
 @events.route('/', methods=['POST'])
 @jwt_required
 def create_event():
-    event_schema = EventSchema(
+    event_schema = get_schema(
+        EventSchema,
         exclude=get_exclusion_list(
             request.args, [
                 'assets', 'participants', 'persons', 'teams', 'images', 'groups']))
@@ -37,7 +45,8 @@ def create_event():
 
 @events.route('/')
 def read_all_events():
-    event_schema = EventSchema(
+    event_schema = get_schema(
+        EventSchema,
         exclude=get_exclusion_list(
             request.args, [
                 'assets', 'participants', 'persons', 'teams', 'images', 'groups']))
@@ -109,10 +118,60 @@ def read_all_events():
     return jsonify(event_schema.dump(result, many=True))
 
 
+# What can be booked: the model, the booking column that refers to it,
+# and how a free one is listed.
+BOOKABLE = {
+    'asset': (Asset, EventAsset.asset_id, AssetSchema, ['id', 'description', 'location_id', 'active']),
+    'team': (Team, EventTeam.team_id, TeamSchema, ['id', 'description', 'active']),
+    'person': (Person, EventPerson.person_id, PersonSchema, ['id', 'first_name', 'last_name', 'email']),
+}
+
+
+@events.route('/availability')
+@jwt_required
+def read_availability():
+    """ the active assets, teams or persons (`kind`) not booked for any
+    event overlapping the window from `start` to `end` """
+    kind = request.args.get('kind')
+    if kind not in BOOKABLE:
+        return jsonify(f"kind must be one of: {', '.join(BOOKABLE)}."), 422
+    try:
+        start = datetime.fromisoformat(request.args['start'])
+        end = datetime.fromisoformat(request.args['end'])
+    except (KeyError, ValueError):
+        return jsonify("start and end must be ISO 8601 dates or date-times."), 422
+    if end < start:
+        return jsonify("end must not be before start."), 422
+
+    location_id = request.args.get('location_id')
+    if location_id and kind != 'asset':
+        return jsonify("location_id only applies to assets."), 422
+
+    _, _, schema_class, fields = BOOKABLE[kind]
+    return jsonify(get_schema(schema_class, only=fields).dump(
+        available(kind, start, end, location_id).all(), many=True))
+
+
+def available(kind, start, end, location_id=None):
+    """ query for the active resources of `kind` free from `start` to `end`
+
+    The resources booked in the window are found through the GiST index on
+    the bookings' periods; the others are what's left (an anti-join).
+    """
+    model, resource_column, _, _ = BOOKABLE[kind]
+    busy = db.session.query(resource_column).filter(
+        resource_column.class_.during.op('&&')(event_period(start, end)))
+    query = db.session.query(model).filter_by(active=True).filter(~model.id.in_(busy))
+    if location_id:
+        query = query.filter_by(location_id=location_id)
+    return query.order_by(model.id)
+
+
 @events.route('/<event_id>')
 @jwt_required
 def read_one_event(event_id):
-    event_schema = EventSchema(
+    event_schema = get_schema(
+        EventSchema,
         exclude=get_exclusion_list(
             request.args, [
                 'assets', 'participants', 'persons', 'teams', 'images', 'groups']))
@@ -127,35 +186,47 @@ def read_one_event(event_id):
 @events.route('/<event_id>', methods=['PUT'])
 @jwt_required
 def replace_event(event_id):
-    event_schema = EventSchema()
+    event_schema = get_schema(EventSchema)
     try:
         valid_event = event_schema.load(request.json)
     except ValidationError as err:
         return jsonify(err.messages), 422
 
-    event_schema = EventSchema(
+    event_schema = get_schema(
+        EventSchema,
         exclude=get_exclusion_list(
             request.args, [
                 'assets', 'participants', 'persons', 'teams', 'images', 'groups']))
 
-    return modify_entity(Event, event_schema, event_id, valid_event)
+    try:
+        return modify_entity(Event, event_schema, event_id, valid_event)
+    except IntegrityError:
+        # its new time overlaps other bookings of its assets, teams or persons
+        db.session.rollback()
+        return jsonify(f"Event with id #{event_id} conflicts with other bookings at that time."), 422
 
 
 @events.route('/<event_id>', methods=['PATCH'])
 @jwt_required
 def update_event(event_id):
-    event_schema = EventSchema()
+    event_schema = get_schema(EventSchema)
     try:
         valid_attributes = event_schema.load(request.json, partial=True)
     except ValidationError as err:
         return jsonify(err.messages), 422
 
-    event_schema = EventSchema(
+    event_schema = get_schema(
+        EventSchema,
         exclude=get_exclusion_list(
             request.args, [
                 'assets', 'participants', 'persons', 'teams', 'images', 'groups']))
 
-    return modify_entity(Event, event_schema, event_id, valid_attributes)
+    try:
+        return modify_entity(Event, event_schema, event_id, valid_attributes)
+    except IntegrityError:
+        # its new time overlaps other bookings of its assets, teams or persons
+        db.session.rollback()
+        return jsonify(f"Event with id #{event_id} conflicts with other bookings at that time."), 422
 
 
 @events.route('/<event_id>', methods=['DELETE'])
@@ -182,25 +253,15 @@ def delete_event(event_id):
 @jwt_required
 def add_asset_to_event(event_id, asset_id):
     event = db.session.query(Event).filter_by(id=event_id).first()
-    asset_events = db.session.query(Event).join(
-        EventAsset).filter_by(asset_id=asset_id).all()
 
     if not event:
         return jsonify(f"Event with id #{event_id} does not exist."), 404
 
     # Make sure asset isn't already booked in the current event
     # Make sure asset isn't booked in another event during that time
-    for asset_event in asset_events:
-        if event.start <= asset_event.start < event.end \
-                or asset_event.start <= event.start < asset_event.end \
-                or event.start < asset_event.end <= event.end \
-                or asset_event.start < event.end <= asset_event.end:
-            return jsonify(
-                f"Asset with id #{asset_id} is unavailable for Event with id #{event_id}."), 422
-
-    new_entry = EventAsset(**{'event_id': event_id, 'asset_id': asset_id})
-    db.session.add(new_entry)
-    db.session.commit()
+    if not book(EventAsset(event_id=event_id, asset_id=asset_id), EventAsset.asset_id, asset_id, event):
+        return jsonify(
+            f"Asset with id #{asset_id} is unavailable for Event with id #{event_id}."), 422
 
     return jsonify(
         f"Asset with id #{asset_id} successfully booked for Event with id #{event_id}.")
@@ -228,35 +289,18 @@ def remove_asset_from_event(event_id, asset_id):
 @jwt_required
 def add_event_team(event_id, team_id):
     event = db.session.query(Event).filter_by(id=event_id).first()
-    event_teams = db.session.query(Event).join(
-        EventTeam).filter_by(team_id=team_id).all()
 
     if not event:
         return jsonify(f"Event with id #{event_id} does not exist."), 404
 
-    # Make sure asset isn't already booked in the current event
-    # Make sure asset isn't booked in another event during that time
-    event_start = event.start
-    event_end = event.end
-
-    is_overlap = False
-
-    for event_team in event_teams:
-        if event_start <= event_team.start < event_end or event_start < event_team.end <= event_end \
-                or event_team.start <= event_start < event_team.end or event_team.start < event.end <= event_team.end:
-            is_overlap = True
-            break
-
-    if is_overlap:
+    # Make sure team isn't already booked in the current event
+    # Make sure team isn't booked in another event during that time
+    if not book(EventTeam(event_id=event_id, team_id=team_id), EventTeam.team_id, team_id, event):
         return jsonify(
             f"Team with id #{team_id} is unavailable for Event with id #{event_id}."), 422
-    else:
-        new_entry = EventTeam(**{'event_id': event_id, 'team_id': team_id})
-        db.session.add(new_entry)
-        db.session.commit()
 
-        return jsonify(
-            f"Team with id #{team_id} successfully booked for Event with id #{event_id}.")
+    return jsonify(
+        f"Team with id #{team_id} successfully booked for Event with id #{event_id}.")
 
 
 @events.route('/<event_id>/teams/<team_id>', methods=['DELETE'])
@@ -280,7 +324,7 @@ def delete_event_team(event_id, team_id):
 @events.route('/<event_id>/individuals/<person_id>', methods=['POST', 'PUT'])
 @jwt_required
 def add_event_persons(event_id, person_id):
-    event_person_schema = EventPersonSchema(exclude=['event'])
+    event_person_schema = get_schema(EventPersonSchema, exclude=['event'])
     try:
         valid_description = event_person_schema.load(
             request.json, partial=('event_id', 'person_id'))
@@ -288,43 +332,127 @@ def add_event_persons(event_id, person_id):
         return jsonify(err.messages), 422
 
     event = db.session.query(Event).filter_by(id=event_id).first()
-    event_people = db.session.query(Event).join(
-        EventPerson).filter_by(person_id=person_id).all()
 
     if not event:
         return jsonify(f"Event with id #{event_id} does not exist."), 404
 
     # Make sure individual isn't already booked in the current event
     # Make sure individual isn't booked in another event during that time
-    event_start = event.start
-    event_end = event.end
+    new_entry = EventPerson(**{'event_id': event_id,
+                               'person_id': person_id,
+                               'description': valid_description['description']})
+    if not book(new_entry, EventPerson.person_id, person_id, event):
+        return jsonify(
+            f"Person with id #{person_id} is unavailable for Event with id #{event_id}."), 422
 
-    is_overlap = False
+    return jsonify(
+        f"Person with id #{person_id} successfully booked for Event with id #{event_id}.")
 
-    for event_person in event_people:
-        if event_start <= event_person.start < event_end or event_start < event_person.end <= event_end \
-                or event_person.start <= event_start < event_person.end or event_person.start < event.end <= event_person.end:
-            is_overlap = True
-            break
 
-    if is_overlap:
-        return jsonify(
-            f"Person with id #{person_id} is unavailable for Event with id #{event_id}."), 422
-    else:
-        new_entry = EventPerson(**{'event_id': event_id,
-                                   'person_id': person_id,
-                                   'description': valid_description['description']})
-        db.session.add(new_entry)
-        db.session.commit()
+@events.route('/<event_id>/bookings', methods=['POST'])
+@jwt_required
+def add_event_bookings(event_id):
+    """ book lists of assets, teams and persons for an event at once
+
+    The conflicts of all of them are looked up in one query, and the free
+    ones are booked together in one transaction. Each resource is reported
+    as 'booked', 'unavailable' (booked elsewhere at that time, or for this
+    event already) or 'not found'.
+    """
+    bookings_schema = get_schema(EventBookingsSchema)
+    try:
+        valid_bookings = bookings_schema.load(request.json or {})
+    except ValidationError as err:
+        return jsonify(err.messages), 422
 
-        return jsonify(
-            f"Person with id #{person_id} successfully booked for Event with id #{event_id}.")
+    event = db.session.query(Event).filter_by(id=event_id).first()
+
+    if not event:
+        return jsonify(f"Event with id #{event_id} does not exist."), 404
+
+    # {kind: {resource id: other columns of its booking}}
+    requested = {
+        'asset': {asset_id: {} for asset_id in valid_bookings['assets']},
+        'team': {team_id: {} for team_id in valid_bookings['teams']},
+        'person': {person['person_id']: {'description': person['description']}
+                   for person in valid_bookings['persons']},
+    }
+    period = event_period(event.start, event.end)
+    checks = []
+    for kind, resources in requested.items():
+        if resources:
+            model, resource_column, _, _ = BOOKABLE[kind]
+            taken = exists().where(and_(resource_range(resource_column).op('&&')(resource_range(model.id)),
+                                        resource_column.class_.during.op('&&')(period)))
+            checks.append(select([literal(kind), model.id, taken]).where(model.id.in_(resources)))
+    found = {}
+    if checks:
+        found = {(kind, resource_id): taken
+                 for kind, resource_id, taken in db.session.execute(union_all(*checks)).fetchall()}
+
+    results = {}
+    try:
+        for kind, resources in requested.items():
+            _, resource_column, _, _ = BOOKABLE[kind]
+            rows, results[f'{kind}s'] = [], []
+            for resource_id, columns in resources.items():
+                taken = found.get((kind, resource_id))
+                if taken is None:
+                    status = 'not found'
+                elif taken:
+                    status = 'unavailable'
+                else:
+                    status = 'booked'
+                    rows.append({'event_id': event.id, resource_column.key: resource_id, **columns})
+                results[f'{kind}s'].append({'id': resource_id, 'status': status})
+            if rows:
+                db.session.execute(resource_column.class_.__table__.insert().values(rows))
+        db.session.commit()
+    except IntegrityError:
+        # some were booked or removed by another request in the meantime
+        db.session.rollback()
+        return jsonify("These bookings changed meanwhile; nothing was booked, please try again."), 409
+
+    return jsonify(results)
+
+
+def booked(resource_column, resource_ids, event):
+    """ those of `resource_ids` booked, through `resource_column`, for an
+    event overlapping `event` (this one included)
+
+    The range predicates let the lookup use the GiST index of the booking
+    table's exclusion constraint, so it doesn't scan the resource's history.
+    """
+    resource_ids = sorted({int(resource_id) for resource_id in resource_ids})
+    if not resource_ids:
+        return set()
+    booking = resource_column.class_
+    return {resource_id for resource_id, in db.session.query(resource_column).filter(
+        resource_range(resource_column).op('&&')(
+            func.int4range(resource_ids[0], resource_ids[-1], literal_column("'[]'"))),
+        booking.during.op('&&')(event_period(event.start, event.end)),
+        resource_column.in_(resource_ids))}
+
+
+def book(new_entry, resource_column, resource_id, event):
+    """ add and commit the booking `new_entry` unless its resource is taken
+    at the time of `event`; returns whether it was booked """
+    if booked(resource_column, [resource_id], event):
+        return False
+    db.session.add(new_entry)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # booked by another request in the meantime
+        db.session.rollback()
+        return False
+    return True
 
 
 @events.route('/<event_id>/individuals/<person_id>', methods=['PATCH'])
 @jwt_required
 def modify_event_person(event_id, person_id):
-    event_person_schema = EventPersonSchema(exclude=['event'])
+    event_person_schema = get_schema(EventPersonSchema, exclude=['event'])
     try:
         valid_description = event_person_schema.load(
             request.json, partial=('event_id', 'person_id'))
@@ -368,7 +496,7 @@ def delete_event_persons(event_id, person_id):
 @events.route('/<event_id>/participants/<person_id>', methods=['POST', 'PUT'])
 @jwt_required
 def add_event_participants(event_id, person_id):
-    event_participant_schema = EventParticipantSchema(exclude=['event'])
+    event_participant_schema = get_schema(EventParticipantSchema, exclude=['event'])
     try:
         valid_confirmation = event_participant_schema.load(
             request.json, partial=('event_id', 'person_id'))
@@ -400,8 +528,8 @@ def add_event_participants(event_id, person_id):
 @events.route('/<event_id>/participants/<person_id>', methods=['PATCH'])
 @jwt_required
 def modify_event_participant(event_id, person_id):
-    event_participant_schema = EventParticipantSchema(exclude=['event'])
-    event_person_schema = EventPersonSchema(exclude=['event'])
+    event_participant_schema = get_schema(EventParticipantSchema, exclude=['event'])
+    event_person_schema = get_schema(EventPersonSchema, exclude=['event'])
     try:
         valid_confirmation = event_participant_schema.load(
             request.json, partial=('event_id', 'person_id'))
@@ -537,38 +665,37 @@ def add_event_group(event_id, group_id):
             **{'event_id': event_id, 'group_id': group_id, 'active': True})
         db.session.add(new_entry)
 
-    group_members = db.session.query(Member).filter_by(
-        group_id=group_id, active=True).all()
-
-    for group_member in group_members:
-        person_id = group_member.person_id
-        if not db.session.query(EventParticipant).filter_by(
-                event_id=event.id, person_id=person_id).first():
-            new_participant = EventParticipant(
-                **{'event_id': event_id, 'person_id': person_id, 'confirmed': True})
-            db.session.add(new_participant)
-            # send notification
-            # internationalize later
-            person = db.session.query(Person).filter_by(id=person_id).first()
-            person_email = person.email
-            if person_email:
-                print("email would be sent")
-                # send_notification_email(person_email, event)
-
-    print(translate.get_translation('en-US', 'country.name.CX'))
+    # One statement adds every active member not already taking part and
+    # joins the people it added for their email addresses.
+    participants = EventParticipant.__table__
+    added = insert(participants).from_select(
+        ['event_id', 'person_id', 'confirmed'],
+        select([literal(event.id), Member.person_id, literal(True)])
+        .where(and_(Member.group_id == group.id, Member.active))) \
+        .on_conflict_do_nothing() \
+        .returning(participants.c.person_id) \
+        .cte('added')
+    recipients = db.session.execute(
+        select([Person.email])
+        .select_from(Person.__table__.join(added, added.c.person_id == Person.id))
+        .where(Person.email.isnot(None))).fetchall()
+
+    # send notification
+    # internationalize later
+    for person_email, in recipients:
+        print("email would be sent")
+        # send_notification_email(person_email, event)
 
     db.session.commit()
     return jsonify(
         f"Group with id #{group_id} successfully attached to event with id #{event_id}."), 201
 
 
-def send_notification_email(person_email, event):
-    # Make Python class/module that has methods like getTranslation(),
-    # getLocaleCode()
-    subj = translate.get_translation(
-        'en-US', 'email.group-added-to-event.subject').gloss
-    body = translate.get_translation(
-        'en-US', 'email.group-added-to-event.body').gloss
+def send_notification_email(person_email, event, locale_code='en-US'):
+    texts = translate.get_translations(
+        locale_code, ['email.group-added-to-event.subject', 'email.group-added-to-event.body'])
+    subj = texts.get('email.group-added-to-event.subject', '')
+    body = texts.get('email.group-added-to-event.body', '')
     msg = Message(
         subj,
         sender='tumissionscomputing@gmail.com',
@@ -576,9 +703,31 @@ def send_notification_email(person_email, event):
     # link = url_for('events.read_one_event', event_id = event_id)
     ip = "http://localhost:8080"
     link = f"{ip}/event/{event.id}/details"
-    print(subj, body)
-    msg.html = f"" + body
-    mail.send(msg)
+    msg.html = body
+    # sent by `flask mail-worker` once the caller commits
+    enqueue(msg)
+
+
+@events.route('/<event_id>/email', methods=['POST'])
+@jwt_required
+def email_event(event_id):
+    try:
+        valid_email = BroadcastEmailSchema().load(request.json)
+    except ValidationError as err:
+        return jsonify(err.messages), 422
+
+    event = db.session.query(Event).filter_by(id=event_id).first()
+    if not event:
+        return jsonify(f"Event with id #{event_id} does not exist."), 404
+
+    recipients = db.session.query(Person.email, Person.first_name + ' ' + Person.last_name, Person.locale_code) \
+        .join(EventParticipant, EventParticipant.person_id == Person.id) \
+        .filter(EventParticipant.event_id == event.id, Person.active, Person.email != '') \
+        .all()
+    messages = enqueue_broadcast(recipients, valid_email, 'email.broadcast.event-footer', event=event.title)
+    db.session.commit()
+
+    return jsonify({'recipients': len(recipients), 'messages': messages}), 202
 
 
 @events.route('/<event_id>/groups/<group_id>', methods=['DELETE'])
@@ -253,6 +253,20 @@ def create_multiple_assets(sqla, n):
     sqla.commit()
 
 
+def without_double_bookings(pairs):
+    """Drop the (event, resource) pairs that would book a resource for two
+    events at the same time, which the database refuses."""
+    kept, periods = [], {}
+    for event, resource in sorted(pairs, key=lambda pair: (pair[0].id, pair[1].id)):
+        start, end = event.start, max(event.start, event.end)
+        booked = periods.setdefault(resource.id, [])
+        if start < end and any(start < other_end and other_start < end for other_start, other_end in booked):
+            continue
+        booked.append((start, end))
+        kept.append((event, resource))
+    return kept
+
+
 def create_events_assets(sqla, fraction=0.75):
     """Create data in the linking table between events and assets """
     event_asset_schema = EventAssetSchema()
@@ -266,9 +280,9 @@ def create_events_assets(sqla, fraction=0.75):
         create_multiple_assets(sqla, random.randint(3, 6))
         all_assets = sqla.query(Asset).all()
     all_events_assets = sqla.query(Event, Asset).all()
-    sample_events_assets = random.sample(
+    sample_events_assets = without_double_bookings(random.sample(
         all_events_assets, math.floor(
-            len(all_events_assets) * fraction))
+            len(all_events_assets) * fraction)))
     for events_assets in sample_events_assets:
         valid_events_assets = event_asset_schema.load(
             event_asset_object_factory(
@@ -291,9 +305,9 @@ def create_events_teams(sqla, fraction=0.75):
         create_multiple_teams(sqla, random.randint(3, 6))
         all_assets = sqla.query(Team).all()
     all_events_teams = sqla.query(Event, Team).all()
-    sample_events_teams = random.sample(
+    sample_events_teams = without_double_bookings(random.sample(
         all_events_teams, math.floor(
-            len(all_events_teams) * fraction))
+            len(all_events_teams) * fraction)))
     for events_teams in sample_events_teams:
         valid_events_teams = event_team_schema.load(
             event_team_object_factory(
@@ -343,9 +357,9 @@ def create_events_persons(sqla, fraction=0.75):
         create_multiple_people(sqla, random.randint(3, 6))
         all_people = sqla.query(Person).all()
     all_events_persons = sqla.query(Event, Person).all()
-    sample_events_persons = random.sample(
+    sample_events_persons = without_double_bookings(random.sample(
         all_events_persons, math.floor(
-            len(all_events_persons) * fraction))
+            len(all_events_persons) * fraction)))
     for events_persons in sample_events_persons:
         valid_events_persons = event_person_schema.load(
             event_person_object_factory(
@@ -1,10 +1,13 @@
 from marshmallow import fields, Schema
 from marshmallow.validate import Length, Range
-from sqlalchemy import Column, DateTime, Integer, ForeignKey, Boolean
+from sqlalchemy import Column, DateTime, Integer, ForeignKey, Boolean, DDL, FetchedValue, Index, event, func, \
+    literal_column
+from sqlalchemy.dialects.postgresql import ExcludeConstraint, TSRANGE
 from sqlalchemy.orm import relationship
 
 from ..db import Base
 from ..shared.models import StringTypes
+from ..shared.serializers import CompiledSchema
 
 
 # ---- Event
@@ -34,7 +37,7 @@ class Event(Base):
         return f"<Event(id={self.id})>"
 
 
-class EventSchema(Schema):
+class EventSchema(CompiledSchema):
     id = fields.Integer(dump_only=True, required=True, validate=Range(min=1))
     title = fields.String(required=True, validate=Length(min=1))
     description = fields.String(allow_none=True)
@@ -78,17 +81,84 @@ class EventSchema(Schema):
         dump_only=True)
 
 
+# ---- Bookings
+#
+# Assets, teams and persons are booked for events. Each booking carries
+# the period of its event in `during`, which the database keeps in step
+# with the event (see the triggers below), so that an exclusion
+# constraint can refuse to book a resource for two events at once.
+
+def resource_range(resource_id):
+    """ the id of a booked resource as a one-point range, the way the
+    booking constraints compare it (GiST has no integer equality without
+    the btree_gist extension) """
+    return func.int4range(resource_id, resource_id, literal_column("'[]'"))
+
+
+def event_period(start, end):
+    """ the period an event takes up; one that ends before it starts
+    takes up none """
+    return func.tsrange(start, func.greatest(start, end))
+
+
+def booking_constraint(table_name, resource_column):
+    return ExcludeConstraint((resource_range(literal_column(resource_column)), '&&'), ('during', '&&'),
+                             using='gist', name=f'{table_name}_no_overlap')
+
+
+def booking_period_index(table_name):
+    """ finds the bookings in a time window, whatever their resource """
+    return Index(f'ix_{table_name}_during', 'during', postgresql_using='gist')
+
+
+booking_period_ddl = DDL("""
+CREATE OR REPLACE FUNCTION events_booking_period() RETURNS trigger AS $$
+BEGIN
+    SELECT tsrange(start, greatest(start, "end")) INTO NEW.during
+    FROM events_event WHERE id = NEW.event_id;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER %(table)s_period BEFORE INSERT OR UPDATE OF event_id ON %(table)s
+    FOR EACH ROW EXECUTE PROCEDURE events_booking_period();
+""")
+
+event_reschedule_ddl = DDL("""
+CREATE OR REPLACE FUNCTION events_event_reschedule() RETURNS trigger AS $$
+BEGIN
+    UPDATE events_eventasset SET during = tsrange(NEW.start, greatest(NEW.start, NEW."end"))
+    WHERE event_id = NEW.id;
+    UPDATE events_eventteam SET during = tsrange(NEW.start, greatest(NEW.start, NEW."end"))
+    WHERE event_id = NEW.id;
+    UPDATE events_eventperson SET during = tsrange(NEW.start, greatest(NEW.start, NEW."end"))
+    WHERE event_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER events_event_reschedule AFTER UPDATE OF start, "end" ON events_event
+    FOR EACH ROW EXECUTE PROCEDURE events_event_reschedule();
+""")
+
+event.listen(Event.__table__, 'after_create', event_reschedule_ddl.execute_if(dialect='postgresql'))
+
+
 # ---- EventAsset
 
 class EventAsset(Base):
     __tablename__ = 'events_eventasset'
+    __table_args__ = (booking_constraint('events_eventasset', 'asset_id'), booking_period_index('events_eventasset'))
     event_id = Column(Integer, ForeignKey('events_event.id'), primary_key=True)
     asset_id = Column(Integer, ForeignKey('events_asset.id'), primary_key=True)
+    # set by the database from the event
+    during = Column(TSRANGE, server_default=FetchedValue(), server_onupdate=FetchedValue())
 
     event = relationship("Event", back_populates="assets")
     asset = relationship("Asset", back_populates="events")
 
 
+event.listen(EventAsset.__table__, 'after_create', booking_period_ddl.execute_if(dialect='postgresql'))
+
+
 class EventAssetSchema(Schema):
     event = fields.Nested('EventSchema', dump_only=True)
     asset = fields.Nested('AssetSchema', dump_only=True)
@@ -101,13 +171,19 @@ class EventAssetSchema(Schema):
 
 class EventTeam(Base):
     __tablename__ = 'events_eventteam'
+    __table_args__ = (booking_constraint('events_eventteam', 'team_id'), booking_period_index('events_eventteam'))
     event_id = Column(Integer, ForeignKey('events_event.id'), primary_key=True)
     team_id = Column(Integer, ForeignKey('events_team.id'), primary_key=True)
+    # set by the database from the event
+    during = Column(TSRANGE, server_default=FetchedValue(), server_onupdate=FetchedValue())
 
     event = relationship("Event", back_populates="teams")
     team = relationship("Team", back_populates="events")
 
 
+event.listen(EventTeam.__table__, 'after_create', booking_period_ddl.execute_if(dialect='postgresql'))
+
+
 class EventTeamSchema(Schema):
     event_id = fields.Integer(required=True, min=1)
     team_id = fields.Integer(required=True, min=1)
@@ -120,17 +196,23 @@ class EventTeamSchema(Schema):
 
 class EventPerson(Base):
     __tablename__ = 'events_eventperson'
+    __table_args__ = (booking_constraint('events_eventperson', 'person_id'), booking_period_index('events_eventperson'))
     event_id = Column(Integer, ForeignKey('events_event.id'), primary_key=True)
     person_id = Column(
         Integer,
         ForeignKey('people_person.id'),
         primary_key=True)
     description = Column(StringTypes.LONG_STRING, nullable=False)
+    # set by the database from the event
+    during = Column(TSRANGE, server_default=FetchedValue(), server_onupdate=FetchedValue())
 
     event = relationship("Event", back_populates="persons")
     person = relationship("Person", back_populates="events_per")
 
 
+event.listen(EventPerson.__table__, 'after_create', booking_period_ddl.execute_if(dialect='postgresql'))
+
+
 class EventPersonSchema(Schema):
     event_id = fields.Integer(required=True, min=1)
     person_id = fields.Integer(required=True, min=1)
@@ -140,6 +222,14 @@ class EventPersonSchema(Schema):
     person = fields.Nested('PersonSchema', dump_only=True)
 
 
+# ---- Bookings of several resources at once
+
+class EventBookingsSchema(Schema):
+    assets = fields.List(fields.Integer(validate=Range(min=1)), missing=list)
+    teams = fields.List(fields.Integer(validate=Range(min=1)), missing=list)
+    persons = fields.List(fields.Nested('EventPersonSchema', only=['person_id', 'description']), missing=list)
+
+
 # ---- EventParticipant
 
 class EventParticipant(Base):
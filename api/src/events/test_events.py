@@ -4,12 +4,18 @@ import random
 import pytest
 from flask import url_for
 
+from sqlalchemy.exc import IntegrityError
+
 from .create_event_data import flip, fake, create_multiple_events, event_object_factory, \
     create_multiple_assets, create_multiple_teams, create_events_assets, create_events_teams, \
-    create_events_persons, create_events_participants, create_event_images
+    create_events_persons, create_events_participants, create_event_images, create_event
 from .models import Event, EventPerson, EventAsset, EventParticipant, \
     EventTeam
 from ..assets.models import Asset
+from ..emails.models import OutboxEmail
+from ..emails.test_emails import broadcast_object_factory, create_broadcast_translations
+from ..groups.create_group_data import create_multiple_group_types
+from ..groups.models import Group, GroupType, Member
 from ..images.create_image_data import create_test_images, create_images_events
 from ..images.models import Image, ImageEvent
 from ..people.models import Person
@@ -531,6 +537,138 @@ def test_remove_unbooked_asset_from_event(auth_client):
     assert new_link_count == link_count
 
 
+@pytest.mark.smoke
+def test_asset_bookings_follow_event_time(auth_client):
+    # GIVEN an asset and two events on the same day
+    generate_locations(auth_client)
+    create_multiple_assets(auth_client.sqla, 1)
+    asset_id = auth_client.sqla.query(Asset.id).first()[0]
+    day = datetime.datetime(2030, 1, 1)
+    first = create_event(auth_client.sqla, 'first', 'morning', day.replace(hour=8), day.replace(hour=12))
+    second = create_event(auth_client.sqla, 'second', 'afternoon', day.replace(hour=13), day.replace(hour=17))
+    # WHEN the asset is booked for both
+    for event_id in (first, second):
+        resp = auth_client.post(url_for('events.add_asset_to_event', event_id=event_id, asset_id=asset_id))
+        # THEN both bookings succeed
+        assert resp.status_code == 200
+    # WHEN the first event is stretched into the second
+    resp = auth_client.patch(url_for('events.update_event', event_id=first), json={'end': '2030-01-01T14:00:00'})
+    # THEN it is refused
+    assert resp.status_code == 422
+    # WHEN the second event moves out of the way first
+    resp = auth_client.patch(url_for('events.update_event', event_id=second), json={'start': '2030-01-01T15:00:00'})
+    assert resp.status_code == 200
+    resp = auth_client.patch(url_for('events.update_event', event_id=first), json={'end': '2030-01-01T14:00:00'})
+    # THEN the first one can be stretched
+    assert resp.status_code == 200
+    # WHEN a third event in the same time is booked around the API
+    third = create_event(auth_client.sqla, 'third', 'lunch', day.replace(hour=12), day.replace(hour=13))
+    auth_client.sqla.add(EventAsset(event_id=third, asset_id=asset_id))
+    # THEN the database refuses the double booking
+    with pytest.raises(IntegrityError):
+        auth_client.sqla.commit()
+    auth_client.sqla.rollback()
+    assert auth_client.sqla.query(EventAsset).count() == 2
+
+
+@pytest.mark.smoke
+def test_read_availability(auth_client):
+    # GIVEN assets, teams and people, some booked on one morning
+    generate_locations(auth_client)
+    create_multiple_assets(auth_client.sqla, 4)
+    create_multiple_teams(auth_client.sqla, 3)
+    create_multiple_people(auth_client.sqla, 3)
+    auth_client.sqla.query(Asset).update({'active': True})
+    auth_client.sqla.query(Team).update({'active': True})
+    auth_client.sqla.commit()
+    asset_ids = [asset_id for asset_id, in auth_client.sqla.query(Asset.id).order_by(Asset.id)]
+    team_ids = [team_id for team_id, in auth_client.sqla.query(Team.id).order_by(Team.id)]
+    day = datetime.datetime(2030, 1, 1)
+    morning = create_event(auth_client.sqla, 'morning', 'morning', day.replace(hour=8), day.replace(hour=12))
+    auth_client.sqla.add_all([EventAsset(event_id=morning, asset_id=asset_ids[0]),
+                              EventAsset(event_id=morning, asset_id=asset_ids[1]),
+                              EventTeam(event_id=morning, team_id=team_ids[2])])
+    auth_client.sqla.commit()
+
+    def available(**args):
+        resp = auth_client.get(url_for('events.read_availability', **args))
+        assert resp.status_code == 200
+        return [resource['id'] for resource in resp.json]
+
+    # WHEN we ask for what is free in a window overlapping the morning
+    # THEN the booked resources are left out
+    assert available(kind='asset', start='2030-01-01T11:00:00', end='2030-01-01T13:00:00') == asset_ids[2:]
+    assert available(kind='team', start='2030-01-01T11:00:00', end='2030-01-01T13:00:00') == team_ids[:2]
+    # WHEN the window starts as the morning ends
+    # THEN everything is free
+    assert available(kind='asset', start='2030-01-01T12:00:00', end='2030-01-01T13:00:00') == asset_ids
+    # WHEN we ask for free assets in one location
+    location_id = auth_client.sqla.query(Asset.location_id).filter_by(id=asset_ids[3]).scalar()
+    in_location = [asset_id for asset_id, in auth_client.sqla.query(Asset.id).filter_by(location_id=location_id)
+                   if asset_id not in asset_ids[:2]]
+    # THEN only those are listed
+    assert available(kind='asset', start='2030-01-01', end='2030-01-02',
+                     location_id=location_id) == sorted(in_location)
+    # WHEN the request is incomplete or makes no sense
+    for args in ({'kind': 'room', 'start': '2030-01-01', 'end': '2030-01-02'},
+                 {'kind': 'asset', 'start': '2030-01-01'},
+                 {'kind': 'asset', 'start': 'tomorrow', 'end': '2030-01-02'},
+                 {'kind': 'asset', 'start': '2030-01-02', 'end': '2030-01-01'},
+                 {'kind': 'team', 'start': '2030-01-01', 'end': '2030-01-02', 'location_id': location_id}):
+        resp = auth_client.get(url_for('events.read_availability', **args))
+        # THEN we expect an error
+        assert resp.status_code == 422
+
+
+@pytest.mark.smoke
+def test_add_event_bookings(auth_client):
+    # GIVEN assets, teams and people, and two events at the same time
+    generate_locations(auth_client)
+    create_multiple_assets(auth_client.sqla, 3)
+    create_multiple_teams(auth_client.sqla, 2)
+    create_multiple_people(auth_client.sqla, 2)
+    asset_ids = [asset_id for asset_id, in auth_client.sqla.query(Asset.id).order_by(Asset.id)]
+    team_ids = [team_id for team_id, in auth_client.sqla.query(Team.id).order_by(Team.id)]
+    person_ids = [person_id for person_id, in auth_client.sqla.query(Person.id).order_by(Person.id)]
+    day = datetime.datetime(2030, 1, 1)
+    retreat = create_event(auth_client.sqla, 'retreat', 'retreat', day.replace(hour=8), day.replace(hour=18))
+    meeting = create_event(auth_client.sqla, 'meeting', 'meeting', day.replace(hour=9), day.replace(hour=10))
+    # AND one asset already booked for the other event
+    auth_client.sqla.add(EventAsset(event_id=meeting, asset_id=asset_ids[0]))
+    auth_client.sqla.commit()
+    payload = {
+        'assets': asset_ids + [asset_ids[-1] + 100],
+        'teams': team_ids,
+        'persons': [{'person_id': person_id, 'description': 'speaker'} for person_id in person_ids]
+    }
+    # WHEN they are all booked for the retreat at once
+    resp = auth_client.post(url_for('events.add_event_bookings', event_id=retreat), json=payload)
+    # THEN each gets its result
+    assert resp.status_code == 200
+    assert resp.json['assets'] == [{'id': asset_ids[0], 'status': 'unavailable'}] + \
+        [{'id': asset_id, 'status': 'booked'} for asset_id in asset_ids[1:]] + \
+        [{'id': asset_ids[-1] + 100, 'status': 'not found'}]
+    assert resp.json['teams'] == [{'id': team_id, 'status': 'booked'} for team_id in team_ids]
+    assert resp.json['persons'] == [{'id': person_id, 'status': 'booked'} for person_id in person_ids]
+    # THEN the free ones are booked
+    assert auth_client.sqla.query(EventAsset).filter_by(event_id=retreat).count() == len(asset_ids) - 1
+    assert auth_client.sqla.query(EventTeam).filter_by(event_id=retreat).count() == len(team_ids)
+    assert {description for description, in auth_client.sqla.query(EventPerson.description)
+            .filter_by(event_id=retreat)} == {'speaker'}
+    # WHEN they are booked again
+    resp = auth_client.post(url_for('events.add_event_bookings', event_id=retreat), json=payload)
+    # THEN none are available
+    assert resp.status_code == 200
+    assert {booking['status'] for booking in resp.json['teams'] + resp.json['persons']} == {'unavailable'}
+    # WHEN the event or the payload is wrong
+    resp = auth_client.post(url_for('events.add_event_bookings', event_id=meeting + 100), json=payload)
+    # THEN we expect an error
+    assert resp.status_code == 404
+    resp = auth_client.post(url_for('events.add_event_bookings', event_id=retreat),
+                            json={'persons': [{'person_id': person_ids[0]}]})
+    assert resp.status_code == 422
+
+
 # ---- Linking tables (event <-> team)
 
 @pytest.mark.smoke
@@ -868,6 +1006,64 @@ def test_delete_event_participant(auth_client):
     assert resp.status_code == 404
 
 
+@pytest.mark.smoke
+def test_add_event_group(auth_client, capsys):
+    # GIVEN an event and an active group, some of whose members are inactive
+    # or already taking part in the event
+    create_multiple_people(auth_client.sqla, 8)
+    create_multiple_group_types(auth_client.sqla, 1)
+    create_multiple_events(auth_client.sqla, 1)
+    event_id = auth_client.sqla.query(Event.id).first()[0]
+    group = Group(name='group', description='', active=True,
+                  group_type_id=auth_client.sqla.query(GroupType.id).first()[0])
+    auth_client.sqla.add(group)
+    auth_client.sqla.commit()
+    people = auth_client.sqla.query(Person).order_by(Person.id).all()
+    for i, person in enumerate(people):
+        person.email = f'person{i}@example.com' if i else None
+    auth_client.sqla.add_all([Member(group_id=group.id, person_id=person.id, active=(i != 1))
+                              for i, person in enumerate(people)])
+    auth_client.sqla.add(EventParticipant(event_id=event_id, person_id=people[2].id, confirmed=False))
+    auth_client.sqla.commit()
+    capsys.readouterr()
+    # WHEN we attach the group to the event
+    resp = auth_client.post(url_for('events.add_event_group', event_id=event_id, group_id=group.id))
+    # THEN every active member takes part, and the existing participant is left as it was
+    assert resp.status_code == 201
+    participants = dict(auth_client.sqla.query(EventParticipant.person_id, EventParticipant.confirmed)
+                        .filter_by(event_id=event_id).all())
+    assert participants == {person.id: i != 2 for i, person in enumerate(people) if i != 1}
+    # THEN only the added members with an email address are notified
+    assert capsys.readouterr().out.count("email would be sent") == 5
+
+
+def test_email_event(auth_client):
+    # GIVEN an event with participants
+    create_broadcast_translations(auth_client.sqla)
+    create_multiple_people(auth_client.sqla, 3)
+    create_multiple_events(auth_client.sqla, 1)
+    event = auth_client.sqla.query(Event).first()
+    people = auth_client.sqla.query(Person).order_by(Person.id).all()
+    for i, person in enumerate(people):
+        person.active = True
+        person.email = f'person{i}@example.com'
+        person.locale_code = 'es-EC' if i == 0 else 'en-US'
+    auth_client.sqla.add_all([EventParticipant(event_id=event.id, person_id=person.id) for person in people[:2]])
+    auth_client.sqla.commit()
+    # WHEN we email an event that doesn't exist
+    resp = auth_client.post(url_for('events.email_event', event_id=event.id + 1), json=broadcast_object_factory())
+    # THEN we expect an error
+    assert resp.status_code == 404
+    # WHEN we email the event
+    resp = auth_client.post(url_for('events.email_event', event_id=event.id), json=broadcast_object_factory())
+    # THEN each participant gets a message in their locale
+    assert resp.status_code == 202
+    assert resp.json == {'recipients': 2, 'messages': 2}
+    footers = {email.recipients[0]: email.body.split('\n')[-1] for email in auth_client.sqla.query(OutboxEmail)}
+    assert footers == {'person0@example.com': f'Enviado a {event.title}.',
+                       'person1@example.com': f'Sent to {event.title}.'}
+
+
 @pytest.mark.smoke
 def test_add_event_images(auth_client):
     # GIVEN a set of events and images
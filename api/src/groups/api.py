@@ -11,9 +11,11 @@ from .models import Group, GroupSchema, Attendance, Member, MemberSchema, Meetin
     Manager, ManagerSchema, GroupType, GroupTypeSchema, ManagerType, ManagerTypeSchema, MemberHistory, \
     MemberHistorySchema
 from .. import db
+from ..emails.models import BroadcastEmailSchema
+from ..emails.outbox import enqueue_broadcast
 from ..images.models import Image, ImageGroup
 from ..people.models import Person
-from ..shared.helpers import get_all_queried_entities, logged_response, authorize
+from ..shared.helpers import get_all_queried_entities, get_schema, logged_response, authorize
 from ..shared.models import QueryArgumentError
 
 
@@ -94,7 +96,7 @@ def read_all_group_types():
 @groups.route('/group-types/<int:group_type_id>', methods=['PATCH'])
 @authorize(['role.group-admin'])
 def update_group_type(group_type_id):
-    group_type_schema = GroupTypeSchema()
+    group_type_schema = get_schema(GroupTypeSchema)
 
     try:
         valid_attributes = group_type_schema.load(request.json, partial=True)
@@ -171,7 +173,7 @@ def read_all_groups():
         groups = get_all_queried_entities(query, request.args)
     except QueryArgumentError as e:
         return logged_response(e.message, e.code)
-    group_schema = GroupSchema()
+    group_schema = get_schema(GroupSchema)
     return logged_response(group_schema.dump(groups, many=True), 200)
 
 
@@ -191,7 +193,7 @@ def update_group(group_id):
             'You must be either an admin or an overseer of the group to make this request',
             403)
 
-    group_schema = GroupSchema()
+    group_schema = get_schema(GroupSchema)
 
     try:
         valid_attributes = group_schema.load(request.json, partial=True)
@@ -229,6 +231,34 @@ def delete_group(group_id):
     return logged_response("Deleted successfully", 204)
 
 
+@groups.route('/groups/<int:group_id>/email', methods=['POST'])
+@jwt_required
+def email_group(group_id):
+    if not is_overseer_or_admin(group_id):
+        return logged_response(
+            'You must be either an admin or an overseer of the group to make this request',
+            403)
+
+    try:
+        valid_email = BroadcastEmailSchema().load(request.json)
+    except ValidationError as err:
+        return logged_response(err.messages, 422)
+
+    group = db.session.query(Group).filter_by(id=group_id).first()
+    if group is None:
+        return logged_response(
+            f"Group with id #{group_id} does not exist", 404)
+
+    recipients = db.session.query(Person.email, Person.first_name + ' ' + Person.last_name, Person.locale_code) \
+        .join(Member, Member.person_id == Person.id) \
+        .filter(Member.group_id == group_id, Member.active, Person.active, Person.email != '') \
+        .all()
+    messages = enqueue_broadcast(recipients, valid_email, 'email.broadcast.group-footer', group=group.name)
+    db.session.commit()
+
+    return logged_response({'recipients': len(recipients), 'messages': messages}, 202)
+
+
 # ---- Manager Type
 
 
@@ -273,7 +303,7 @@ def read_all_manager_types():
 @groups.route('/manager-types/<int:manager_type_id>', methods=['PATCH'])
 @authorize(['role.group-admin'])
 def update_manager_type(manager_type_id):
-    manager_type_schema = ManagerTypeSchema()
+    manager_type_schema = get_schema(ManagerTypeSchema)
 
     try:
         valid_attributes = manager_type_schema.load(request.json, partial=True)
@@ -322,7 +352,7 @@ manager_schema = ManagerSchema()
 @authorize(['role.group-admin'])
 def create_manager(group_id):
     # make group_id an invalid field in payload
-    manager_schema = ManagerSchema(exclude=['group_id'])
+    manager_schema = get_schema(ManagerSchema, exclude=['group_id'])
     try:
         valid_manager = manager_schema.load(request.json, partial=['active'])
     except ValidationError as err:
@@ -378,7 +408,7 @@ def read_one_manager(group_id, person_id):
               methods=['PATCH'])
 @authorize(['role.group-admin'])
 def update_manager(group_id, person_id):
-    manager_schema = ManagerSchema()
+    manager_schema = get_schema(ManagerSchema)
     try:
         valid_attributes = manager_schema.load(request.json, partial=True)
     except ValidationError as err:
@@ -484,7 +514,7 @@ def read_all_meetings():
         meetings = get_all_queried_entities(query, request.args)
     except QueryArgumentError as e:
         return logged_response(e.message, e.code)
-    meeting_schema = MeetingSchema()
+    meeting_schema = get_schema(MeetingSchema)
     return logged_response(meeting_schema.dump(meetings, many=True), 200)
 
 
@@ -501,7 +531,7 @@ def read_one_meeting(meeting_id):
 @groups.route('/meetings/<int:meeting_id>', methods=['PATCH'])
 @jwt_required
 def update_meeting(meeting_id):
-    meeting_schema = MeetingSchema()
+    meeting_schema = get_schema(MeetingSchema)
 
     try:
         valid_attributes = meeting_schema.load(request.json, partial=True)
@@ -563,7 +593,7 @@ def create_member(group_id):
             'You must be either an admin or an overseer of the group to make this request',
             403)
 
-    member_schema = MemberSchema(exclude=['group_id'])
+    member_schema = get_schema(MemberSchema, exclude=['group_id'])
     try:
         valid_member = member_schema.load(
             request.json, partial=['active'])  # make active optional fields
@@ -624,7 +654,7 @@ def update_member(group_id, person_id):
             'You must be either an admin or an overseer of the group to make this request',
             403)
 
-    member_schema = MemberSchema()
+    member_schema = get_schema(MemberSchema)
     try:
         valid_attributes = member_schema.load(request.json, partial=True)
     except ValidationError as err:
@@ -890,7 +920,7 @@ def read_all_member_histories():
 @groups.route('/member-histories/<int:member_history_id>', methods=['PATCH'])
 @authorize(['role.group-admin'])
 def update_member_history(member_history_id):
-    member_history_schema = MemberHistorySchema()
+    member_history_schema = get_schema(MemberHistorySchema)
 
     try:
         valid_attributes = member_history_schema.load(
@@ -5,6 +5,7 @@ from sqlalchemy.orm import relationship
 
 from ..db import Base
 from ..shared.models import StringTypes
+from ..shared.serializers import CompiledSchema
 
 
 # ---- Group
@@ -33,7 +34,7 @@ class Group(Base):
         return f"<Group(id={self.id}, name={self.name})>"
 
 
-class GroupSchema(Schema):
+class GroupSchema(CompiledSchema):
     id = fields.Integer(dump_only=True, required=True, validate=Range(min=1))
     name = fields.String(required=True, validate=Length(min=1))
     description = fields.String(required=True, validate=Length(min=1))
@@ -11,6 +11,8 @@ from .create_group_data import group_object_factory, \
     create_hierarchy_test_case_1, create_multiple_member_histories
 from .group_hierarchy_helpers import get_all_subgroups
 from .models import Group, GroupType, Member, MemberSchema, Meeting, Attendance, Manager, ManagerType, MemberHistory
+from ..emails.models import OutboxEmail
+from ..emails.test_emails import broadcast_object_factory, create_broadcast_translations
 from ..images.create_image_data import create_images_groups
 from ..images.create_image_data import create_test_images
 from ..images.models import Image, ImageGroup
@@ -400,6 +402,66 @@ def test_deactivate_group(auth_client):
         assert resp.json['active'] == False
 
 
+
+def test_email_group(auth_client):
+    # GIVEN a group whose members speak English or Spanish, one of them
+    # without an email address and one no longer in the group
+    create_broadcast_translations(auth_client.sqla)
+    create_multiple_group_types(auth_client.sqla, 1)
+    create_multiple_groups(auth_client.sqla, 1)
+    group = auth_client.sqla.query(Group).first()
+    create_multiple_people(auth_client.sqla, 6)
+    people = auth_client.sqla.query(Person).order_by(Person.id).all()
+    for i, person in enumerate(people):
+        person.active = True
+        person.email = f'person{i}@example.com' if i != 1 else None
+        person.locale_code = 'es-EC' if i == 0 else None
+    auth_client.sqla.add_all([Member(group_id=group.id, person_id=person.id, active=(i != 2))
+                              for i, person in enumerate(people)])
+    auth_client.sqla.commit()
+    headers = {'AUTHORIZATION': f'Bearer {get_group_admin_token()}'}
+
+    # WHEN someone who doesn't manage the group emails it
+    resp = auth_client.post(url_for('groups.email_group', group_id=group.id), json=broadcast_object_factory())
+    # THEN we expect an error
+    assert resp.status_code == 403
+    # WHEN the email is incomplete, or the group doesn't exist
+    resp = auth_client.post(url_for('groups.email_group', group_id=group.id), json={'subject': 'News'},
+                            headers=headers)
+    assert resp.status_code == 422
+    resp = auth_client.post(url_for('groups.email_group', group_id=group.id + 1), json=broadcast_object_factory(),
+                            headers=headers)
+    assert resp.status_code == 404
+    # THEN nothing is queued
+    assert auth_client.sqla.query(OutboxEmail).count() == 0
+
+    # WHEN an admin emails the group
+    resp = auth_client.post(url_for('groups.email_group', group_id=group.id), json=broadcast_object_factory(),
+                            headers=headers)
+    # THEN every member with an address gets a message in their locale
+    assert resp.status_code == 202
+    assert resp.json == {'recipients': 4, 'messages': 4}
+    bodies = {email.recipients[0]: email.body for email in auth_client.sqla.query(OutboxEmail)}
+    assert sorted(bodies) == [f'person{i}@example.com' for i in (0, 3, 4, 5)]
+    assert bodies['person0@example.com'] == \
+        f"Hola {people[0].full_name()}:\n\nWe meet on Sunday.\n\n-- \nEnviado a los miembros de {group.name}."
+    assert bodies['person3@example.com'] == \
+        f"Hello {people[3].full_name()},\n\nWe meet on Sunday.\n\n-- \nSent to the members of {group.name}."
+
+    # WHEN the group is emailed with Bcc, two recipients to a message
+    auth_client.sqla.query(OutboxEmail).delete()
+    auth_client.sqla.commit()
+    auth_client.application.config['MAIL_BROADCAST_CHUNK_SIZE'] = 2
+    resp = auth_client.post(url_for('groups.email_group', group_id=group.id),
+                            json=broadcast_object_factory(bcc=True), headers=headers)
+    # THEN the recipients are chunked within each locale
+    assert resp.json == {'recipients': 4, 'messages': 3}
+    emails = auth_client.sqla.query(OutboxEmail).all()
+    assert sorted(email.bcc for email in emails) == \
+        [['person0@example.com'], ['person3@example.com', 'person4@example.com'], ['person5@example.com']]
+    assert all(email.recipients == [] for email in emails)
+    assert sorted(email.body.split('\n')[0] for email in emails) == ['Hello,', 'Hello,', 'Hola:']
+
 # # ---- Meeting
 
 
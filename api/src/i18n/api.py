@@ -1,13 +1,16 @@
-from flask import request, jsonify
+from flask import current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_claims
 from marshmallow import ValidationError, Schema, fields
 from marshmallow.validate import Length
+from sqlalchemy import and_, exists
 
 from . import i18n
-from .models import I18NLocale, I18NLocaleSchema, I18NKeySchema, I18NKey, I18NValue, I18NValueSchema, Language
+from .catalog import Catalog, get_catalog
+from .models import I18NLocale, I18NLocaleSchema, I18NKeySchema, I18NKey, I18NValue, I18NValueSchema, Language, \
+    I18NValueDeletion
 from .. import db
-from ..shared.helpers import list_to_tree, BadListKeyPath
-from ..shared.helpers import logged_response, authorize
+from ..shared.helpers import BadListKeyPath
+from ..shared.helpers import cacheable, get_schema, logged_response, authorize
 
 # ---- I18N Locale
 
@@ -92,6 +95,7 @@ i18n_value_schema = I18NValueSchema()
 
 
 @i18n.route('/values')
+@cacheable
 def read_all_values():
     values = db.session.query(I18NValue).all()
     return jsonify(i18n_value_schema.dump(values, many=True))
@@ -102,7 +106,7 @@ def read_all_values():
 @jwt_required
 def update_a_value():
     #     update the values with the info in payload
-    i18n_value_schema = I18NValueSchema()
+    i18n_value_schema = get_schema(I18NValueSchema)
 
     #     verify_jwt_in_request()
     claims = get_jwt_claims()
@@ -135,35 +139,66 @@ def update_a_value():
 
 
 @i18n.route('/values/<locale_code>')
+@cacheable
 def read_xlation(locale_code):
-    # Check that the locale exists.
+    # Served from the catalog, which keeps each locale's list and tree
+    # as JSON until its values change.
+    format = request.args.get('format', 'list')
+    if format not in Catalog.FORMATS:
+        return 'Invalid format', 400
+    if 'since' in request.args:
+        if format != 'list':
+            return 'Changes are only available as a list', 400
+        return read_xlation_changes(locale_code, request.args['since'])
+    try:
+        catalog_entry = get_catalog().get(locale_code, format)
+    except BadListKeyPath as e:
+        return str(e), 400
+    if catalog_entry is None:
+        return 'Locale not found', 404
+
+    body, etag = catalog_entry
+    response = current_app.response_class(body, mimetype=current_app.config['JSONIFY_MIMETYPE'])
+    response.set_etag(etag)
+    # Clients may keep the body, but must check that it's still current.
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def read_xlation_changes(locale_code, since):
+    """The values of a locale that changed after revision `since`.
+
+    Returns the locale's current revision, the changed values and the keys
+    of deleted values. If the changes since then weren't all recorded,
+    `reset` is true and `values` holds every value of the locale instead.
+    """
+    try:
+        since = int(since)
+    except ValueError:
+        return 'Invalid revision', 400
+    # Read the revision first; values committed after that are included
+    # here and again in the next request, but none are missed.
     locale = db.session.query(I18NLocale).filter_by(code=locale_code).first()
     if locale is None:
         return 'Locale not found', 404
 
-    # Fetch the values for this locale
+    reset = not locale.synced_from <= since <= locale.revision
     values = db.session.query(I18NValue).filter_by(locale_code=locale_code)
-
-    # Format the response.
-    format = request.args.get('format', 'list')
-    if format == 'list':
-        # Return the values as a simple list.
-        return jsonify(i18n_value_schema.dump(values, many=True))
-    elif format == 'tree':
-        # Interpret keys as a hierarchical structure.
-        # Tree-building idea from  https://stackoverflow.com/questions/16547643
-        entries = map(
-            lambda value: {
-                'path': value.key_id,
-                'value': value.gloss},
-            values)
-        try:
-            tree = list_to_tree(entries)
-        except BadListKeyPath as e:
-            return str(e), 400
-        return jsonify(tree)
+    if reset:
+        deleted = []
     else:
-        return 'Invalid format', 400
+        values = values.filter(I18NValue.revision > since)
+        deleted = db.session.query(I18NValueDeletion.key_id) \
+            .filter(I18NValueDeletion.locale_code == locale_code,
+                    I18NValueDeletion.revision > since,
+                    ~exists().where(and_(I18NValue.locale_code == I18NValueDeletion.locale_code,
+                                         I18NValue.key_id == I18NValueDeletion.key_id)))
+    return jsonify({
+        'revision': locale.revision,
+        'reset': reset,
+        'values': get_schema(I18NValueSchema).dump(values, many=True),
+        'deleted': [key_id for key_id, in deleted]
+    })
 
 
 # ---- Language
@@ -183,6 +218,7 @@ language_schema = LanguageSchema()
 
 @i18n.route('/languages')
 @i18n.route('/languages/<language_code>')
+@cacheable
 def read_languages(language_code=None):
     locale_code = request.args.get('locale')
     if locale_code is None:
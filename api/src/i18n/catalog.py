@@ -0,0 +1,110 @@
+import hashlib
+import threading
+import time
+
+from flask import current_app, has_app_context, jsonify
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .models import I18NLocale, I18NValue, I18NValueSchema, ALL_LOCALES
+from .. import db
+from ..shared.helpers import get_schema, list_to_tree
+
+
+class CatalogEntry:
+    """The serialized translations of one locale at one revision
+    (None if the locale doesn't exist)."""
+
+    def __init__(self, revision):
+        self.revision = revision
+        self.checked_at = time.monotonic()
+        # format -> (body, etag)
+        self.bodies = {}
+
+
+class Catalog:
+    """Per-locale cache of the translations served by `read_xlation`.
+
+    Holds the JSON bodies of the list and tree formats with their ETags.
+    A locale's revision (see `I18NLocale.revision`) is read again at most
+    every `check_interval` seconds, so that changes made by other processes
+    show up; changes committed in this process drop the entry at once.
+    """
+
+    FORMATS = ('list', 'tree')
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, locale_code, format):
+        """Return (body, etag), or None if there's no such locale.
+
+        Raises `BadListKeyPath` if the keys don't form a tree.
+        """
+        entry = self.entry(locale_code)
+        if entry.revision is None:
+            return None
+        body = entry.bodies.get(format)
+        if body is None:
+            body = entry.bodies[format] = self.build(locale_code, format)
+        return body
+
+    def revision(self, locale_code):
+        """The locale's revision as of the last check, or None if there's no such locale."""
+        return self.entry(locale_code).revision
+
+    def entry(self, locale_code):
+        entry = self._entries.get(locale_code)
+        now = time.monotonic()
+        if entry is None or now - entry.checked_at >= self.check_interval:
+            # A missing locale gets an entry too, with no revision.
+            revision = db.session.query(I18NLocale.revision).filter_by(code=locale_code).scalar()
+            if entry is None or entry.revision != revision:
+                entry = CatalogEntry(revision)
+                with self._lock:
+                    self._entries[locale_code] = entry
+            entry.checked_at = now
+        return entry
+
+    @staticmethod
+    def build(locale_code, format):
+        values = db.session.query(I18NValue).filter_by(locale_code=locale_code)
+        if format == 'list':
+            data = get_schema(I18NValueSchema).dump(values, many=True)
+        else:
+            # Interpret keys as a hierarchical structure.
+            # Tree-building idea from  https://stackoverflow.com/questions/16547643
+            data = list_to_tree({'path': value.key_id, 'value': value.gloss} for value in values)
+        body = jsonify(data).get_data()
+        return body, hashlib.blake2b(body, digest_size=16).hexdigest()
+
+    def invalidate(self, locale_codes=ALL_LOCALES):
+        with self._lock:
+            if locale_codes is ALL_LOCALES:
+                self._entries.clear()
+            else:
+                for locale_code in locale_codes:
+                    self._entries.pop(locale_code, None)
+
+
+def get_catalog():
+    """The catalog of the current app."""
+    catalog = current_app.extensions.get('i18n_catalog')
+    if catalog is None:
+        catalog = current_app.extensions.setdefault(
+            'i18n_catalog', Catalog(current_app.config['I18N_CATALOG_CHECK_INTERVAL']))
+    return catalog
+
+
+@event.listens_for(Session, 'after_commit')
+def drop_changed_locales(session):
+    changed = session.info.pop('i18n_changed_locales', set())
+    if changed != set() and has_app_context():
+        get_catalog().invalidate(changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_changed_locales(session):
+    session.info.pop('i18n_changed_locales', None)
@@ -5,13 +5,15 @@ from flask import json
 from marshmallow import Schema
 from marshmallow import fields, ValidationError, validates
 from marshmallow.validate import Length
-from sqlalchemy import Column, String, ForeignKey, Text, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, ForeignKey, Text, Boolean, Integer, Index, any_, bindparam, event, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.orm import relationship, Session
 
 from .. import db
 from ..db import Base
-from ..shared.helpers import get_or_create
+from ..shared.helpers import insert_missing
 from ..shared.models import StringTypes
+from ..shared.serializers import CompiledSchema
 
 
 # ---- Locale
@@ -21,6 +23,11 @@ class I18NLocale(Base):
     __tablename__ = 'i18n_locale'
     code = Column(StringTypes.LOCALE_CODE, primary_key=True)
     desc = Column(StringTypes.MEDIUM_STRING, nullable=False, default="")
+    # Incremented by every change to the locale's values (see `bump_revisions`).
+    revision = Column(Integer, nullable=False, default=0, server_default='0')
+    # Changes before this revision weren't recorded value by value,
+    # so clients that synced earlier have to reload the whole locale.
+    synced_from = Column(Integer, nullable=False, default=0, server_default='0')
     values = relationship('I18NValue', back_populates='locale', lazy=True)
 
     def __repr__(self):
@@ -48,6 +55,9 @@ class I18NKey(Base):
     languages = relationship('Language', back_populates='key', lazy=True)
     countries = relationship('Country', back_populates='key', lazy=True)
 
+    # For subtree queries (see `under_key_path`).
+    __table_args__ = (Index('ix_i18n_key_id_c', id.collate('C')),)
+
     def __repr__(self):
         return f"<I18NKey(key='{self.id}')>"
 
@@ -72,15 +82,112 @@ class I18NValue(Base):
     locale_code = Column(StringTypes.LOCALE_CODE, ForeignKey('i18n_locale.code'), primary_key=True)
     gloss = Column(Text(), nullable=False)
     verified = Column(Boolean, default=False)
+    # Revision of the locale when this value last changed.
+    revision = Column(Integer, nullable=False, default=0, server_default='0')
 
     key = relationship('I18NKey', back_populates='values', lazy=True)
     locale = relationship('I18NLocale', back_populates='values', lazy=True)
 
+    __table_args__ = (Index('ix_i18n_value_locale_revision', locale_code, revision),
+                      Index('ix_i18n_value_key_id_c', key_id.collate('C')))
+
     def __repr__(self):
         return f"<I18NValue(gloss='{self.gloss}, key_id={self.key_id}')>"
 
 
-class I18NValueSchema(Schema):
+class I18NValueDeletion(Base):
+    """Record of a deleted I18NValue, so that clients can drop it too."""
+    __tablename__ = 'i18n_value_deletion'
+    key_id = Column(StringTypes.I18N_KEY, primary_key=True)
+    locale_code = Column(StringTypes.LOCALE_CODE, ForeignKey('i18n_locale.code'), primary_key=True)
+    # Revision of the locale when the value was deleted.
+    revision = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<I18NValueDeletion(key_id={self.key_id}, locale_code={self.locale_code})>"
+
+
+# All locales, for changes that can't be traced to particular ones.
+ALL_LOCALES = None
+
+
+def bump_revisions(session, locale_codes, reset=False):
+    """Increment the revision of the given locales (or of all locales)
+    in the session's transaction, and remember them for `after_commit`.
+
+    With `reset`, the changes aren't recorded value by value, and clients
+    have to reload these locales. Returns {locale code: new revision}.
+
+    The update locks the locales' rows until the transaction ends, so
+    revisions are committed in the order they're handed out.
+    """
+    values = {'revision': I18NLocale.revision + 1}
+    if reset:
+        values['synced_from'] = I18NLocale.revision + 1
+    statement = update(I18NLocale.__table__).values(**values)
+    if locale_codes is not ALL_LOCALES:
+        statement = statement.where(I18NLocale.code.in_(locale_codes))
+    revisions = dict(session.execute(statement.returning(I18NLocale.code, I18NLocale.revision)).fetchall())
+    remember_changed_locales(session, locale_codes)
+    return revisions
+
+
+def remember_changed_locales(session, locale_codes):
+    """Note locales whose cached translations are out of date once the session commits."""
+    changed = session.info.get('i18n_changed_locales', set())
+    if changed is ALL_LOCALES or locale_codes is ALL_LOCALES:
+        session.info['i18n_changed_locales'] = ALL_LOCALES
+    else:
+        session.info['i18n_changed_locales'] = changed | set(locale_codes)
+
+
+@event.listens_for(Session, 'before_flush')
+def stamp_values(session, flush_context, instances):
+    """Give changed values the new revision of their locale,
+    and record deleted ones."""
+    changed = [value for value in session.new if isinstance(value, I18NValue)]
+    changed += [value for value in session.dirty
+                if isinstance(value, I18NValue) and session.is_modified(value)]
+    deleted = [value for value in session.deleted if isinstance(value, I18NValue)]
+    added_or_removed = {locale.code for locale in list(session.new) + list(session.deleted)
+                        if isinstance(locale, I18NLocale)}
+    if added_or_removed:
+        # Let the catalog know that these exist now, or no longer do.
+        remember_changed_locales(session, added_or_removed)
+    if not changed and not deleted:
+        return
+
+    locale_codes = {value.locale_code for value in changed + deleted}
+    # Locales added in this flush don't have a row to update yet; they
+    # start at the revision after their default, which their values share.
+    new_locales = {locale.code: locale for locale in session.new
+                   if isinstance(locale, I18NLocale) and locale.code in locale_codes}
+    for locale in new_locales.values():
+        locale.revision = (locale.revision or 0) + 1
+    revisions = {code: locale.revision for code, locale in new_locales.items()}
+    if locale_codes - new_locales.keys():
+        revisions.update(bump_revisions(session, locale_codes - new_locales.keys()))
+    for value in changed:
+        value.revision = revisions.get(value.locale_code, 0)
+    if deleted:
+        statement = insert(I18NValueDeletion.__table__).values([
+            {'key_id': value.key_id, 'locale_code': value.locale_code, 'revision': revisions.get(value.locale_code, 0)}
+            for value in deleted])
+        session.execute(statement.on_conflict_do_update(
+            index_elements=['key_id', 'locale_code'],
+            set_={'revision': statement.excluded.revision}))
+
+
+@event.listens_for(Session, 'after_bulk_update')
+@event.listens_for(Session, 'after_bulk_delete')
+def values_changed_in_bulk(context):
+    if context.mapper.class_ is I18NValue:
+        bump_revisions(context.session, ALL_LOCALES, reset=True)
+        # Clients will reload everything, so the deletions so far are no use.
+        context.session.execute(I18NValueDeletion.__table__.delete())
+
+
+class I18NValueSchema(CompiledSchema):
     key_id = fields.String(required=True)
     locale_code = fields.String(required=True)
     gloss = fields.String(required=True)
@@ -104,7 +211,6 @@ class Language(Base):
             cls,
             file_name='language-codes.json',
             locale_code='en-US'):
-        count = 0
         file_path = os.path.abspath(
             os.path.join(
                 __file__,
@@ -115,27 +221,16 @@ class Language(Base):
         with open(file_path, 'r') as fp:
             languages = json.load(fp)
 
-            for language in languages:
-                language_code = language['alpha2']
-                language_name = language['English']
-
-                name_i18n = f'language.name.{language_code}'[:32]
-
-                # Create the key if it does not exist
-
-                get_or_create(db.session, I18NKey, filters={
-                    'id': name_i18n}, attributes={
-                    'desc': f"Language {language_name}"})
-
-                # Note: Create I18NValue s with flask i18n load <locale>
-
-                if not db.session.query(cls).filter_by(
-                        code=language_code).count():
-                    db.session.add(
-                        cls(code=language_code, name_i18n=name_i18n))
-                    count += 1
-            db.session.commit()
-        fp.close()
+        # Create the keys and languages that don't exist, with one query
+        # and one insert for each table.
+        # Note: Create I18NValue s with flask i18n load <locale>
+        insert_missing(I18NKey, [{'id': f"language.name.{language['alpha2']}"[:32],
+                                  'desc': f"Language {language['English']}"}
+                                 for language in languages], 'id')
+        count = len(insert_missing(cls, [{'code': language['alpha2'],
+                                          'name_i18n': f"language.name.{language['alpha2']}"[:32]}
+                                         for language in languages], 'code'))
+        db.session.commit()
         return count
 
 
@@ -208,3 +303,73 @@ def i18n_check(key_id, locale_code):
     """Check whether there's a value with the given key and locale."""
     return db.session.query(I18NValue).filter_by(
         key_id=key_id, locale_code=locale_code).first()
+
+
+# ---- Bulk
+
+# Rows per INSERT statement in `i18n_bulk_upsert`.
+UPSERT_BATCH_SIZE = 1000
+
+
+def i18n_existing(key_ids, locale_codes):
+    """Find which of the given keys, and of their values in the given locales,
+    are already in the database, in two queries.
+
+    Returns ({key id: description}, {(key id, locale code)}).
+    """
+    key_ids = bindparam('key_ids', list(key_ids), type_=ARRAY(String))
+    keys = dict(db.session.query(I18NKey.id, I18NKey.desc).filter(I18NKey.id == any_(key_ids)))
+    values = set(db.session.query(I18NValue.key_id, I18NValue.locale_code)
+                 .filter(I18NValue.key_id == any_(key_ids), I18NValue.locale_code.in_(locale_codes)))
+    return keys, values
+
+
+def i18n_bulk_upsert(keys, values):
+    """Create or update many keys and values in the session's transaction.
+
+    `keys` maps key ids to descriptions; a description of None creates the
+    key if it's missing and leaves it alone otherwise.
+    `values` are dicts with key_id, locale_code, gloss and verified; missing
+    locales are created. The changed values get new revisions of their locales.
+    """
+    # These statements bypass the session, so write out what's pending first
+    # and drop what it holds afterwards.
+    db.session.flush()
+
+    def execute_in_batches(statement, rows):
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            db.session.execute(statement.values(rows[start:start + UPSERT_BATCH_SIZE]))
+
+    key_table = I18NKey.__table__
+    execute_in_batches(insert(key_table).on_conflict_do_nothing(),
+                       [{'id': key_id, 'desc': ''} for key_id, desc in keys.items() if desc is None])
+    statement = insert(key_table)
+    execute_in_batches(statement.on_conflict_do_update(index_elements=['id'],
+                                                       set_={'desc': statement.excluded.desc}),
+                       [{'id': key_id, 'desc': desc} for key_id, desc in keys.items() if desc is not None])
+
+    locale_codes = {value['locale_code'] for value in values}
+    if locale_codes:
+        execute_in_batches(insert(I18NLocale.__table__).on_conflict_do_nothing(),
+                           [{'code': locale_code, 'desc': ''} for locale_code in locale_codes])
+        revisions = bump_revisions(db.session, locale_codes)
+        statement = insert(I18NValue.__table__)
+        execute_in_batches(
+            statement.on_conflict_do_update(
+                index_elements=['key_id', 'locale_code'],
+                set_={column: statement.excluded[column] for column in ('gloss', 'verified', 'revision')}),
+            [{**value, 'revision': revisions[value['locale_code']]} for value in values])
+
+    db.session.expire_all()
+
+
+def i18n_insert_missing(keys, values):
+    """Create those of the given keys and values that aren't in the database
+    yet, in the session's transaction; arguments as for `i18n_bulk_upsert`.
+
+    Finding what's missing takes one query per table.
+    """
+    existing_keys, existing_values = i18n_existing(keys, {value['locale_code'] for value in values})
+    i18n_bulk_upsert({key_id: desc for key_id, desc in keys.items() if key_id not in existing_keys},
+                     [value for value in values
+                      if (value['key_id'], value['locale_code']) not in existing_values])
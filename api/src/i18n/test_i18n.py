@@ -1,8 +1,9 @@
+import gzip
 from collections import defaultdict
 from functools import reduce
 
 import pytest
-from flask import url_for
+from flask import current_app, url_for
 
 from .models import I18NLocale, I18NKey, I18NValue, Language, i18n_read, i18n_update, i18n_delete, i18n_check
 from ..shared.helpers import get_token_with_roles
@@ -203,6 +204,33 @@ def test_read_all_values(auth_client):
     assert len(resp.json) == len(locale_data) * len(key_data)
 
 
+def test_read_all_values_compressed(auth_client):
+    # GIVEN i18n test data
+    seed_database(auth_client.sqla)
+    plain = auth_client.get(url_for('i18n.read_all_values'))
+    cache = current_app.extensions['compression_cache']
+    cache.clear()
+
+    # WHEN a client that accepts gzip asks for the values
+    resp = auth_client.get(url_for('i18n.read_all_values'), headers={'Accept-Encoding': 'gzip'})
+    # THEN the body is compressed and decompresses to the same JSON
+    assert resp.status_code == 200
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in resp.headers['Vary']
+    assert gzip.decompress(resp.get_data()) == plain.get_data()
+    # AND the compressed body is kept
+    cached_size = cache.size
+    assert cached_size == len(resp.get_data())
+
+    # WHEN it asks again THEN the kept body is reused
+    again = auth_client.get(url_for('i18n.read_all_values'), headers={'Accept-Encoding': 'gzip'})
+    assert again.get_data() == resp.get_data()
+    assert cache.size == cached_size
+
+    # WHEN the client doesn't accept compression THEN the body is plain
+    assert 'Content-Encoding' not in plain.headers
+
+
 @pytest.mark.parametrize('format', [None, 'list'])
 @pytest.mark.parametrize('code', locale_codes)
 def test_one_locale_as_list(auth_client, format, code):
@@ -258,6 +286,154 @@ def test_update_a_value(auth_client):
     assert resp.status_code == 403
 
 
+def test_xlation_etag(auth_client):
+    # GIVEN i18n test data
+    seed_database(auth_client.sqla)
+    url = url_for('i18n.read_xlation', locale_code=locale_codes[0], format='tree')
+    resp = auth_client.get(url)
+    assert resp.status_code == 200
+    etag = resp.headers['ETag']
+
+    # WHEN the client asks again with the ETag it has
+    again = auth_client.get(url, headers={'If-None-Match': etag})
+    # THEN the body isn't sent again
+    assert again.status_code == 304
+    assert again.get_data() == b''
+
+    # AND the same holds for a compressed body
+    current_app.config['COMPRESS_MIN_SIZE'] = 0
+    compressed = auth_client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['ETag'] != etag
+    again = auth_client.get(url, headers={'Accept-Encoding': 'gzip',
+                                          'If-None-Match': compressed.headers['ETag']})
+    assert again.status_code == 304
+
+
+def test_xlation_changes_with_values(auth_client):
+    # GIVEN translations that have been read once
+    seed_database(auth_client.sqla)
+    test = auth_client.sqla.query(I18NValue).first()
+    url = url_for('i18n.read_xlation', locale_code=test.locale_code)
+    before = auth_client.get(url)
+    other_locale = next(code for code in locale_codes if code != test.locale_code)
+    other_before = auth_client.get(url_for('i18n.read_xlation', locale_code=other_locale))
+
+    # WHEN one of the values changes
+    resp = auth_client.patch(
+        url_for('i18n.update_a_value'),
+        json={'key_id': test.key_id, 'locale_code': test.locale_code, 'gloss': 'CHANGED'},
+        headers={'AUTHORIZATION': f'Bearer {get_token_with_roles(["role.translator"])}'})
+    assert resp.status_code == 200
+
+    # THEN the locale is served with the new value and a new ETag
+    after = auth_client.get(url, headers={'If-None-Match': before.headers['ETag']})
+    assert after.status_code == 200
+    assert after.headers['ETag'] != before.headers['ETag']
+    assert {'key_id': test.key_id, 'gloss': 'CHANGED'}.items() <= \
+        next(value for value in after.json if value['key_id'] == test.key_id).items()
+    # AND other locales are unchanged
+    other_after = auth_client.get(url_for('i18n.read_xlation', locale_code=other_locale))
+    assert other_after.headers['ETag'] == other_before.headers['ETag']
+
+
+def test_bulk_changes_bump_revisions(auth_client):
+    # GIVEN i18n test data
+    seed_database(auth_client.sqla)
+    revisions = dict(auth_client.sqla.query(I18NLocale.code, I18NLocale.revision))
+
+    # WHEN values are deleted in bulk
+    auth_client.sqla.query(I18NValue).filter(I18NValue.key_id.like('btn.%')).delete(synchronize_session=False)
+    auth_client.sqla.commit()
+
+    # THEN every locale gets a new revision
+    for code, revision in auth_client.sqla.query(I18NLocale.code, I18NLocale.revision):
+        assert revision > revisions[code]
+    # AND the values are no longer served
+    resp = auth_client.get(url_for('i18n.read_xlation', locale_code=locale_codes[0]))
+    assert not any(value['key_id'].startswith('btn.') for value in resp.json)
+
+
+def test_xlation_changes_since(auth_client):
+    # GIVEN i18n test data, synced by a client
+    seed_database(auth_client.sqla)
+    code = locale_codes[0]
+    url = url_for('i18n.read_xlation', locale_code=code)
+    resp = auth_client.get(url, query_string={'since': 0})
+    assert resp.status_code == 200
+    assert len(resp.json['values']) == len(key_data)
+    revision = resp.json['revision']
+
+    # WHEN nothing has changed THEN there's nothing to patch
+    resp = auth_client.get(url, query_string={'since': revision})
+    assert resp.json == {'revision': revision, 'reset': False, 'values': [], 'deleted': []}
+
+    # WHEN one value changes and another is deleted
+    changed, deleted = auth_client.sqla.query(I18NValue).filter_by(locale_code=code).limit(2).all()
+    changed.gloss = 'CHANGED'
+    auth_client.sqla.delete(deleted)
+    auth_client.sqla.commit()
+
+    # THEN only those are returned, with a later revision
+    resp = auth_client.get(url, query_string={'since': revision})
+    assert resp.status_code == 200
+    assert resp.json['revision'] > revision
+    assert not resp.json['reset']
+    assert [(value['key_id'], value['gloss']) for value in resp.json['values']] == [(changed.key_id, 'CHANGED')]
+    assert resp.json['deleted'] == [deleted.key_id]
+    # AND other locales are unaffected
+    other = auth_client.get(url_for('i18n.read_xlation', locale_code=locale_codes[1]), query_string={'since': 0})
+    assert len(other.json['values']) == len(key_data)
+
+
+def test_xlation_changes_of_new_locale(auth_client):
+    # GIVEN a locale created along with its values, in one commit
+    auth_client.sqla.add(I18NLocale(code='fr-FR', desc='Français'))
+    for key in key_data:
+        auth_client.sqla.add(I18NKey(**key))
+        auth_client.sqla.add(I18NValue(locale_code='fr-FR', key_id=key['id'], gloss=key['desc']))
+    auth_client.sqla.commit()
+
+    # WHEN a client syncs the locale from scratch
+    resp = auth_client.get(url_for('i18n.read_xlation', locale_code='fr-FR'), query_string={'since': 0})
+    # THEN it gets every value
+    assert resp.status_code == 200
+    assert resp.json['revision'] > 0
+    assert len(resp.json['values']) == len(key_data)
+
+
+def test_xlation_changes_after_bulk_change(auth_client):
+    # GIVEN a client that has synced a locale
+    seed_database(auth_client.sqla)
+    url = url_for('i18n.read_xlation', locale_code=locale_codes[0])
+    revision = auth_client.get(url, query_string={'since': 0}).json['revision']
+
+    # WHEN values are changed in bulk
+    auth_client.sqla.query(I18NValue).filter(I18NValue.key_id.like('btn.%')).delete(synchronize_session=False)
+    auth_client.sqla.commit()
+
+    # THEN the client is told to reload the whole locale
+    resp = auth_client.get(url, query_string={'since': revision})
+    assert resp.json['reset']
+    assert len(resp.json['values']) == len(key_data) - 2
+    # AND it can sync incrementally from the new revision
+    resp = auth_client.get(url, query_string={'since': resp.json['revision']})
+    assert not resp.json['reset']
+
+
+@pytest.mark.parametrize('since', ['yesterday', '-1', '99999'])
+def test_xlation_changes_bogus_revision(auth_client, since):
+    create_locales(auth_client.sqla)
+    url = url_for('i18n.read_xlation', locale_code=locale_codes[0])
+    resp = auth_client.get(url, query_string={'since': since})
+    if since == 'yesterday':
+        assert resp.status_code == 400
+    else:
+        # A revision the server never handed out means a full reload.
+        assert resp.json['reset']
+    resp = auth_client.get(url, query_string={'since': 0, 'format': 'tree'})
+    assert resp.status_code == 400
+
+
 @pytest.mark.smoke
 def test_bogus_xlation_locale(auth_client):
     resp = auth_client.get(
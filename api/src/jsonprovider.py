@@ -0,0 +1,60 @@
+import datetime
+import decimal
+
+from flask.json import JSONEncoder as FlaskJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # Optional; the standard library encoder is used without it.
+    orjson = None
+
+
+class JSONEncoder(FlaskJSONEncoder):
+    """Flask's encoder, with ISO 8601 dates (as the schemas emit) and Decimals."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.date, datetime.time)):
+            return o.isoformat()
+        if isinstance(o, decimal.Decimal):
+            return str(o)
+        return super().default(o)
+
+
+class OrjsonEncoder(JSONEncoder):
+    """Encode with orjson, falling back to the standard library for what it can't do.
+
+    orjson writes compact output, or indents by two spaces; other layouts
+    and values it rejects (e.g., integers over 64 bits) go through the
+    standard library encoder instead.
+    """
+
+    def encode(self, o):
+        if self.indent not in (None, 2):
+            return super().encode(o)
+
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.indent == 2:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(o, default=self.default, option=option).decode('utf-8')
+        except TypeError:
+            return super().encode(o)
+
+
+def init_app(app):
+    """Set the encoder used by `jsonify` from the JSON_BACKEND setting.
+
+    JSON_BACKEND is 'orjson', 'stdlib', or 'auto' (orjson when installed).
+    """
+    backend = app.config['JSON_BACKEND']
+    if backend not in ('auto', 'orjson', 'stdlib'):
+        raise RuntimeError(f"Unknown JSON_BACKEND '{backend}'")
+    if backend == 'orjson' and orjson is None:
+        raise RuntimeError("JSON_BACKEND is 'orjson' but orjson isn't installed")
+
+    if backend != 'stdlib' and orjson is not None:
+        app.json_encoder = OrjsonEncoder
+    else:
+        app.json_encoder = JSONEncoder
@@ -12,7 +12,7 @@ from ..auth.blacklist_helpers import revoke_tokens_of_account
 from ..courses.models import Student
 from ..events.models import EventPerson, EventParticipant
 from ..images.models import Image, ImagePerson
-from ..shared.helpers import logged_response
+from ..shared.helpers import logged_response, read_write
 from ..teams.models import TeamMember
 
 # ---- Person
@@ -307,6 +307,7 @@ def activate_account(account_id):
 @people.route('/accounts/<account_id>/confirm')
 @jwt_required
 # @authorize(['role.superuser, role.infrastructure']) # <-- Only these people can confirm an account
+@read_write
 def confirm_user_account(account_id):
     """ Confirm a user's account (ADMIN ACTION ONLY) """
     person = db.session.query(Person).filter_by(id=account_id).first()
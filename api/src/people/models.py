@@ -9,8 +9,10 @@ from werkzeug.security import generate_password_hash, check_password_hash
 
 from .. import db
 from ..db import Base
-from ..i18n.models import i18n_create, I18NLocale
+from ..i18n.models import i18n_insert_missing
+from ..shared.helpers import insert_missing
 from ..shared.models import StringTypes
+from ..shared.serializers import CompiledSchema
 
 # Defines join table for people_person and people_role
 people_person_role = Table('person_role', Base.metadata,
@@ -48,6 +50,8 @@ class Person(Base):
         ForeignKey('places_address.id'),
         nullable=True,
         default=None)
+    # Locale of the emails sent to the person; I18N_DEFAULT_LOCALE if None.
+    locale_code = Column(StringTypes.LOCALE_CODE, nullable=True)
 
     address = relationship('Address', back_populates='people', lazy=True)
     # events_per refers to the events led by the person (linked via
@@ -109,7 +113,7 @@ class Person(Base):
         return check_password_hash(self.password_hash, password)
 
 
-class PersonSchema(Schema):
+class PersonSchema(CompiledSchema):
     id = fields.Integer(dump_only=True, required=True, validate=Range(min=1))
 
     first_name = fields.String(data_key='firstName', required=True, validate=Length(min=1))
@@ -119,6 +123,7 @@ class PersonSchema(Schema):
     birthday = fields.Date(allow_none=True)
     phone = fields.String(allow_none=True)
     email = fields.String(allow_none=True)
+    locale_code = fields.String(data_key='localeCode', allow_none=True, validate=Length(min=2, max=5))
 
     username = fields.String(required=True, validate=Length(min=1))
     password = fields.String(attribute='password_hash', load_only=True, required=True, validate=Length(min=6))
@@ -160,7 +165,6 @@ class Role(Base):
 
     @classmethod
     def load_from_file(cls, file_name='roles.json'):
-        count = 0
         file_path = os.path.abspath(
             os.path.join(
                 __file__,
@@ -168,32 +172,21 @@ class Role(Base):
                 'data',
                 file_name))
 
+        if db.session.query(Role).count():
+            return 0
+
         with open(file_path, 'r') as fp:
-            if db.session.query(Role).count() == 0:
-
-                roles = json.load(fp)
-
-                for role in roles:
-                    role_name = role['name']
-                    name_i18n = f'role.{role_name}'
-
-                    for locale in role['locales']:
-                        locale_code = locale['locale_code']
-                        if not db.session.query(I18NLocale).get(locale_code):
-                            db.session.add(I18NLocale(
-                                code=locale_code, desc=''))
-                        i18n_create(
-                            name_i18n,
-                            locale['locale_code'],
-                            locale['name'],
-                            description=f"Role {role_name}")
-                    db.session.add(
-                        cls(name_i18n=name_i18n, active=True))
-                    count += 1
-                db.session.commit()
-            fp.close()
-            return count
-        return 0
+            roles = json.load(fp)
+
+        i18n_insert_missing(
+            {f"role.{role['name']}": f"Role {role['name']}" for role in roles},
+            [{'key_id': f"role.{role['name']}", 'locale_code': locale['locale_code'],
+              'gloss': locale['name'], 'verified': False}
+             for role in roles for locale in role['locales']])
+        count = len(insert_missing(cls, [{'name_i18n': f"role.{role['name']}", 'active': True}
+                                         for role in roles], 'name_i18n'))
+        db.session.commit()
+        return count
 
 
 class RoleSchema(Schema):
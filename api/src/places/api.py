@@ -10,20 +10,7 @@ from .models import Country, CountrySchema, Address, AddressSchema, Area, AreaSc
 from .. import db
 from ..i18n.models import I18NValue, I18NKey
 from ..images.models import Image, ImageLocation
-
-
-def modify_entity(entity_type, schema, id, new_value_dict):
-    item = db.session.query(entity_type).filter_by(id=id).first()
-
-    if not item:
-        return jsonify(f"Item with id #{id} does not exist."), 404
-
-    for key, val in new_value_dict.items():
-        setattr(item, key, val)
-
-    db.session.commit()
-
-    return jsonify(schema.dump(item)), 200
+from ..shared.helpers import cacheable, modify_entity
 
 
 class CountryListSchema(Schema):
@@ -38,6 +25,7 @@ country_schema = CountrySchema()
 
 @places.route('/countries')
 @places.route('/countries/<country_code>')
+@cacheable
 def read_countries(country_code=None):
     locale_code = request.args.get('locale')
     if locale_code is None:
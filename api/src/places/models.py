@@ -9,7 +9,7 @@ from sqlalchemy.orm import relationship
 from .. import db
 from ..db import Base
 from ..i18n.models import I18NKey
-from ..shared.helpers import get_or_create
+from ..shared.helpers import insert_missing
 from ..shared.models import StringTypes
 
 
@@ -32,7 +32,6 @@ class Country(Base):
 
     @classmethod
     def load_from_file(cls, file_name='country-codes.json'):
-        count = 0
         file_path = os.path.abspath(
             os.path.join(
                 __file__,
@@ -43,27 +42,16 @@ class Country(Base):
         with open(file_path, 'r') as fp:
             countries = json.load(fp)
 
-            for country in countries:
-                country_code = country['Code']
-                country_name = country['Name']
-
-                name_i18n = f'country.name.{country_code}'
-
-                # Create the key if it does not exist
-
-                get_or_create(db.session, I18NKey, filters={
-                    'id': name_i18n}, attributes={
-                    'desc': f"Country {country_name}"})
-
-                # Note: Create I18NValue s with flask i18n load <locale>
-
-                # Add to the Country table.
-                if not db.session.query(cls).filter_by(
-                        code=country_code).count():
-                    db.session.add(cls(code=country_code, name_i18n=name_i18n))
-                    count += 1
-            db.session.commit()
-        fp.close()
+        # Create the keys and countries that don't exist, with one query
+        # and one insert for each table.
+        # Note: Create I18NValue s with flask i18n load <locale>
+        insert_missing(I18NKey, [{'id': f"country.name.{country['Code']}",
+                                  'desc': f"Country {country['Name']}"}
+                                 for country in countries], 'id')
+        count = len(insert_missing(cls, [{'code': country['Code'],
+                                          'name_i18n': f"country.name.{country['Code']}"}
+                                         for country in countries], 'code'))
+        db.session.commit()
         return count
 
 
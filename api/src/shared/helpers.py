@@ -1,10 +1,13 @@
 import hashlib
+import threading
 from functools import wraps
 
 from flask import current_app
 from flask.json import jsonify
 from flask_jwt_extended import create_access_token, get_jwt_claims, verify_jwt_in_request
 from flask_jwt_extended.exceptions import JWTExtendedException
+from marshmallow import fields
+from sqlalchemy import and_, inspect
 from sqlalchemy.exc import DBAPIError
 
 from .models import QueryArgumentError
@@ -12,20 +15,95 @@ from .. import db
 
 
 def modify_entity(entity_type, schema, id, new_value_dict):
+    """ update the entity with the given id and respond with its dumped form
+
+    When the schema dumps plain columns only, this is a single
+    UPDATE ... RETURNING round trip and the returned row is serialized
+    directly. Otherwise (nested fields requested, or values that are not
+    plain columns) the entity is loaded and updated through the ORM.
+    """
+    new_value_dict = {key: val for key, val in new_value_dict.items() if key != 'id'}
+
+    columns = column_attributes(entity_type)
+    if new_value_dict \
+            and all(key in columns for key in new_value_dict) \
+            and not dumps_nested(schema) \
+            and db.session.get_bind().dialect.implicit_returning:
+        table = entity_type.__table__
+        row = db.session.execute(
+            table.update()
+                .where(table.c.id == id)
+                .values({columns[key]: val for key, val in new_value_dict.items()})
+                .returning(*table.columns)
+        ).first()
+        if row is None:
+            db.session.commit()
+            return jsonify(f"Item with id #{id} does not exist."), 404
+
+        # the UPDATE bypasses the ORM, so a copy of the entity already in
+        # the session would be stale (the session may not expire on commit)
+        stale = db.session.identity_map.get(db.session.identity_key(entity_type, row[table.c.id]))
+        if stale is not None:
+            db.session.expire(stale)
+        db.session.commit()
+
+        return jsonify(schema.dump({key: row[column] for key, column in columns.items()})), 200
+
     item = db.session.query(entity_type).filter_by(id=id).first()
 
     if not item:
         return jsonify(f"Item with id #{id} does not exist."), 404
 
     for key, val in new_value_dict.items():
-        if key != 'id':
-            setattr(item, key, val)
+        setattr(item, key, val)
 
     db.session.commit()
 
     return jsonify(schema.dump(item)), 200
 
 
+def column_attributes(entity_type):
+    """ map the attribute names of a model to their table columns """
+    return {attr.key: attr.columns[0]
+            for attr in inspect(entity_type).column_attrs
+            if attr.columns[0].table is entity_type.__table__}
+
+
+def dumps_nested(schema):
+    """ whether dumping with this schema needs more than the entity's own columns """
+    return any(isinstance(field, (fields.Nested, fields.Pluck, fields.Method, fields.Function))
+               for field in schema.dump_fields.values())
+
+
+_schema_cache = {}
+_schema_cache_lock = threading.Lock()
+
+
+def _freeze(names):
+    """ turn a list of field names into a hashable cache key part """
+    if names is None or isinstance(names, bool):
+        return names
+    return frozenset(names)
+
+
+def get_schema(schema_class, only=None, exclude=(), partial=False):
+    """ return a shared instance of schema_class with the given options
+
+    constructing a schema with nested fields is expensive, so instances
+    are built once per (class, only, exclude, partial) and then reused.
+    The returned schema must not be modified by the caller.
+    """
+    key = (schema_class, _freeze(only), _freeze(exclude), _freeze(partial))
+    schema = _schema_cache.get(key)
+    if schema is None:
+        with _schema_cache_lock:
+            schema = _schema_cache.get(key)
+            if schema is None:
+                schema = schema_class(only=only, exclude=exclude, partial=partial)
+                _schema_cache[key] = schema
+    return schema
+
+
 def get_exclusion_list(query_object, default_exclusion_list):
     ret_list = default_exclusion_list.copy()
     for exclusion in default_exclusion_list:
@@ -166,27 +244,51 @@ class BadListKeyPath(Exception):
     pass
 
 
+def under_key_path(column, path):
+    """ criterion for the dotted keys below `path`, e.g. 'a.b' and 'a.b.c' below 'a'
+
+    This is the range 'a.' <= key < 'a/' ('/' comes right after '.'),
+    compared byte-wise so that it matches exactly the keys starting with
+    'a.' and can be answered from an index on the "C"-collated column.
+    LIKE 'a.%' can't use an index under other collations, and treats '_'
+    in the path as a wildcard.
+    """
+    column = column.collate('C')
+    return and_(column >= f'{path}.', column < f'{path}/')
+
+
 def tree_to_list(tree, is_leaf=lambda node: isinstance(node, str)):
-    """ convert a tree into a list of { 'path': 'abc.xyz', 'value': leaf_node }
-    where is_leaf(leaf_node) == True
+    """ generate { 'path': 'abc.xyz', 'value': leaf_node } for each leaf
+    of the tree, where is_leaf(leaf_node) == True
 
-    raises a BadTreeStructure error if cannot convert the given tree
+    raises a BadTreeStructure error if cannot convert the given tree;
+    as this is a generator, the error comes up while iterating
+
+    The tree is walked with a stack of iterators and a single stack of
+    dotted path prefixes; a path string is only built for a leaf.
     """
-    result = []
-
-    def tree_to_list_helper(word_map, path=[]):
-        if not isinstance(word_map, dict):
-            raise BadTreeStructure(
-                f"node [{word_map}] at path [{'.'.join(path)}]"
-                " is neither a valid dictionary nor a valid leaf node")
-        for key, val in word_map.items():
-            if (is_leaf(val)):
-                result.append({'path': path + [key], 'value': val})
+    if not isinstance(tree, dict):
+        raise BadTreeStructure(
+            f"node [{tree}] at path []"
+            " is neither a valid dictionary nor a valid leaf node")
+    prefixes = ['']
+    stack = [iter(tree.items())]
+    while stack:
+        prefix = prefixes[-1]
+        for key, val in stack[-1]:
+            if is_leaf(val):
+                yield {'path': prefix + key, 'value': val}
+            elif isinstance(val, dict):
+                prefixes.append(f'{prefix}{key}.')
+                stack.append(iter(val.items()))
+                break
             else:
-                tree_to_list_helper(val, path + [key])
-
-    tree_to_list_helper(tree)
-    return result
+                raise BadTreeStructure(
+                    f"node [{val}] at path [{prefix}{key}]"
+                    " is neither a valid dictionary nor a valid leaf node")
+        else:
+            stack.pop()
+            prefixes.pop()
 
 
 def list_to_tree(entries):
@@ -198,23 +300,38 @@ def list_to_tree(entries):
     }
 
     raises a BadListKeyPath error if cannot convert the given list to a valid tree
+
+    The dictionaries made so far are kept by their dotted path, so an entry
+    whose parent exists only needs the part after its last dot; paths are
+    split further only to create missing parents.
     """
     tree = {}
+    nodes = {'': tree}
     for entry in entries:
-        keys = entry['path'].split('.')
-        t = tree
-        but_last, last = keys[:-1], keys[-1]
-        for i, key in enumerate(but_last):
-            t = t.setdefault(key, {})
-            if not isinstance(t, dict):
-                raise BadListKeyPath(
-                    f"failed to add child [{key}] in path [{entry['path']}], "
-                    f"non-dict value [{t}] at [{'.'.join(but_last[:i + 1])}]")
+        path = entry['path']
+        parent_path, _, last = path.rpartition('.')
+        t = nodes.get(parent_path)
+        if t is None:
+            # find the closest existing ancestor, then create the ones below it
+            missing = []
+            ancestor = parent_path
+            while ancestor not in nodes:
+                missing.append(ancestor)
+                ancestor = ancestor.rpartition('.')[0]
+            t = nodes[ancestor]
+            for ancestor in reversed(missing):
+                key = ancestor.rpartition('.')[2]
+                t = t.setdefault(key, {})
+                if not isinstance(t, dict):
+                    raise BadListKeyPath(
+                        f"failed to add child [{key}] in path [{path}], "
+                        f"non-dict value [{t}] at [{ancestor}]")
+                nodes[ancestor] = t
         if last not in t:
             t[last] = entry['value']
         else:
             raise BadListKeyPath(
-                f"{entry['path']} already exists: '{t[last]}', won't set to '{entry['value']}'")
+                f"{path} already exists: '{t[last]}', won't set to '{entry['value']}'")
     return tree
 
 
@@ -239,6 +356,26 @@ def get_or_create(session, model, filters, attributes={}):
         return instance
 
 
+def insert_missing(model, rows, key):
+    """insert the rows whose `key` column value isn't in the table yet
+
+    One query finds the existing values and one multi-row INSERT adds the
+    others, in the session's transaction; rows repeating a value are
+    dropped. Returns the rows that were inserted.
+
+    :model: the model for the table
+    :rows: dicts of column values
+    :key: the name of a unique column
+    """
+    column = getattr(model, key)
+    rows = list({row[key]: row for row in rows}.values())
+    existing = {value for value, in db.session.query(column).filter(column.in_([row[key] for row in rows]))}
+    missing = [row for row in rows if row[key] not in existing]
+    if missing:
+        db.session.execute(model.__table__.insert().values(missing))
+    return missing
+
+
 def get_token_with_roles(role_names):
     """ generates a token with specified roles in it
 
@@ -283,6 +420,30 @@ def jwt_not_required(fn):
     return wrapper
 
 
+def read_only(fn):
+    """ marks an endpoint that only reads from the database,
+    so that it can be served from a read replica even if it is not a GET
+    """
+    fn.read_only = True
+    return fn
+
+
+def read_write(fn):
+    """ marks a GET endpoint that writes to the database,
+    so that it runs on the primary in a normal read-write transaction
+    """
+    fn.read_only = False
+    return fn
+
+
+def cacheable(fn):
+    """ marks an endpoint whose responses are the same for every client,
+    so that their compressed bodies are kept and reused
+    """
+    fn.cacheable = True
+    return fn
+
+
 def authorize(roles):
     def authorize_wrapper(fn):
         @wraps(fn)
@@ -0,0 +1,87 @@
+import json
+
+import pytest
+from marshmallow import Schema
+
+from .serializers import CompiledSchema
+from ..events.create_event_data import create_multiple_events, create_events_participants, create_events_persons
+from ..events.models import Event, EventSchema
+from ..groups.create_group_data import create_group_test_data
+from ..groups.models import Group, GroupSchema
+from ..i18n.models import I18NValue, I18NValueSchema
+from ..i18n.test_i18n import seed_database
+from ..people.models import Person, PersonSchema
+from ..people.test_people import create_multiple_people, create_person_roles
+from ..places.test_places import create_multiple_locations
+
+
+def assert_same_dump(schema, objects):
+    """ the compiled dump must produce the same JSON as marshmallow's """
+    assert isinstance(schema, CompiledSchema)
+    expected = json.dumps(Schema.dump(schema, objects, many=True))
+    assert json.dumps(schema.dump(objects, many=True)) == expected
+    assert json.dumps(schema.dump(objects[0])) == json.dumps(Schema.dump(schema, objects[0]))
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'exclude': ['members', 'managers', 'roles']},
+    {'only': ['id', 'first_name', 'birthday', 'active', 'member_histories']},
+])
+def test_compiled_person_schema(auth_client, options):
+    # GIVEN people with roles, group memberships and histories
+    create_multiple_people(auth_client.sqla, 8)
+    create_person_roles(auth_client.sqla)
+    create_group_test_data(auth_client.sqla)
+
+    # WHEN they are dumped THEN the output matches marshmallow's
+    assert_same_dump(PersonSchema(**options), auth_client.sqla.query(Person).all())
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'exclude': ['members', 'meetings']},
+    {'only': ['id', 'name', 'group_type', 'images']},
+])
+def test_compiled_group_schema(auth_client, options):
+    # GIVEN groups with members, managers, meetings and histories
+    create_multiple_people(auth_client.sqla, 8)
+    create_group_test_data(auth_client.sqla)
+
+    # WHEN they are dumped THEN the output matches marshmallow's
+    assert_same_dump(GroupSchema(**options), auth_client.sqla.query(Group).all())
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'exclude': ['assets', 'participants', 'persons', 'teams', 'images', 'groups']},
+    {'only': ['id', 'start', 'end', 'location', 'persons']},
+])
+def test_compiled_event_schema(auth_client, options):
+    # GIVEN events with locations, persons and participants
+    create_multiple_locations(auth_client.sqla, 3)
+    create_multiple_people(auth_client.sqla, 6)
+    create_multiple_events(auth_client.sqla, 10)
+    create_events_participants(auth_client.sqla)
+    create_events_persons(auth_client.sqla)
+
+    # WHEN they are dumped THEN the output matches marshmallow's
+    assert_same_dump(EventSchema(**options), auth_client.sqla.query(Event).all())
+
+
+def test_compiled_i18n_value_schema(auth_client):
+    # GIVEN translated values
+    seed_database(auth_client.sqla)
+
+    # WHEN they are dumped THEN the output matches marshmallow's
+    assert_same_dump(I18NValueSchema(), auth_client.sqla.query(I18NValue).all())
+
+
+def test_compiled_schema_mapping():
+    # GIVEN a dict instead of a model and a value that isn't a string
+    value = {'key_id': 'app.name', 'locale_code': 'en-US', 'gloss': 42, 'verified': 1}
+
+    # WHEN it is dumped THEN marshmallow's rules still apply
+    assert I18NValueSchema().dump(value) == Schema.dump(I18NValueSchema(), value)
+    assert I18NValueSchema().dump(value)['gloss'] == '42'
+    assert I18NValueSchema().dump(value)['verified'] is True
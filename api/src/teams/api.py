@@ -7,7 +7,7 @@ from ..people.models import Person, PersonSchema
 from .models import Team, TeamMember, TeamSchema, TeamMemberSchema
 from . import teams
 from .. import db
-from src.shared.helpers import modify_entity, get_exclusion_list
+from src.shared.helpers import modify_entity, get_exclusion_list, get_schema
 
 # ---- Team
 
@@ -15,7 +15,8 @@ from src.shared.helpers import modify_entity, get_exclusion_list
 @teams.route('/', methods=['POST'])
 @jwt_required
 def create_team():
-    team_schema = TeamSchema(
+    team_schema = get_schema(
+        TeamSchema,
         exclude=get_exclusion_list(
             request.args, [
                 'members', 'events']))
@@ -33,7 +34,8 @@ def create_team():
 @teams.route('/')
 @jwt_required
 def read_all_teams():
-    team_schema = TeamSchema(
+    team_schema = get_schema(
+        TeamSchema,
         exclude=get_exclusion_list(
             request.args, [
                 'members', 'events']))
@@ -74,7 +76,8 @@ def read_all_teams():
 @teams.route('/<team_id>')
 @jwt_required
 def read_one_team(team_id):
-    team_schema = TeamSchema(
+    team_schema = get_schema(
+        TeamSchema,
         exclude=get_exclusion_list(
             request.args, [
                 'members', 'events']))
@@ -89,8 +92,8 @@ def read_one_team(team_id):
 @teams.route('/members')
 @jwt_required
 def read_all_team_members():
-    team_schema = TeamSchema(exclude=['members', 'events'])
-    person_schema = PersonSchema()
+    team_schema = get_schema(TeamSchema, exclude=['members', 'events'])
+    person_schema = get_schema(PersonSchema)
     teams = db.session.query(Team).all()
 
     constructed_dict = dict()
@@ -109,7 +112,8 @@ def read_all_team_members():
 @teams.route('/<team_id>', methods=['PUT'])
 @jwt_required
 def replace_team(team_id):
-    team_schema = TeamSchema(
+    team_schema = get_schema(
+        TeamSchema,
         exclude=get_exclusion_list(
             request.args, [
                 'members', 'events']))
@@ -124,7 +128,8 @@ def replace_team(team_id):
 @teams.route('/<team_id>', methods=['PATCH'])
 @jwt_required
 def update_team(team_id):
-    team_schema = TeamSchema(
+    team_schema = get_schema(
+        TeamSchema,
         exclude=get_exclusion_list(
             request.args, [
                 'members', 'events']))
@@ -154,7 +159,8 @@ def delete_team(team_id):
 @teams.route('/<team_id>/members')
 @jwt_required
 def get_team_members(team_id):
-    team_member_schema = TeamMemberSchema(
+    team_member_schema = get_schema(
+        TeamMemberSchema,
         exclude=get_exclusion_list(
             request.args, ['team']))
     team_members = db.session.query(
@@ -170,7 +176,8 @@ def get_team_members(team_id):
 @teams.route('/<team_id>/members/<member_id>', methods=['PATCH'])
 @jwt_required
 def modify_team_member(team_id, member_id):
-    team_member_schema = TeamMemberSchema(
+    team_member_schema = get_schema(
+        TeamMemberSchema,
         exclude=get_exclusion_list(
             request.args, ['team']))
     try:
@@ -196,7 +203,8 @@ def modify_team_member(team_id, member_id):
 @teams.route('/<team_id>/members/<member_id>', methods=['POST', 'PUT'])
 @jwt_required
 def add_team_member(team_id, member_id):
-    team_member_schema = TeamMemberSchema(
+    team_member_schema = get_schema(
+        TeamMemberSchema,
         exclude=get_exclusion_list(
             request.args, ['team']))
     try:
@@ -225,6 +225,24 @@ def test_update_team(auth_client):
     assert resp.status_code == 422
 
 
+def test_update_team_response(auth_client):
+    # GIVEN a database with some teams
+    create_multiple_teams(auth_client.sqla, 3)
+    team = auth_client.sqla.query(Team).first()
+    team_id = team.id
+    # WHEN we update one team
+    dscrptn = fake.sentences(nb=1)[0]
+    resp = auth_client.patch(url_for('teams.update_team', team_id=team_id), json={'description': dscrptn})
+    # THEN the response is the same as dumping the updated team
+    assert resp.status_code == 200
+    assert team.description == dscrptn
+    assert resp.json == TeamSchema(exclude=['members', 'events']).dump(team)
+    # WHEN we update a team that does not exist
+    resp = auth_client.patch(url_for('teams.update_team', team_id=team_id + 100), json={'description': dscrptn})
+    # THEN we expect an error
+    assert resp.status_code == 404
+
+
 @pytest.mark.smoke
 def test_delete_team(auth_client):
     # GIVEN a database with some teams
@@ -1,3 +1,5 @@
+import time
+
 import pytest
 from flask import url_for
 
@@ -7,3 +9,169 @@ def test_ping(plain_client):
     resp = plain_client.get(url_for('etc.ping'))
     assert resp.status_code == 200
     assert resp.json['ping'] == 'pong'
+
+
+def test_db_pool(auth_client):
+    resp = auth_client.get(url_for('etc.db_pool'))
+    assert resp.status_code == 200
+    assert resp.json['checked_out'] >= 0
+    assert resp.json['wait']['checkouts'] > 0
+
+
+def test_read_replica_routing(monkeypatch):
+    # GIVEN an app with the test database standing in as a read replica
+    from . import db, create_app
+    from .confcc import TestingConfig
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_REPLICA_URIS', [TestingConfig.SQLALCHEMY_DATABASE_URI])
+    app = create_app('test')
+    replica = db.replica_engines[0]
+
+    # WHEN a GET request reads THEN it uses the replica
+    with app.test_request_context('/', method='GET'):
+        app.preprocess_request()
+        assert db.session.get_bind() is replica
+        db.session.remove()
+
+    # WHEN a POST request reads THEN it uses the primary
+    with app.test_request_context('/', method='POST'):
+        app.preprocess_request()
+        assert db.session.get_bind() is db.engine
+        db.session.remove()
+
+    # WHEN the client wrote a moment ago THEN its GET requests use the primary
+    with app.test_request_context('/', method='GET', headers={'Cookie': f'{db.LAST_WRITE_COOKIE}={time.time()}'}):
+        app.preprocess_request()
+        assert db.session.get_bind() is db.engine
+        db.session.remove()
+
+
+def test_get_schema():
+    from .shared.helpers import get_schema
+    from .teams.models import TeamSchema
+
+    schema = get_schema(TeamSchema, exclude=['members', 'events'])
+    assert get_schema(TeamSchema, exclude=('events', 'members')) is schema
+    assert get_schema(TeamSchema) is not schema
+    assert 'members' not in schema.dump_fields
+
+
+def test_under_key_path(auth_client):
+    from .i18n.models import I18NKey
+    from .shared.helpers import under_key_path
+
+    ids = ['a', 'a.b', 'a.b.c', 'a.z', 'a_b.c', 'ab', 'a/b', 'b.a']
+    auth_client.sqla.add_all([I18NKey(id=id, desc=id) for id in ids])
+    auth_client.sqla.commit()
+
+    def below(path):
+        return sorted(id for id, in auth_client.sqla.query(I18NKey.id).filter(under_key_path(I18NKey.id, path)))
+
+    assert below('a') == ['a.b', 'a.b.c', 'a.z']
+    assert below('a.b') == ['a.b.c']
+    assert below('a_b') == ['a_b.c']
+    assert below('c') == []
+
+
+def test_tree_to_list():
+    from .shared.helpers import tree_to_list, BadTreeStructure
+
+    tree = {'app': {'name': 'CC', 'menu': {'home': 'Home', 'about': 'About'}}, 'ok': 'OK', 'empty': {}}
+    assert list(tree_to_list(tree)) == [
+        {'path': 'app.name', 'value': 'CC'},
+        {'path': 'app.menu.home', 'value': 'Home'},
+        {'path': 'app.menu.about', 'value': 'About'},
+        {'path': 'ok', 'value': 'OK'},
+    ]
+    with pytest.raises(BadTreeStructure, match=r'node \[42\] at path \[app.menu.count\]'):
+        list(tree_to_list({'app': {'menu': {'home': 'Home', 'count': 42}}}))
+    with pytest.raises(BadTreeStructure):
+        list(tree_to_list('leaf'))
+
+
+def test_list_to_tree_round_trip():
+    from .shared.helpers import list_to_tree, tree_to_list, BadListKeyPath
+
+    paths = ['a.b.c', 'a.b.d', 'a.e', 'f', 'a.b.g.h', 'g.h.i', 'a.x.y']
+    entries = [{'path': path, 'value': path.upper()} for path in paths]
+    tree = list_to_tree(entries)
+    assert tree == {'a': {'b': {'c': 'A.B.C', 'd': 'A.B.D', 'g': {'h': 'A.B.G.H'}}, 'e': 'A.E',
+                          'x': {'y': 'A.X.Y'}},
+                    'f': 'F', 'g': {'h': {'i': 'G.H.I'}}}
+    assert sorted(entry['path'] for entry in tree_to_list(tree)) == sorted(paths)
+
+    for bogus in (['a.b', 'a.b.c'], ['a.b.c', 'a.b'], ['a.b', 'a.b']):
+        with pytest.raises(BadListKeyPath):
+            list_to_tree({'path': path, 'value': path} for path in bogus)
+
+
+@pytest.mark.parametrize('backend', ['stdlib', 'orjson'])
+def test_json_backend(monkeypatch, backend):
+    import datetime
+    import decimal
+    from flask import json, jsonify
+    from . import create_app
+    from .confcc import TestingConfig
+    from .jsonprovider import orjson
+
+    if backend == 'orjson' and orjson is None:
+        pytest.skip('orjson is not installed')
+    monkeypatch.setattr(TestingConfig, 'JSON_BACKEND', backend)
+    app = create_app('test')
+
+    # GIVEN values the standard library can't encode on its own
+    data = {
+        'date': datetime.date(2020, 6, 1),
+        'start': datetime.datetime(2020, 6, 1, 18, 30, 5, 120),
+        'price': decimal.Decimal('10.25'),
+        'people': {7: 'Ana', 8: 'Luis'},
+        'big': 2 ** 70,
+        'name': 'Año Nuevo',
+    }
+
+    with app.app_context():
+        # WHEN they are jsonified THEN dates are ISO 8601 and decimals strings
+        assert json.loads(jsonify(data).get_data()) == {
+            'date': '2020-06-01',
+            'start': '2020-06-01T18:30:05.000120',
+            'price': '10.25',
+            'people': {'7': 'Ana', '8': 'Luis'},
+            'big': 2 ** 70,
+            'name': 'Año Nuevo',
+        }
+
+
+def test_lazy_imports():
+    import subprocess
+    import sys
+    from . import API_DIR
+
+    # WHEN the app is loaded the way gunicorn and `flask` load it
+    loaded = subprocess.run(
+        [sys.executable, '-W', 'ignore', '-c',
+         "import runpy, sys; runpy.run_path('cc-api.py'); "
+         "print(' '.join(m for m in ('faker', 'googletrans', 'src.people.test_people') if m in sys.modules))"],
+        cwd=API_DIR, capture_output=True, text=True, check=True).stdout.split()
+
+    # THEN test factories and optional heavy dependencies are not imported
+    assert loaded == []
+
+
+def test_warm_up(auth_client):
+    from flask import current_app
+    from . import db
+    from .i18n.test_i18n import seed_database
+    from .warmup import warm_up
+
+    # GIVEN locales and translations
+    seed_database(auth_client.sqla)
+    cache = current_app.extensions['compression_cache']
+    cache.clear()
+
+    # WHEN the app is warmed up
+    warm_up(current_app)
+
+    # THEN the translations are cached compressed
+    assert cache.size > 0
+    # AND no database connection is left open to be inherited
+    assert db.engine.pool.checkedin() == 0
+    assert db.engine.pool.checkedout() == 0
@@ -1,9 +1,12 @@
 import json
 import os
+import time
 
+import pytest
 import yaml
 
 from . import db
+from .cli.translators import OfflineTranslator, TRANSLATORS, TokenBucket, Translator
 from .courses.models import Course, Diploma
 from .i18n.models import Language, I18NValue, I18NLocale, I18NKey
 from .people.models import Role
@@ -26,6 +29,24 @@ def test_load_roles(runner):
     assert db.session.query(Role).count() > 0
 
 
+def test_load_all(runner):
+    # GIVEN an empty database
+    # WHEN all the application data is loaded
+    runner.invoke(args=['app', 'load-all'])
+    countries = db.session.query(Country).count()
+    assert countries > 0 and db.session.query(Language).count() > 0
+    assert db.session.query(I18NValue.gloss).filter_by(key_id='role.public', locale_code='es-EC').scalar() == 'Público'
+    keys = db.session.query(I18NKey).count()
+    # WHEN some of it goes missing and is loaded again
+    db.session.query(Country).filter_by(code='EC').delete()
+    db.session.commit()
+    # THEN only what is missing is added
+    assert Country.load_from_file() == 1
+    assert Language.load_from_file() == 0
+    assert db.session.query(Country).count() == countries
+    assert db.session.query(I18NKey).count() == keys
+
+
 # ---- Course CLI
 
 
@@ -149,6 +170,40 @@ def test_i18n_load(runner):
         assert db.session.query(I18NValue).count() == 2
 
 
+def test_i18n_load_again(runner):
+    with runner.isolated_filesystem():
+        filename = 'en-US.json'
+        # GIVEN entries that are already loaded
+        entries = {f"key{i}": {"gloss": f"Gloss {i}", "verified": False} for i in range(5)}
+        with open(filename, "w") as f:
+            json.dump({"bulk": entries}, f)
+        result = runner.invoke(args=['i18n', 'load', '--silent', 'en-US', '--target', filename])
+        assert b'Entry count: 5' in result.stdout_bytes
+        revision = db.session.query(I18NLocale.revision).filter_by(code='en-US').scalar()
+
+        # WHEN a changed file is loaded without overriding
+        entries["key0"]["gloss"] = "Changed"
+        entries["key5"] = {"gloss": "New", "verified": True}
+        with open(filename, "w") as f:
+            json.dump({"bulk": entries}, f)
+        result = runner.invoke(args=['i18n', 'load', '--silent', '--no-override', 'en-US', '--target', filename])
+        # THEN only the new entry is added
+        assert b'Entry count: 1' in result.stdout_bytes
+        assert b'Skip count:  5' in result.stdout_bytes
+        assert db.session.query(I18NValue).filter_by(key_id='bulk.key0').one().gloss == "Gloss 0"
+
+        # WHEN it's loaded with overriding
+        result = runner.invoke(args=['i18n', 'load', '--silent', 'en-US', '--target', filename])
+        # THEN existing entries are updated too
+        assert b'Entry count: 6' in result.stdout_bytes
+        value = db.session.query(I18NValue).filter_by(key_id='bulk.key0').one()
+        assert value.gloss == "Changed"
+        # AND the locale has a new revision that the changed values carry
+        locale = db.session.query(I18NLocale).filter_by(code='en-US').one()
+        assert locale.revision > revision
+        assert value.revision == locale.revision
+
+
 def test_i18n_load_descriptions(runner):
     with runner.isolated_filesystem():
         filename = 'en-US.json'
@@ -601,6 +656,8 @@ def test_i18n_translate(runner):
         args=[
             'i18n',
             'translate',
+            '--translator',
+            'offline',
             'en-US',
             'es-EC'])
     # THEN we expect the translated entries to appear in the database
@@ -608,6 +665,98 @@ def test_i18n_translate(runner):
         locale_code="es-EC").count() == 3
 
 
+def test_i18n_translate_resumes(runner, monkeypatch):
+    # GIVEN a database with some entries
+    locale_data = [{'code': 'en-US', 'desc': 'English US'}]
+    key_data = [{'id': f'app.key{i}', 'desc': f'Key {i}'} for i in range(10)]
+    populate_database_i18n(locale_data, key_data)
+
+    # AND a translator that fails after a few requests
+    class FailingTranslator(OfflineTranslator):
+        calls = 0
+
+        def translate(self, texts, src, dest):
+            FailingTranslator.calls += 1
+            if FailingTranslator.calls > 3:
+                raise ConnectionError("translator unavailable")
+            return super().translate(texts, src, dest)
+
+    monkeypatch.setitem(TRANSLATORS, 'failing', FailingTranslator)
+
+    # WHEN a translation is interrupted
+    result = runner.invoke(args=['i18n', 'translate', '--translator', 'failing', '--workers', '1',
+                                 '--batch-size', '2', '--checkpoint', '2', '--delay-timer', '0',
+                                 'en-US', 'es-EC'])
+    # THEN the entries translated so far are kept
+    assert isinstance(result.exception, ConnectionError)
+    assert db.session.query(I18NValue).filter_by(locale_code="es-EC").count() == 6
+
+    # WHEN it's run again THEN only the missing entries are translated
+    result = runner.invoke(args=['i18n', 'translate', '--translator', 'offline', '--batch-size', '3',
+                                 '--delay-timer', '0', 'en-US', 'es-EC'])
+    assert b'Entry count: 4' in result.stdout_bytes
+    glosses = [gloss for gloss, in db.session.query(I18NValue.gloss).filter_by(locale_code="es-EC")]
+    assert len(glosses) == 10
+    assert all(gloss.startswith('[es] Key') for gloss in glosses)
+
+
+def test_i18n_translate_memory(runner, monkeypatch):
+    # GIVEN glosses that repeat, some of which have a verified translation
+    db.session.add_all([I18NLocale(code='en-US', desc='English US'), I18NLocale(code='es-EC', desc='Español')])
+    glosses = {'btn.ok': 'OK', 'btn.cancel': 'Cancel', 'form.ok': 'OK', 'dialog.ok': ' ok ',
+               'form.cancel': 'Cancel', 'app.name': 'Name', 'person.name': 'Name'}
+    db.session.add_all([I18NKey(id=key_id, desc=key_id) for key_id in glosses])
+    db.session.add_all([I18NValue(key_id=key_id, locale_code='en-US', gloss=gloss)
+                        for key_id, gloss in glosses.items()])
+    db.session.add(I18NValue(key_id='btn.ok', locale_code='es-EC', gloss='Aceptar', verified=True))
+    db.session.add(I18NValue(key_id='btn.cancel', locale_code='es-EC', gloss='Cancelar', verified=False))
+    db.session.commit()
+
+    translated = []
+
+    class RecordingTranslator(OfflineTranslator):
+        def translate(self, texts, src, dest):
+            translated.extend(texts)
+            return super().translate(texts, src, dest)
+
+    monkeypatch.setitem(TRANSLATORS, 'recording', RecordingTranslator)
+
+    # WHEN the missing entries are translated
+    result = runner.invoke(args=['i18n', 'translate', '--translator', 'recording', '--delay-timer', '0',
+                                 'en-US', 'es-EC'])
+    # THEN verified translations are reused, exactly or up to case and spacing
+    values = dict(db.session.query(I18NValue.key_id, I18NValue.gloss).filter_by(locale_code='es-EC'))
+    assert values['form.ok'] == values['dialog.ok'] == 'Aceptar'
+    # AND every other text is translated once
+    assert sorted(translated) == ['Cancel', 'Name']
+    assert values['app.name'] == values['person.name'] == '[es] Name'
+    # AND the reuse is reported
+    assert b'Translation memory: 2 of 5 entries reused (40%)' in result.stdout_bytes
+    assert b'Translated 2 texts for 3 entries (1 repeated in this run)' in result.stdout_bytes
+
+
+def test_translators():
+    # a backend has to say which languages it knows and how to translate
+    class Incomplete(Translator):
+        def languages(self):
+            return {}
+
+    with pytest.raises(TypeError):
+        Incomplete()
+    offline = OfflineTranslator()
+    assert offline.languages()['es'] == 'spanish'
+    assert offline.translate(['OK', 'Cancel'], src='en', dest='es') == ['[es] OK', '[es] Cancel']
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=100, capacity=2)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    # two right away, then one every 1/100 s
+    assert time.monotonic() - start >= 0.035
+
+
 def test_i18n_translate_params(runner):
     # GIVEN nothing
     # WHEN we invoke the command with an undeducible locale
@@ -0,0 +1,77 @@
+from flask import current_app
+from sqlalchemy import event
+
+from .i18n.models import I18NLocale, I18NKey, I18NValue
+from .translate import get_translation, get_translations, get_translation_cache, fallback_locales
+
+
+def seed_translations(sqla):
+    sqla.add_all([I18NLocale(code=code, desc=code) for code in ('en-US', 'es', 'es-EC')])
+    sqla.add_all([I18NKey(id=key, desc=key) for key in ('btn.ok', 'btn.cancel', 'app.name')])
+    sqla.add_all([
+        I18NValue(locale_code='en-US', key_id='btn.ok', gloss='OK'),
+        I18NValue(locale_code='en-US', key_id='btn.cancel', gloss='Cancel'),
+        I18NValue(locale_code='en-US', key_id='app.name', gloss='Corpus Christi'),
+        I18NValue(locale_code='es', key_id='btn.cancel', gloss='Cancelar'),
+        I18NValue(locale_code='es-EC', key_id='btn.ok', gloss='Aceptar'),
+    ])
+    sqla.commit()
+
+
+def count_queries(sqla, fn):
+    queries = []
+    connection = sqla.connection()
+
+    def record(*args):
+        queries.append(args)
+
+    event.listen(connection, 'before_cursor_execute', record)
+    try:
+        return fn(), len(queries)
+    finally:
+        event.remove(connection, 'before_cursor_execute', record)
+
+
+def test_fallback_locales(auth_client):
+    assert fallback_locales('es-EC') == ['es-EC', 'es', 'en-US']
+    assert fallback_locales('en-US') == ['en-US', 'en']
+
+
+def test_get_translations(auth_client):
+    # GIVEN translations in a locale, its language and the default locale
+    seed_translations(auth_client.sqla)
+
+    # WHEN asking for several keys at once
+    glosses = get_translations('es-EC', ['btn.ok', 'btn.cancel', 'app.name', 'no.such.key'])
+    # THEN each comes from the first locale in the chain that has it
+    assert glosses == {'btn.ok': 'Aceptar', 'btn.cancel': 'Cancelar', 'app.name': 'Corpus Christi'}
+    assert get_translation('es-EC', 'no.such.key', 'default') == 'default'
+    # AND an unknown locale falls back to the default one
+    assert get_translation('xx-YY', 'btn.ok') == 'OK'
+
+
+def test_translations_cached(auth_client):
+    # GIVEN translations that have been looked up once
+    seed_translations(auth_client.sqla)
+    keys = ['btn.ok', 'btn.cancel', 'app.name']
+    get_translations('es-EC', keys)
+    assert len(get_translation_cache()) > 0
+
+    # WHEN they are looked up again THEN no queries are needed
+    glosses, queries = count_queries(auth_client.sqla, lambda: get_translations('es-EC', keys))
+    assert queries == 0
+    assert glosses['btn.ok'] == 'Aceptar'
+
+    # WHEN a value changes THEN the new gloss is returned
+    value = auth_client.sqla.query(I18NValue).filter_by(locale_code='es-EC', key_id='btn.ok').one()
+    value.gloss = 'Vale'
+    auth_client.sqla.commit()
+    assert get_translation('es-EC', 'btn.ok') == 'Vale'
+
+
+def test_translation_cache_bounded(auth_client):
+    seed_translations(auth_client.sqla)
+    current_app.extensions.pop('translation_cache', None)
+    current_app.config['I18N_TRANSLATION_CACHE_SIZE'] = 2
+    get_translations('en-US', ['btn.ok', 'btn.cancel', 'app.name'])
+    assert len(get_translation_cache()) == 2
@@ -1,12 +1,109 @@
-from flask.json import jsonify
-
-from . import db
-from .i18n.models import I18NValue, I18NValueSchema
-
-
-def get_translation(locale_code, i18n_key):
-    i18n_schema = I18NValueSchema()
-    res = db.session.query(I18NValue).filter_by(
-        key_id=i18n_key, locale_code=locale_code).first()
-    print(jsonify(i18n_schema.dump(res)))
-    return False
+"""Look up translated strings (the glosses of I18NValues) for use on the server,
+e.g. in emails and notifications.
+
+Glosses are kept in a least recently used cache, tagged with the revision of
+their locale, so a change to a locale's values makes its cached glosses miss.
+"""
+
+import collections
+import threading
+
+from flask import current_app
+
+from . import db
+from .i18n.catalog import get_catalog
+from .i18n.models import I18NValue
+
+# Cached when a locale has no value for a key.
+MISSING = object()
+
+
+class TranslationCache:
+    """Least recently used store of glosses by (locale code, key)."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, locale_code, key_id, revision):
+        """The cached gloss (or MISSING) at this revision of the locale, or None."""
+        with self._lock:
+            entry = self._entries.get((locale_code, key_id))
+            if entry is None or entry[0] != revision:
+                return None
+            self._entries.move_to_end((locale_code, key_id))
+            return entry[1]
+
+    def put(self, locale_code, key_id, revision, gloss):
+        with self._lock:
+            self._entries[(locale_code, key_id)] = (revision, gloss)
+            self._entries.move_to_end((locale_code, key_id))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def get_translation_cache():
+    """The translation cache of the current app."""
+    cache = current_app.extensions.get('translation_cache')
+    if cache is None:
+        cache = current_app.extensions.setdefault(
+            'translation_cache', TranslationCache(current_app.config['I18N_TRANSLATION_CACHE_SIZE']))
+    return cache
+
+
+def fallback_locales(locale_code):
+    """The locales to try, in order, for a translation into `locale_code`.
+
+    E.g., 'es-EC' falls back to 'es' and then to I18N_DEFAULT_LOCALE.
+    """
+    chain = [locale_code, locale_code.split('-')[0], current_app.config['I18N_DEFAULT_LOCALE']]
+    return list(dict.fromkeys(chain))
+
+
+def get_translations(locale_code, key_ids):
+    """Return {key: gloss} for the given keys, in `locale_code` or the first
+    of its fallback locales that has them. Keys no locale has are left out.
+
+    Needs at most one query per locale in the chain whose glosses aren't cached.
+    """
+    cache = get_translation_cache()
+    catalog = get_catalog()
+    glosses = {}
+    wanted = list(dict.fromkeys(key_ids))
+    for fallback in fallback_locales(locale_code):
+        if not wanted:
+            break
+        revision = catalog.revision(fallback)
+        if revision is None:
+            continue
+
+        uncached = []
+        for key_id in wanted:
+            gloss = cache.get(fallback, key_id, revision)
+            if gloss is None:
+                uncached.append(key_id)
+            elif gloss is not MISSING:
+                glosses[key_id] = gloss
+        if uncached:
+            found = dict(db.session.query(I18NValue.key_id, I18NValue.gloss)
+                         .filter(I18NValue.locale_code == fallback, I18NValue.key_id.in_(uncached)))
+            for key_id in uncached:
+                gloss = found.get(key_id, MISSING)
+                cache.put(fallback, key_id, revision, gloss)
+                if gloss is not MISSING:
+                    glosses[key_id] = gloss
+        wanted = [key_id for key_id in wanted if key_id not in glosses]
+    return glosses
+
+
+def get_translation(locale_code, key_id, default=None):
+    """The gloss of one key (see `get_translations`), or `default` if there's none."""
+    return get_translations(locale_code, [key_id]).get(key_id, default)
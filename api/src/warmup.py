@@ -0,0 +1,71 @@
+import sys
+
+from flask import url_for
+from sqlalchemy.orm import configure_mappers
+
+from . import db
+from .compression import brotli
+from .shared.helpers import get_schema
+from .shared.serializers import CompiledSchema
+
+
+def all_subclasses(cls):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from all_subclasses(subclass)
+
+
+def warm_schemas():
+    """Build the shared schema instances and compile the fast dumps."""
+    for schema_class in set(all_subclasses(CompiledSchema)):
+        get_schema(schema_class).compiled_dump
+    for name, module in list(sys.modules.items()):
+        if name.startswith(__package__ + '.'):
+            for value in list(vars(module).values()):
+                if isinstance(value, CompiledSchema):
+                    value.compiled_dump
+
+
+def warm_reference_data(app):
+    """Request the reference data every client loads, once per locale.
+
+    This fills the compressed response cache and runs each of these views
+    once, so the first real request doesn't pay for it.
+    """
+    from .i18n.models import I18NLocale
+
+    locales = [code for code, in db.session.query(I18NLocale.code)]
+    db.session.remove()
+    with app.test_request_context():
+        urls = [url_for('i18n.read_all_values')]
+        for locale in locales:
+            urls += [
+                url_for('i18n.read_xlation', locale_code=locale, format='tree'),
+                url_for('i18n.read_languages', locale=locale),
+                url_for('places.read_countries', locale=locale),
+            ]
+
+    encodings = ['gzip', 'br'] if brotli is not None else ['gzip']
+    client = app.test_client()
+    for url in urls:
+        for encoding in encodings:
+            client.get(url, headers={'Accept-Encoding': encoding})
+
+
+def warm_up(app):
+    """Load what every worker needs before the server forks them.
+
+    With `gunicorn --preload` this runs once in the master, and the workers
+    share the result copy-on-write instead of each building their own. The
+    master's database connections are closed afterwards so that no worker
+    inherits one.
+    """
+    try:
+        with app.app_context():
+            configure_mappers()
+            warm_schemas()
+            warm_reference_data(app)
+    except Exception:
+        app.logger.exception("Warm-up failed; workers will load what they need on demand")
+    finally:
+        db.dispose()